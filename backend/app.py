@@ -1,173 +1,433 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import yfinance as yf
-import pandas as pd
-import numpy as np
+import os
 import time
-from portfolio_lib.optimizers import find_optimal_allocations, calculate_metrics, get_portfolio_history, get_risk_contribution, calculate_historical_var
-from portfolio_lib.visuals import generate_dendrogram_image, generate_efficient_frontier
+from portfolio_lib.optimizers import find_optimal_allocations, fit_regime, solve_strategies, strategy_results
+from portfolio_lib.math_utils import history_dates
+from portfolio_lib.serialization import wants_columnar, json_response, dumps
+from portfolio_lib.visuals import (dendrogram_tree, get_dendrogram_renderer, generate_efficient_frontier, generate_frontier_curve,
+                                   IMAGE_FORMATS)
+from portfolio_lib.data import fetch_market_data, get_risk_free_rate
+from portfolio_lib.jobs import JobManager, QueueFull
+from portfolio_lib.result_cache import ResultCache, make_key, rf_bucket
+from portfolio_lib.instrumentation import REGISTRY, stage, start_trace, end_trace
+from portfolio_lib.backtest import walk_forward, STRATEGIES
+from portfolio_lib.shrinkage import TARGETS as SHRINKAGE_TARGETS
+from portfolio_lib.warmup import warmup
+from portfolio_lib.risk import METHODS as VAR_METHODS
+from portfolio_lib.universe import UNIVERSE_MODES, use_clusters, prescreen
+from portfolio_lib.benchmarks import BENCHMARK_TICKERS, BenchmarkCache
+from portfolio_lib.lookback import DEFAULT_WINDOWS, HISTORY_MODES
 
 app = Flask(__name__)
 CORS(app)
 
-def get_risk_free_rate():
-    try:
-        ticker = yf.Ticker("^IRX")
-        hist = ticker.history(period="5d")
-        if hist.empty: return 0.045
-        return hist['Close'].iloc[-1] / 100.0
-    except: return 0.045
+# Long optimizations run here instead of in the request thread (per gunicorn worker process)
+jobs = JobManager(max_workers=int(os.environ.get("JOB_WORKERS", 2)), max_queue=int(os.environ.get("JOB_QUEUE_DEPTH", 8)))
+
+# Optimize payloads keyed by inputs + last price date; set RESULT_CACHE_DIR to persist across restarts
+result_cache = ResultCache(max_entries=int(os.environ.get("RESULT_CACHE_ENTRIES", 128)),
+                           max_bytes=int(os.environ.get("RESULT_CACHE_MB", 256)) * 2**20,
+                           disk_dir=os.environ.get("RESULT_CACHE_DIR"))
+
+# 60/40 and Permanent results per trading day, sliced to each request's dates
+benchmark_cache = BenchmarkCache(lambda: fetch_market_data(BENCHMARK_TICKERS, period="3y", clean=False),
+                                 max_entries=int(os.environ.get("BENCHMARK_CACHE_ENTRIES", 64)))
+
+# Most scenarios one /api/optimize/batch request may carry
+BATCH_MAX_SCENARIOS = int(os.environ.get("BATCH_MAX_SCENARIOS", 100))
+
+# Heavy dependencies load on first use. PRELOAD=1 loads them (and runs one tiny solve) at import
+# instead; with `gunicorn --preload` that happens once in the master before workers fork.
+warmup_timings = warmup() if os.environ.get("PRELOAD") else None
 
 @app.route('/')
 def home():
     return "Portfolio Optimizer API is running. Please use the frontend application."
 
-@app.route('/api/optimize', methods=['POST'])
-def optimize_portfolio():
+class InputError(ValueError):
+    """Request problems that should surface as HTTP 400."""
+
+def run_optimization(data, columnar=False, progress=None):
+    """
+    The full optimize pipeline for one request body; returns the response payload.
+    `progress(stage)` is called as each stage starts: download, regime, strategies, visuals, benchmarks.
+    With `"trace": true` in the body, meta.trace lists every timed stage of this call.
+    """
+    trace = start_trace() if data.get('trace') else None
     try:
-        start_total = time.time()
-        data = request.json
-        tickers = data.get('tickers', [])
-        min_w = float(data.get('min_weight', 0)) / 100.0
-        max_w = float(data.get('max_weight', 100)) / 100.0
-        target_mode = data.get('target_mode', 'volatility') # 'volatility' or 'var'
-        target_val_input = float(data.get('target_value', 0))
-        target_vol_input = float(data.get('target_volatility', 0))
-        target_vol = target_vol_input / 100.0 if target_vol_input > 0 else None
-
-        if not tickers or len(tickers) < 2: return jsonify({"error": "Need 2+ tickers."}), 400
-
-        if target_val_input > 0:
-            if target_mode == 'volatility':
-                target_value = target_val_input / 100.0 # Annual Vol (15 -> 0.15)
-            else:
-                target_value = target_val_input # Daily VaR (Keep as 1.5 for the math function)
+        with stage("request"):
+            payload = _run_pipeline(data, columnar, progress)
+    finally:
+        if trace is not None: end_trace()
+    if trace is None: return payload
+    # Traces describe one call, so they go on a copy rather than the cached payload
+    return dict(payload, meta=dict(payload["meta"], trace=trace.to_list()))
+
+OPTION_KEYS = ("tickers", "min_w", "max_w", "target_mode", "var_method", "target_value", "frontier_samples",
+               "shrinkage_target", "dendrogram_mode", "universe", "history")
+
+def _parse_options(data):
+    """Validated optimize options from a request body (or one batch scenario), keyed by OPTION_KEYS."""
+    tickers = data.get('tickers', [])
+    min_w = float(data.get('min_weight', 0)) / 100.0
+    max_w = float(data.get('max_weight', 100)) / 100.0
+    target_mode = data.get('target_mode', 'volatility') # 'volatility' or 'var'
+    var_method = data.get('var_method', 'historical') # VaR model used when target_mode is 'var'
+    target_val_input = float(data.get('target_value', 0))
+    frontier_samples = min(max(int(data.get('frontier_samples', 200)), 0), 50000)
+    shrinkage_target = data.get('shrinkage_target', 'identity')
+    # json: merge coordinates for client-side drawing; png/svg: also an image URL, rendered in the background
+    dendrogram_mode = data.get('dendrogram', 'json')
+    # dense: one problem over every ticker; clustered: prescreen + per-cluster solves; auto: clustered for large baskets
+    universe = data.get('universe', 'auto')
+    # common: drop dates on which any ticker is missing; pairwise: keep every date (ragged histories)
+    history = data.get('history', 'common')
+
+    if not tickers or len(tickers) < 2: raise InputError("Need 2+ tickers.")
+    if shrinkage_target not in SHRINKAGE_TARGETS: raise InputError(f"shrinkage_target must be one of {', '.join(SHRINKAGE_TARGETS)}.")
+    if var_method not in VAR_METHODS: raise InputError(f"var_method must be one of {', '.join(VAR_METHODS)}.")
+    if dendrogram_mode not in ('json', 'none', *IMAGE_FORMATS): raise InputError("dendrogram must be one of json, png, svg, none.")
+    if universe not in UNIVERSE_MODES: raise InputError(f"universe must be one of {', '.join(UNIVERSE_MODES)}.")
+    if history not in HISTORY_MODES: raise InputError(f"history must be one of {', '.join(HISTORY_MODES)}.")
+    if history == 'pairwise' and shrinkage_target != 'identity': raise InputError("history 'pairwise' supports shrinkage_target 'identity' only.")
+
+    if target_val_input > 0:
+        if target_mode == 'volatility':
+            target_value = target_val_input / 100.0 # Annual Vol (15 -> 0.15)
         else:
-            target_value = None
+            target_value = target_val_input # Daily VaR (Keep as 1.5 for the math function)
+    else:
+        target_value = None
 
-        rf_rate = get_risk_free_rate()
-        print(f"Risk Free Rate: {rf_rate*100:.2f}%")
-
-        # Optimization: Download User Tickers AND Benchmarks together to save time
-        benchmark_tickers = ["SPY", "BND", "GLD", "SHY", "TLT"]
-        all_tickers = list(set(tickers + benchmark_tickers))
-        
-        t0 = time.time()
-        raw = yf.download(all_tickers, period="3y", auto_adjust=True)
-        print(f"[Timing] Data Download ({len(all_tickers)} tickers): {time.time() - t0:.2f}s")
-        try: all_prices = raw['Close'] if 'Close' in raw.columns and isinstance(raw.columns, pd.MultiIndex) else raw['Close']
-        except: all_prices = raw
-        
-        valid_tickers = [t for t in tickers if t in all_prices.columns]
-        if len(valid_tickers) < 2: return jsonify({"error": "Need 2+ valid tickers."}), 400
-        
-        prices = all_prices[valid_tickers].dropna()
-        if prices.shape[0] < 30: return jsonify({"error": "Insufficient history."}), 400
-
-        # 1. Main Optimization
-        t1 = time.time()
-        result = find_optimal_allocations(prices, min_w, max_w, rf_rate, target_value, target_mode)
-        print(f"[Timing] Optimization: {time.time() - t1:.2f}s")
-
-        # 2. Visuals
-        t2 = time.time()
-        dendrogram_b64 = generate_dendrogram_image(result['debug_cov'])
-        frontier_cloud = generate_efficient_frontier(result['debug_mean'], result['debug_cov'])
-        print(f"[Timing] Visuals: {time.time() - t2:.2f}s")
-
-        # 3. Benchmarks
-        t3 = time.time()
-        benchmarks = {}
-        def get_benchmark_data():
-            valid_bench = [b for b in benchmark_tickers if b in all_prices.columns]
-            if not valid_bench: return {}
-            b_subset = all_prices[valid_bench].reindex(prices.index).ffill().dropna()
-            if b_subset.empty: return {}
-            r = b_subset.pct_change().dropna()
-            b_cov = r.cov()
-            b_defs = {"60/40": {"SPY":0.6, "BND":0.4}, "Permanent": {"SPY":0.25, "TLT":0.25, "GLD":0.25, "SHY":0.25}}
-            b_out = {}
-            for name, w_dict in b_defs.items():
-                w_s = pd.Series(0, index=r.columns)
-                for k,v in w_dict.items(): 
-                    if k in r.columns: w_s[k] = v
-                if w_s.sum() > 0: w_s /= w_s.sum()
-                ret, vol, sha = calculate_metrics(w_s, r.mean(), b_cov, rf_rate)
-                hist, drawdowns = get_portfolio_history(w_s, r)
-                
-                # NEW: Calculate Benchmark VaR
-                b_var = calculate_historical_var(w_s, r)
-
-                # Risk Decomp
-                active = w_s[w_s > 0].index.tolist()
-                w_active = w_s[active].values
-                cov_slice = b_cov.loc[active, active]
-                rc = get_risk_contribution(w_active, cov_slice)
-                risk_data = {"tickers": active, "weights": np.round(w_active * 100, 1).tolist(), "risk_contribution": np.round(rc * 100, 1).tolist()}
-                
-                b_out[name] = {
-                    "return": round(ret*100,1), 
-                    "volatility": round(vol*100,1), 
-                    "sharpe": round(sha,2), 
-                    "var": b_var, # Pass Benchmark VaR
-                    "allocation": {k:v*100 for k,v in w_dict.items()}, 
-                    "history": hist, 
-                    "drawdowns": drawdowns, 
-                    "risk_decomposition": risk_data
-                }
-            return b_out
-            
-        benchmarks = get_benchmark_data()
-        print(f"[Timing] Benchmarks: {time.time() - t3:.2f}s")
-
-        # 4. Recent Prices
-        last_prices = []
-        for date, row in prices.tail(5).sort_index(ascending=False).iterrows():
-            row_dict = {"date": date.strftime('%Y-%m-%d')}
-            row_dict.update({k: round(v, 2) for k, v in row.items()})
-            last_prices.append(row_dict)
-
-        # 5. Format Strategies (CRITICAL FIX HERE)
-        formatted = {}
-        t_list = list(prices.columns)
-        for s_name, s_data in result['strategies'].items():
-            formatted[s_name] = {}
-            # Simplified Rebalance check
-            # For simplicity, calculate rebalance for constrained only, apply to top level
-            # In production, move rebalance calculation outside this loop or keep it separate
-            
-            for mode in ['unconstrained', 'constrained']:
-                formatted[s_name][mode] = {
-                    "allocation": {t: round(w*100, 1) for t, w in zip(t_list, s_data[mode]['weights'])},
-                    "metrics": {
-                        "return": round(s_data[mode]['metrics']['return']*100, 1),
-                        "sharpe": round(s_data[mode]['metrics']['sharpe'], 2),
-                        "volatility": round(s_data[mode]['metrics']['volatility']*100, 1),
-                        "var": s_data[mode]['metrics']['var'] # <--- THIS WAS MISSING
-                    },
-                    "history": s_data[mode]['history'],
-                    "drawdowns": s_data[mode]['drawdowns'],
-                    "risk_decomposition": s_data[mode]['risk_decomposition']
-                }
-
-        print(f"[Timing] Total Request: {time.time() - start_total:.2f}s")
-        return jsonify({
-            "status": "success",
-            "meta": {
-                "lookback": result['lookback_days'], 
-                "shrinkage": round(result['shrinkage'], 4),
-                "diagnostics": {"correlation": result['correlation']},
-                "dendrogram": dendrogram_b64,
-                "frontier": frontier_cloud
-            },
-            "recent_prices": last_prices,
-            "strategies": formatted,
-            "benchmarks": benchmarks
-        })
+    return dict(tickers=tickers, min_w=min_w, max_w=max_w, target_mode=target_mode, var_method=var_method, target_value=target_value,
+                frontier_samples=frontier_samples, shrinkage_target=shrinkage_target, dendrogram_mode=dendrogram_mode,
+                universe=universe, history=history)
+
+def _select_prices(all_prices, tickers, max_w, universe, history):
+    """The request's price panel out of a download: (prices, valid tickers, clustered, screened_out)."""
+    valid_tickers = [t for t in tickers if t in all_prices.columns]
+    if len(valid_tickers) < 2: raise InputError("Need 2+ valid tickers.")
+    
+    prices = all_prices[valid_tickers]
+    clustered = use_clusters(universe, len(valid_tickers))
+    screened_out = {}
+    if clustered:
+        # Screen the ragged panel before dropna, so a recent listing can't cut everyone's history
+        prices, screened_out = prescreen(prices)
+        if len(prices.columns) < 2: raise InputError("Need 2+ tickers after screening.")
+        if len(prices.columns) * max_w < 1: raise InputError("max_weight is too small for the screened universe.")
+    if history == 'common':
+        prices = prices.dropna()
+    else:
+        # Pairwise: one recent listing no longer truncates everyone's history
+        prices = prices.dropna(how='all')
+        short = [t for t, c in prices.count().items() if c < 30]
+        if short: raise InputError(f"Insufficient history for {', '.join(short)}.")
+        # A history that ends early leaves the shortest lookback window with nothing to estimate
+        stale = [t for t, c in prices.iloc[-DEFAULT_WINDOWS[0]:].count().items() if c < 30]
+        if stale: raise InputError(f"Insufficient recent history for {', '.join(stale)}.")
+    if prices.shape[0] < 30: raise InputError("Insufficient history.")
+    return prices, valid_tickers, clustered, screened_out
+
+def _run_pipeline(data, columnar, progress):
+    def report(name):
+        if progress: progress(name)
+
+    opts = _parse_options(data)
+    (tickers, min_w, max_w, target_mode, var_method, target_value, frontier_samples,
+     shrinkage_target, dendrogram_mode, universe, history) = (opts[k] for k in OPTION_KEYS)
+
+    rf_rate = get_risk_free_rate()
+    print(f"Risk Free Rate: {rf_rate*100:.2f}%")
+
+    report("download")
+    with stage("download"):
+        all_prices = fetch_market_data(tickers, period="3y", clean=False)
+    
+    prices, valid_tickers, clustered, screened_out = _select_prices(all_prices, tickers, max_w, universe, history)
+
+    # Identical basket + constraints on the same price date -> reuse the earlier payload
+    price_date = prices.index[-1].strftime('%Y-%m-%d')
+    cache_key = make_key(tickers=sorted(valid_tickers), min_w=min_w, max_w=max_w, target_mode=target_mode, target_value=target_value,
+                         rf_bps=rf_bucket(rf_rate), price_date=price_date, columnar=columnar, frontier_samples=frontier_samples,
+                         shrinkage_target=shrinkage_target, dendrogram=dendrogram_mode, var_method=var_method, clustered=clustered, history=history)
+    with stage("cache_lookup"):
+        result_cache.observe_price_date(price_date)
+        cached = result_cache.get(cache_key)
+    if cached is not None:
+        source = cached.get('_dendrogram_source')
+        # The image URL outlives the renderer's LRU and restarts; queue the render again if it is gone
+        if source: get_dendrogram_renderer().restore(source['key'], source['labels'], source['linkage'], dendrogram_mode)
+        return {k: v for k, v in cached.items() if k != '_dendrogram_source'}
+
+    # 1. Main Optimization
+    with stage("optimize"):
+        result = find_optimal_allocations(prices, min_w, max_w, rf_rate, target_value, target_mode, columnar=columnar, progress=progress,
+                                          shrinkage_target=shrinkage_target, var_method=var_method,
+                                          universe="clustered" if clustered else "dense", history=history)
+
+    # 2. Visuals
+    report("visuals")
+    with stage("visuals"):
+        dendrogram = None if dendrogram_mode == 'none' else dendrogram_tree(result['debug_cov'].columns, result['debug_linkage'])
+        dendrogram_image = dendrogram_source = None
+        if dendrogram_mode in IMAGE_FORMATS:
+            key = get_dendrogram_renderer().submit(result['debug_cov'], result['debug_linkage'], dendrogram_mode)
+            dendrogram_image = f"/api/dendrogram/{key}.{dendrogram_mode}"
+            # Kept with the cached payload (not sent) so a cache hit can render the image again
+            dendrogram_source = {"key": key, "labels": list(result['debug_cov'].columns), "linkage": result['debug_linkage']}
+        if clustered:
+            # Drawn over the cluster composites: an n-asset frontier is neither cheap nor readable at this size
+            composites = result['composites']
+            frontier_cloud = generate_efficient_frontier(composites['mean'], composites['cov'], frontier_samples)
+            frontier_curve = generate_frontier_curve(composites['mean'], composites['cov'])
+        else:
+            frontier_cloud = generate_efficient_frontier(result['debug_mean'], result['debug_cov'], frontier_samples)
+            frontier_curve = generate_frontier_curve(result['debug_mean'], result['debug_cov'], min_w, max_w)
+
+    # 3. Benchmarks
+    report("benchmarks")
+    with stage("benchmarks"):
+        # Keyed on the download's last date; an older one (a stale basket) slices the current day
+        benchmarks, benchmark_dates = benchmark_cache.get(prices.index, rf_rate, all_prices.index[-1].strftime('%Y-%m-%d'), columnar)
+
+    # 4. Recent Prices
+    last_prices = []
+    for date, row in prices.tail(5).sort_index(ascending=False).iterrows():
+        row_dict = {"date": date.strftime('%Y-%m-%d')}
+        row_dict.update({k: round(v, 2) for k, v in row.items() if v == v})  # v == v skips NaN (pairwise history)
+        last_prices.append(row_dict)
+
+    # 5. Format Strategies
+    formatted = _format_strategies(result['strategies'], list(prices.columns))
+
+    payload = {
+        "status": "success",
+        "meta": {
+            "lookback": result['lookback_days'], 
+            "shrinkage": round(result['shrinkage'], 4),
+            "diagnostics": {"correlation": result['correlation']},
+            "dendrogram": dendrogram,
+            "dendrogram_image": dendrogram_image,
+            "frontier": frontier_cloud,
+            "frontier_curve": frontier_curve,
+            "universe": {"clustered": clustered, "screened_out": screened_out, "clusters": result['clusters']}
+        },
+        "recent_prices": last_prices,
+        "strategies": formatted,
+        "benchmarks": benchmarks
+    }
+    if columnar:
+        # Columnar mode: each history/drawdown is a bare value list aligned with one of these axes
+        payload["axes"] = {"strategies": result['history_dates'], "benchmarks": benchmark_dates}
 
+    result_cache.put(cache_key, {**payload, "_dendrogram_source": dendrogram_source} if dendrogram_source else payload, price_date)
+    return payload
+
+def _format_strategies(strategies, t_list):
+    """Strategy results as the API sends them: allocations and metrics in percent."""
+    formatted = {}
+    for s_name, s_data in strategies.items():
+        formatted[s_name] = {}
+        for mode in ['unconstrained', 'constrained']:
+            formatted[s_name][mode] = {
+                "allocation": {t: round(w*100, 1) for t, w in zip(t_list, s_data[mode]['weights'])},
+                "metrics": {
+                    "return": round(s_data[mode]['metrics']['return']*100, 1),
+                    "sharpe": round(s_data[mode]['metrics']['sharpe'], 2),
+                    "volatility": round(s_data[mode]['metrics']['volatility']*100, 1),
+                    "var": s_data[mode]['metrics']['var'],
+                    "cvar": s_data[mode]['metrics']['cvar'],
+                    "risk": s_data[mode]['metrics']['risk']
+                },
+                "history": s_data[mode]['history'],
+                "drawdowns": s_data[mode]['drawdowns'],
+                "risk_decomposition": s_data[mode]['risk_decomposition']
+            }
+    return formatted
+
+@app.route('/api/optimize', methods=['POST'])
+def optimize_portfolio():
+    try:
+        columnar = wants_columnar(request)
+        payload = run_optimization(request.json, columnar)
+        with stage("encode"):
+            return json_response(app, payload, columnar=columnar, accept_encoding=request.headers.get('Accept-Encoding'))
+    except InputError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/optimize/batch', methods=['POST'])
+def optimize_batch():
+    """
+    Scenario sweep over one download, streamed as NDJSON. Body: any /api/optimize field as the
+    default, plus "scenarios": a list of overrides (bounds, target, var_method, a ticker subset...).
+
+    Lines: a "group" line when a ticker set is first fitted (lookback, shrinkage, benchmarks), one
+    "scenario" or "error" line per scenario in order as it finishes, then a "summary". Scenarios on
+    the same tickers and options share one fit (returns, lookback search, covariance and means).
+    Scenarios with the same bounds share the solves; other bounds warm-start the constrained
+    solves from the solved scenario with the nearest bounds ("solve": reused / warm / cold).
+    """
+    data = request.json or {}
+    scenarios = data.get('scenarios')
+    if not isinstance(scenarios, list) or not scenarios: return jsonify({"error": "scenarios must be a non-empty list."}), 400
+    if len(scenarios) > BATCH_MAX_SCENARIOS: return jsonify({"error": f"At most {BATCH_MAX_SCENARIOS} scenarios per batch."}), 400
+    columnar = wants_columnar(request)
+    base = {k: v for k, v in data.items() if k != 'scenarios'}
+    specs = []
+    for scenario in scenarios:
+        try:
+            if not isinstance(scenario, dict): raise InputError("Each scenario must be an object.")
+            specs.append(_parse_options({**base, **scenario}))
+        except (ValueError, TypeError) as e: specs.append(e if isinstance(e, InputError) else InputError(str(e)))
+    union = sorted({t for o in specs if isinstance(o, dict) for t in o['tickers']})
+    if not union: return jsonify({"error": f"No valid scenarios: {specs[0]}"}), 400
+
+    try:
+        rf_rate = get_risk_free_rate()
+        with stage("download"):
+            # The union of every scenario's tickers, once
+            all_prices = fetch_market_data(union, period="3y", clean=False)
+    except Exception as e:
+        app.logger.exception("Batch download failed")
+        return jsonify({"error": str(e)}), 500
+
+    def stream():
+        t0 = time.perf_counter()
+        groups = {}  # (tickers, clustered, shrinkage_target, history) -> fitted regime and its solved bounds
+        counts = {"solved": 0, "errors": 0, "reused": 0, "warm": 0, "cold": 0}
+        for i, opts in enumerate(specs):
+            t1 = time.perf_counter()
+            try:
+                if isinstance(opts, Exception): raise opts
+                prices, _, clustered, screened_out = _select_prices(all_prices, opts['tickers'], opts['max_w'], opts['universe'], opts['history'])
+                key = (tuple(sorted(prices.columns)), clustered, opts['shrinkage_target'], opts['history'])
+                group = groups.get(key)
+                if group is None:
+                    regime = fit_regime(prices, rf_rate, shrinkage_target=opts['shrinkage_target'],
+                                        universe="clustered" if clustered else "dense", history=opts['history'])
+                    group = groups[key] = {"id": len(groups), "regime": regime, "tickers": list(prices.columns), "solved": []}
+                    benchmarks, benchmark_dates = benchmark_cache.get(prices.index, rf_rate, all_prices.index[-1].strftime('%Y-%m-%d'), columnar)
+                    line = {"type": "group", "group": group['id'], "tickers": group['tickers'], "screened_out": screened_out,
+                            "lookback": int(regime['window']), "shrinkage": round(regime['stats']['shrink'], 4), "benchmarks": benchmarks}
+                    if columnar: line["axes"] = {"strategies": history_dates(regime['stats']['returns'].index), "benchmarks": benchmark_dates}
+                    yield dumps(line) + b"\n"
+                regime, box = group['regime'], (opts['min_w'], opts['max_w'])
+
+                with stage("batch_scenario"):
+                    exact = next((e for e in group['solved'] if e['box'] == box), None)
+                    nearest = min(group['solved'], key=lambda e: abs(e['box'][0] - box[0]) + abs(e['box'][1] - box[1]), default=None)
+                    if exact is not None: solution, source, origin = exact['solution'], "reused", exact['index']
+                    else:
+                        solution = solve_strategies(regime, *box, rf_rate, warm=nearest['solution'] if nearest else None)
+                        warm = nearest is not None and not regime['clustered']
+                        source, origin = ("warm", nearest['index']) if warm else ("cold", None)
+                        group['solved'].append({"box": box, "solution": solution, "index": i})
+                    result = strategy_results(regime, *solution, rf_rate, opts['target_value'], opts['target_mode'], opts['var_method'], columnar)
+                counts["solved"] += 1; counts[source] += 1
+                yield dumps({"type": "scenario", "index": i, "group": group['id'], "solve": source, "solved_from": origin,
+                             "seconds": round(time.perf_counter() - t1, 4),
+                             "strategies": _format_strategies(result['strategies'], group['tickers'])}) + b"\n"
+            except Exception as e:
+                if not isinstance(e, InputError): app.logger.exception("Batch scenario %d failed", i)
+                counts["errors"] += 1
+                yield dumps({"type": "error", "index": i, "error": str(e)}) + b"\n"
+        yield dumps({"type": "summary", "scenarios": len(specs), "groups": len(groups), **counts,
+                     "seconds": round(time.perf_counter() - t0, 4)}) + b"\n"
+    return app.response_class(stream(), mimetype='application/x-ndjson')
+
+@app.route('/api/backtest', methods=['POST'])
+def backtest():
+    """
+    Walk-forward backtest streamed as NDJSON: one "period" line per rebalance, then a "summary" line.
+    Body: tickers, min_weight/max_weight (%), window (days), rebalance (days or weekly/monthly/quarterly),
+    period (e.g. "10y", "max"), strategies, shrinkage_target.
+    """
+    data = request.json or {}
+    tickers = data.get('tickers', [])
+    if not tickers or len(tickers) < 2: return jsonify({"error": "Need 2+ tickers."}), 400
+    try:
+        min_w = float(data.get('min_weight', 0)) / 100.0
+        max_w = float(data.get('max_weight', 100)) / 100.0
+        window = int(data.get('window', 252))
+        schedule = data.get('rebalance', 'monthly')
+        strategies = [s for s in data.get('strategies', STRATEGIES) if s in STRATEGIES]
+        shrinkage_target = data.get('shrinkage_target', 'identity')
+        if window < 30 or not strategies: raise ValueError("Need window >= 30 and at least one known strategy.")
+        if shrinkage_target not in SHRINKAGE_TARGETS: raise ValueError(f"shrinkage_target must be one of {', '.join(SHRINKAGE_TARGETS)}.")
+        all_prices = fetch_market_data(tickers, period=data.get('period', '10y'), clean=False)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    valid = [t for t in tickers if t in all_prices.columns]
+    if len(valid) < 2: return jsonify({"error": "Need 2+ valid tickers."}), 400
+    returns = all_prices[valid].dropna().pct_change().dropna()
+    if len(returns) <= window + 1: return jsonify({"error": "Insufficient history for the window."}), 400
+    rf_rate = get_risk_free_rate()
+    try:
+        records = walk_forward(returns, window, schedule, min_w, max_w, rf_rate, strategies, shrinkage_target=shrinkage_target)
+        first = next(records, None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def stream():
+        if first is None: return
+        yield dumps(first) + b"\n"
+        for record in records: yield dumps(record) + b"\n"
+    return app.response_class(stream(), mimetype='application/x-ndjson')
+
+@app.route('/api/dendrogram/<key>.<fmt>', methods=['GET'])
+def dendrogram_image(key, fmt):
+    """Image from a response's meta.dendrogram_image; waits if it is still rendering."""
+    body = get_dendrogram_renderer().get(key, fmt) if fmt in IMAGE_FORMATS else None
+    if body is None: return jsonify({"error": "Unknown or expired dendrogram; re-run the optimization."}), 404
+    # The key is a content hash, so the image at this URL never changes
+    return app.response_class(body, mimetype=IMAGE_FORMATS[fmt], headers={"Cache-Control": "public, max-age=86400, immutable"})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+# --- Async jobs: submit, poll progress, fetch result ---
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data = request.json or {}
+    tickers = data.get('tickers', [])
+    if not tickers or len(tickers) < 2: return jsonify({"error": "Need 2+ tickers."}), 400
+    columnar = wants_columnar(request)
+    try:
+        job = jobs.submit(run_optimization, data, columnar)
+    except QueueFull:
+        return jsonify({"error": "Too many queued optimizations. Try again shortly."}), 429
+    job.columnar = columnar
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None: return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None: return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None: return jsonify({"error": "Unknown job."}), 404
+    if job.status == "failed": return jsonify({"error": job.error}), 400 if isinstance(job.exception, InputError) else 500
+    if job.status != "done": return jsonify(job.to_dict()), 409
+    return json_response(app, job.result, columnar=job.columnar, accept_encoding=request.headers.get('Accept-Encoding'))
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
\ No newline at end of file
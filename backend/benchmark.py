@@ -0,0 +1,355 @@
+"""
+Offline, reproducible benchmark suite.
+
+Prices come from a seeded factor model, so every run sees identical inputs and needs no
+network. Each case (ticker count x history length) times every pipeline stage on its own;
+results are written as JSON and can be checked against a stored baseline.
+
+    python benchmark.py                                   # quick sweep, print table
+    python benchmark.py --profile full --output out.json  # 10 -> 1000 tickers
+    python benchmark.py --baseline benchmark_baseline.json  # exit 1 on regression
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --execution process --workers 4    # pipeline stage on a process pool
+    python benchmark.py --startup                          # cold import + first-request latency
+    python benchmark.py --gradients                        # SLSQP: finite-difference vs analytic gradients
+
+Timings only compare on the host that recorded them: the baseline stores the host name, CPU
+model and count, and the gate is skipped (with a warning) elsewhere unless --force is given.
+The baseline is re-recorded in a commit of its own, never alongside a change it would gate.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+import scipy
+from portfolio_lib.math_utils import get_shrunk_covariance, portfolio_kernel, format_history
+from portfolio_lib.lookback import DEFAULT_WINDOWS, window_statistics, ewma_mean
+from portfolio_lib.optimizers import find_optimal_allocations, run_risk_budgeting, run_risk_parity, run_max_sharpe, run_hrp, run_min_cvar
+from portfolio_lib.frontier import sample_portfolios, trace_frontier
+from portfolio_lib.price_store import PriceStore, FrameProvider
+from portfolio_lib.serialization import dumps, compress
+from portfolio_lib.execution import StrategyExecutor
+
+PROFILES = {
+    # (ticker counts at the default history, history lengths at the default ticker count)
+    "quick": {"tickers": (10, 50, 200), "days": (252, 756, 1260)},
+    "full": {"tickers": (10, 50, 200, 500, 1000), "days": (252, 756, 1260, 2520)},
+}
+DEFAULT_TICKERS = 50
+DEFAULT_DAYS = 756
+
+STAGES = [
+    "returns", "shrinkage", "window_stats", "ewma",
+    "risk_parity", "risk_parity_constrained", "max_sharpe", "max_sharpe_constrained", "hrp",
+    "min_cvar", "min_cvar_constrained",
+    "frontier_cloud", "frontier_curve", "metrics",
+    "encode_records", "encode_columnar", "compress",
+    "price_store_cold", "price_store_warm", "pipeline",
+]
+# Dominated by filesystem latency (even in CPU time), which varies run to run by more than any
+# sensible threshold; they are reported but not gated
+IO_STAGES = {"price_store_cold", "price_store_warm"}
+# SLSQP stages scale roughly cubically; above these sizes a single run takes minutes
+STAGE_MAX_TICKERS = {"max_sharpe": 500, "frontier_curve": 200, "pipeline": 500}
+
+
+def factor_panel(n_tickers, days, n_factors=4, seed=0):
+    """Correlated prices: a market factor plus style factors, idiosyncratic noise and per-asset drift."""
+    rng = np.random.default_rng(seed)
+    betas = rng.normal(0, 0.6, (n_tickers, n_factors))
+    betas[:, 0] = rng.uniform(0.5, 1.5, n_tickers)
+    factors = rng.normal(0, 0.008, (days, n_factors))
+    idio = rng.normal(0, 1, (days, n_tickers)) * rng.uniform(0.006, 0.02, n_tickers)
+    drift = rng.normal(3e-4, 3e-4, n_tickers)
+    rets = drift + factors @ betas.T + idio
+    dates = pd.bdate_range("2015-01-02", periods=days)
+    return pd.DataFrame(100 * np.exp(np.cumsum(rets, axis=0)), index=dates, columns=[f"T{i:04d}" for i in range(n_tickers)])
+
+
+def time_stage(fn, min_time=0.2, min_repeat=3, max_repeat=5, budget=5.0):
+    """
+    Best-of-n timing: at least `min_repeat` runs (fewer once `budget` seconds are spent),
+    more up to `max_repeat` until `min_time` has elapsed. Returns (timing, result).
+    """
+    runs = []; cpu = []; result = None
+    while not runs or (len(runs) < max_repeat and sum(runs) < budget and (len(runs) < min_repeat or sum(runs) < min_time)):
+        t0, c0 = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()): result = fn()
+        runs.append(time.perf_counter() - t0); cpu.append(time.process_time() - c0)
+    return {"min": round(min(runs), 6), "median": round(float(np.median(runs)), 6),
+            "cpu_min": round(min(cpu), 6), "repeat": len(runs)}, result
+
+
+def run_case(n_tickers, days, seed=0, limits=True, min_time=0.2, executor=None):
+    prices = factor_panel(n_tickers, days, seed=seed)
+    max_w = min(1.0, 5.0 / n_tickers)
+    rf_rate = 0.045
+    stages = {}
+    def stage(name, fn):
+        if limits and n_tickers > STAGE_MAX_TICKERS.get(name, np.inf):
+            stages[name] = {"skipped": f"tickers > {STAGE_MAX_TICKERS[name]}"}
+            return None
+        stages[name], result = time_stage(fn, min_time)
+        return result
+
+    returns = stage("returns", lambda: prices.pct_change().dropna())
+    window = returns.iloc[-min(len(returns), max(DEFAULT_WINDOWS)):]
+    cov_df, _ = stage("shrinkage", lambda: get_shrunk_covariance(window))
+    stage("window_stats", lambda: list(window_statistics(returns.values, DEFAULT_WINDOWS)))
+    mean = stage("ewma", lambda: ewma_mean(window.values, span=len(window)))
+    cov = cov_df.values
+
+    w_rp = stage("risk_parity", lambda: run_risk_budgeting(cov))
+    stage("risk_parity_constrained", lambda: run_risk_budgeting(cov, 0.0, max_w))
+    w_ms = stage("max_sharpe", lambda: run_max_sharpe(mean, cov, rf_rate, fast=True))
+    stage("max_sharpe_constrained", lambda: run_max_sharpe(mean, cov, rf_rate, 0.0, max_w, fast=True))
+    w_hrp = stage("hrp", lambda: run_hrp(cov))
+    w_mc = stage("min_cvar", lambda: run_min_cvar(window.values))
+    stage("min_cvar_constrained", lambda: run_min_cvar(window.values, 0.0, max_w))
+    stage("frontier_cloud", lambda: sample_portfolios(mean, cov, 2000))
+    stage("frontier_curve", lambda: trace_frontier(mean, cov, 0.0, max_w))
+
+    W = np.array([w for w in (w_rp, w_ms, w_hrp, w_mc) if w is not None])
+    k = stage("metrics", lambda: portfolio_kernel(W, mean, cov, window, rf_rate))
+    def encode(columnar):
+        return dumps({f"p{i}": dict(zip(("history", "drawdowns"), format_history(window.index, k["cumulative"][:, i], k["drawdown"][:, i], columnar)))
+                      for i in range(len(W))})
+    body = stage("encode_records", lambda: encode(False))
+    stage("encode_columnar", lambda: encode(True))
+    stage("compress", lambda: compress(body, "gzip"))
+
+    with tempfile.TemporaryDirectory() as root:
+        tickers = list(prices.columns)
+        def cold():
+            for name in os.listdir(root): os.remove(os.path.join(root, name))
+            return PriceStore(root, FrameProvider(prices)).get_prices(tickers, "max")
+        stage("price_store_cold", cold)
+        store = PriceStore(root, FrameProvider(prices))
+        store.get_prices(tickers, "max")
+        stage("price_store_warm", lambda: store.get_prices(tickers, "max"))
+
+    stage("pipeline", lambda: find_optimal_allocations(prices, 0.0, max_w, rf_rate, executor=executor or StrategyExecutor("serial")))
+    return {"tickers": n_tickers, "days": days, "stages": stages}
+
+
+# Runs in a fresh interpreter so imports are cold. Prices come from factor_panel through an
+# in-memory provider and the risk-free rate is fixed, so nothing touches the network.
+STARTUP_SCRIPT = r"""
+import sys, io, time, json, tempfile, contextlib
+t0 = time.perf_counter()
+import app
+out = {"import": time.perf_counter() - t0, "modules": len(sys.modules), "warmup": app.warmup_timings}
+import pandas as pd
+import portfolio_lib.data as data
+from portfolio_lib.price_store import PriceStore, FrameProvider
+from benchmark import factor_panel
+n = int(sys.argv[1])
+prices = factor_panel(n + 5, 800)
+prices.columns = [f"T{i:04d}" for i in range(n)] + ["SPY", "BND", "GLD", "SHY", "TLT"]
+prices.index = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=len(prices))
+data._default_store = PriceStore(tempfile.mkdtemp(), FrameProvider(prices))
+app.get_risk_free_rate = lambda: 0.045
+client = app.app.test_client()
+for name, max_weight in (("first_request", 60), ("second_request", 50)):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        status = client.post("/api/optimize", json={"tickers": list(prices.columns[:n]), "max_weight": max_weight}).status_code
+    out[name] = time.perf_counter() - t0
+    if status != 200: raise SystemExit(f"{name} returned {status}")
+print(json.dumps(out))
+"""
+
+
+def startup_benchmark(n_tickers=20, repeat=3):
+    """
+    Worker cold start, measured in fresh interpreters: `import app`, then the first and a
+    second (uncached) optimize request. "lazy" is the default boot; "preload" sets PRELOAD=1,
+    so the import also pays for the warm-up. Best of `repeat` runs per mode.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for mode in ("lazy", "preload"):
+        env = {k: v for k, v in os.environ.items() if k not in ("PRELOAD", "RESULT_CACHE_DIR")}
+        if mode == "preload": env["PRELOAD"] = "1"
+        runs = []
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, str(n_tickers)], cwd=here, env=env,
+                                  capture_output=True, text=True, check=True)
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        results[mode] = {k: round(min(r[k] for r in runs), 4) for k in ("import", "first_request", "second_request")}
+        results[mode].update(modules=runs[0]["modules"], warmup=runs[0]["warmup"])
+    return {"tickers": n_tickers, "repeat": repeat, "environment": environment(), "modes": results}
+
+
+def print_startup(results):
+    print(f"{'mode':<10}{'import':>10}{'1st req':>10}{'2nd req':>10}{'modules':>9}")
+    for mode, r in results["modes"].items():
+        print(f"{mode:<10}" + "".join(f"{r[k] * 1000:>8.0f}ms" for k in ("import", "first_request", "second_request")) + f"{r['modules']:>9}")
+
+
+def gradient_benchmark(sizes=(25, 100, 500), seed=1):
+    """
+    Risk Parity and Max Sharpe SLSQP solves with finite-difference gradients (`fast=False`)
+    against the closed-form ones (`fast=True`) on a 3-factor covariance: time, iterations,
+    evaluations and the largest weight difference. One run each; the slow side takes seconds.
+    """
+    rng = np.random.default_rng(seed)
+    run_risk_parity(np.eye(2), fast=True)  # The first solve would also pay for importing scipy.optimize
+    rows = []
+    for n in sizes:
+        B = rng.normal(0, 0.01, (n, 3))
+        cov = B @ B.T + np.diag(rng.uniform(1e-5, 4e-4, n))
+        mean = rng.normal(4e-4, 3e-4, n)
+        for name, solve in (("risk_parity", lambda fast: run_risk_parity(cov, fast=fast, return_info=True)),
+                            ("max_sharpe", lambda fast: run_max_sharpe(mean, cov, 0.045, fast=fast, return_info=True))):
+            row = {"tickers": n, "solver": name}
+            for label, fast in (("finite_diff", False), ("analytic", True)):
+                t0 = time.perf_counter(); w, info = solve(fast)
+                row[label] = {"time": round(time.perf_counter() - t0, 4), "nit": info["nit"], "nfev": info["nfev"]}
+                row[label + "_weights"] = w
+            row["speedup"] = round(row["finite_diff"]["time"] / max(row["analytic"]["time"], 1e-9), 1)
+            row["max_dw"] = float(np.max(np.abs(row.pop("finite_diff_weights") - row.pop("analytic_weights"))))
+            rows.append(row)
+    return {"environment": environment(), "cases": rows}
+
+
+def print_gradients(results):
+    print(f"{'solver':<13}{'n':>5}{'finite-diff':>13}{'nfev':>7}{'analytic':>11}{'nfev':>7}{'speedup':>9}{'max |dw|':>10}")
+    for r in results["cases"]:
+        fd, an = r["finite_diff"], r["analytic"]
+        print(f"{r['solver']:<13}{r['tickers']:>5}{fd['time'] * 1000:>11.0f}ms{fd['nfev']:>7}{an['time'] * 1000:>9.0f}ms{an['nfev']:>7}"
+              f"{r['speedup']:>8.1f}x{r['max_dw']:>10.1e}")
+
+
+# Environment fields that must match for timings to be comparable at all
+HOST_KEYS = ("host", "cpu", "cpus")
+
+
+def cpu_model():
+    """CPU model name (from /proc/cpuinfo on Linux), else what platform reports."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"): return line.split(":", 1)[1].strip()
+    except OSError: pass
+    return platform.processor() or platform.machine()
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "scipy": scipy.__version__,
+            "pandas": pd.__version__, "platform": platform.platform(), "host": platform.node(), "cpu": cpu_model(),
+            "cpus": os.cpu_count()}
+
+
+def run_suite(profile="quick", seed=0, limits=True, min_time=0.2, executor=None):
+    spec = PROFILES[profile]
+    cases = [(n, DEFAULT_DAYS) for n in spec["tickers"]] + [(DEFAULT_TICKERS, d) for d in spec["days"] if d != DEFAULT_DAYS]
+    results = []
+    for n, days in cases:
+        t0 = time.perf_counter()
+        results.append(run_case(n, days, seed, limits, min_time, executor))
+        print(f"[Benchmark] {n} tickers x {days} days: {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return {"profile": profile, "seed": seed, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "execution": executor.mode if executor else "serial", "environment": environment(), "cases": results}
+
+
+def compare(results, baseline, threshold=0.5, min_delta=0.01):
+    """
+    Stages whose best time exceeds the baseline's median by more than `threshold` (and by at
+    least `min_delta` seconds). Comparing best against median keeps a lucky baseline run from
+    flagging ordinary noise. IO_STAGES are not compared.
+    """
+    base = {(c["tickers"], c["days"]): c["stages"] for c in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        ref = base.get((case["tickers"], case["days"]), {})
+        for name, t in case["stages"].items():
+            if name in IO_STAGES or "min" not in t or "median" not in ref.get(name, {}): continue
+            old, new = ref[name]["median"], t["min"]
+            if new > old * (1 + threshold) and new - old > min_delta:
+                regressions.append({"tickers": case["tickers"], "days": case["days"], "stage": name,
+                                    "baseline": old, "current": new, "ratio": round(new / old, 2)})
+    return regressions
+
+
+def confirm(results, baseline, threshold=0.5, limits=True, min_time=0.2, executor=None):
+    """
+    Re-runs every case with a flagged stage and keeps each stage's best time across both runs,
+    so only slowdowns that reproduce are reported. Returns the remaining regressions.
+    """
+    flagged = {(r["tickers"], r["days"]) for r in compare(results, baseline, threshold)}
+    for case in results["cases"]:
+        if (case["tickers"], case["days"]) not in flagged: continue
+        rerun = run_case(case["tickers"], case["days"], results["seed"], limits, min_time, executor)
+        for name, t in rerun["stages"].items():
+            if "min" in t: case["stages"][name]["min"] = min(case["stages"][name]["min"], t["min"])
+    return compare(results, baseline, threshold)
+
+
+def print_table(results):
+    cases = results["cases"]
+    print(f"{'stage':<24}" + "".join(f"{c['tickers']:>5}x{c['days']:<5}" for c in cases))
+    for name in STAGES:
+        cells = [c["stages"].get(name, {}) for c in cases]
+        print(f"{name:<24}" + "".join(f"{t['min'] * 1000:>9.1f}ms" if "min" in t else f"{'-':>11}" for t in cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=0.2, help="keep repeating short stages until this many seconds have elapsed")
+    parser.add_argument("--no-limits", action="store_true", help="run SLSQP stages at every size (slow above a few hundred tickers)")
+    parser.add_argument("--execution", choices=["serial", "thread", "process"], default="serial", help="executor for the pipeline stage")
+    parser.add_argument("--workers", type=int, help="executor workers (default: CPU count)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON and exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown ratio before a stage counts as regressed")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--force", action="store_true", help="gate against a baseline recorded on another host")
+    parser.add_argument("--startup", action="store_true", help="only measure worker cold start (import and first requests)")
+    parser.add_argument("--gradients", action="store_true", help="only compare finite-difference and analytic SLSQP gradients")
+    args = parser.parse_args(argv)
+
+    if args.startup or args.gradients:
+        results = startup_benchmark() if args.startup else gradient_benchmark()
+        (print_startup if args.startup else print_gradients)(results)
+        if args.output:
+            with open(args.output, "w") as f: json.dump(results, f, indent=1)
+        return 0
+
+    gate = bool(args.baseline)
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        env, base_env = environment(), baseline.get("environment", {})
+        mismatched = [k for k in HOST_KEYS if base_env.get(k) != env[k]]
+        if mismatched and not args.force:
+            print(f"Warning: baseline was recorded on another host ({', '.join(mismatched)} differ); "
+                  "skipping the regression gate (--force to gate anyway)")
+            gate = False
+        elif base_env != env:
+            print("Note: baseline was recorded with different library versions; timings may not be comparable")
+
+    executor = StrategyExecutor(args.execution, args.workers)
+    results = run_suite(args.profile, args.seed, not args.no_limits, args.min_time, executor)
+    regressions = confirm(results, baseline, args.threshold, not args.no_limits, args.min_time, executor) if gate else []
+
+    print_table(results)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f: json.dump(results, f, indent=1)
+    for r in regressions:
+        print(f"REGRESSION {r['stage']} @ {r['tickers']}x{r['days']}: {r['baseline'] * 1000:.1f}ms -> {r['current'] * 1000:.1f}ms ({r['ratio']}x)")
+    if gate and not regressions: print(f"No regressions beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
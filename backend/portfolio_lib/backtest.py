@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from .lookback import RollingEWMA
+from .shrinkage import RollingLedoitWolf
+from .optimizers import run_risk_budgeting, run_max_sharpe, run_min_cvar
+from .hrp import hrp_allocation
+from .instrumentation import stage
+
+STRATEGIES = ("Risk Parity", "Max Sharpe", "HRP", "Min CVaR")
+SCHEDULES = {"weekly": "W", "monthly": "M", "quarterly": "Q"}
+
+
+def rebalance_points(dates, window, schedule="monthly"):
+    """
+    Row positions (in the returns index) at which to re-optimize. The first point is the
+    first row with `window` rows of history; `schedule` is a number of trading days or
+    weekly/monthly/quarterly (last trading day of each calendar period).
+    """
+    T = len(dates)
+    if T <= window: return []
+    if isinstance(schedule, (int, np.integer)) or str(schedule).isdigit():
+        step = max(int(schedule), 1)
+        return list(range(window - 1, T - 1, step))
+    if schedule not in SCHEDULES: raise ValueError(f"Unknown rebalance schedule: {schedule}")
+    periods = pd.DatetimeIndex(dates).to_period(SCHEDULES[schedule])
+    last_of_period = np.flatnonzero(periods[1:] != periods[:-1])
+    return [window - 1] + [int(t) for t in last_of_period if window - 1 < t < T - 1]
+
+
+class _Tally:
+    """Running out-of-sample stats for one strategy; O(1) memory however long the backtest."""
+
+    def __init__(self):
+        self.days = 0; self.s = 0.0; self.ss = 0.0
+        self.equity = 1.0; self.peak = 1.0; self.max_dd = 0.0
+        self.turnover = 0.0; self.rebalances = 0
+
+    def update(self, daily, turnover):
+        self.days += len(daily); self.s += daily.sum(); self.ss += daily @ daily
+        curve = self.equity * np.cumprod(1 + daily)
+        peaks = np.maximum.accumulate(np.concatenate([[self.peak], curve]))[1:]
+        self.max_dd = min(self.max_dd, float(np.min(curve / peaks - 1)))
+        self.equity = float(curve[-1]); self.peak = float(peaks[-1])
+        self.turnover += turnover; self.rebalances += 1
+        return curve
+
+    def summary(self, rf_rate):
+        if not self.days: return {}
+        mean = self.s / self.days
+        vol = np.sqrt(max(self.ss / self.days - mean ** 2, 0.0)) * np.sqrt(252)
+        ret = mean * 252
+        return {"return": ret, "volatility": vol, "sharpe": (ret - rf_rate) / max(vol, 0.05),
+                "total_return": self.equity - 1, "max_drawdown": self.max_dd,
+                "avg_turnover": self.turnover / self.rebalances, "days": self.days}
+
+
+def walk_forward(returns, window=252, schedule="monthly", min_w=0.0, max_w=1.0, rf_rate=0.0,
+                 strategies=STRATEGIES, resync=24, shrinkage_target="identity"):
+    """
+    Walk-forward backtest. At each rebalance point the strategies are fitted on the trailing
+    `window` daily returns and held (drifting, buy-and-hold) until the next point, so every
+    reported return is out of sample.
+
+    The Ledoit-Wolf covariance and EWMA means roll forward incrementally between points
+    (exact sums are recomputed every `resync` rebalances to shed rounding drift), and Risk
+    Parity / Max Sharpe start from the previous rebalance's weights. `shrinkage_target` is one
+    of shrinkage.TARGETS.
+
+    A generator: yields one dict per holding period ("period" records) and finally a
+    "summary" record, keeping only O(window * assets + assets^2) state.
+    """
+    X = np.asarray(returns, dtype=float)
+    dates = returns.index
+    tickers = list(returns.columns)
+    T, p = X.shape
+    points = rebalance_points(dates, window, schedule)
+    if not points: return
+
+    lw = RollingLedoitWolf(p, shrinkage_target)
+    ewma = None
+    prev_weights = {s: None for s in strategies}
+    held = {s: None for s in strategies}
+    tallies = {s: _Tally() for s in strategies}
+    last = None
+    for k, t in enumerate(points):
+        end = points[k + 1] if k + 1 < len(points) else T - 1
+        if end <= t: break
+        with stage("backtest_estimate"):
+            if last is None or k % resync == 0:
+                lw.reset(X[t - window + 1:t + 1])
+                ewma = RollingEWMA(X[t - window + 1:t + 1], span=window)
+            else:
+                lw.add(X[last + 1:t + 1]); lw.remove(X[last - window + 1:t - window + 1])
+                ewma.roll(X[last + 1:t + 1], X[last - window + 1:t - window + 1])
+            cov, shrink = lw.estimate()
+            mean = ewma.mean()
+        last = t
+
+        with stage("backtest_optimize"):
+            weights = {}
+            for s in strategies:
+                if s == "Risk Parity": weights[s] = run_risk_budgeting(cov, min_w, max_w, x0=prev_weights[s])
+                elif s == "Max Sharpe": weights[s] = run_max_sharpe(mean, cov, rf_rate, min_w, max_w, x0=prev_weights[s], fast=True)
+                elif s == "HRP": weights[s] = hrp_allocation(cov)[0]
+                elif s == "Min CVaR": weights[s] = run_min_cvar(X[t - window + 1:t + 1], min_w, max_w)
+                else: raise ValueError(f"Unknown strategy: {s}")
+            prev_weights = weights
+
+        # Hold from the close of t to the close of `end`
+        growth = np.cumprod(1 + X[t + 1:end + 1], axis=0)
+        record = {"type": "period", "rebalance": dates[t].strftime('%Y-%m-%d'),
+                  "dates": [d.strftime('%Y-%m-%d') for d in dates[t + 1:end + 1]],
+                  "shrinkage": round(float(shrink), 4), "strategies": {}}
+        for s, w in weights.items():
+            value = growth @ w
+            daily = value / np.concatenate([[1.0], value[:-1]]) - 1
+            turnover = float(np.abs(w - held[s]).sum()) if held[s] is not None else float(np.abs(w).sum())
+            held[s] = growth[-1] * w / value[-1]
+            curve = tallies[s].update(daily, turnover)
+            record["strategies"][s] = {
+                "weights": {tk: round(float(x) * 100, 2) for tk, x in zip(tickers, w)},
+                "turnover": round(turnover, 4),
+                "period_return": round(float(value[-1] - 1), 6),
+                "equity": np.round(curve, 6).tolist()
+            }
+        yield record
+
+    yield {"type": "summary", "strategies": {s: tallies[s].summary(rf_rate) for s in strategies}}
@@ -0,0 +1,107 @@
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from .math_utils import portfolio_kernel, format_history, history_dates
+from .result_cache import rf_bucket
+from .instrumentation import stage, CACHE_REQUESTS
+
+BENCHMARK_TICKERS = ["SPY", "BND", "GLD", "SHY", "TLT"]
+BENCHMARKS = {"60/40": {"SPY": 0.6, "BND": 0.4}, "Permanent": {"SPY": 0.25, "TLT": 0.25, "GLD": 0.25, "SHY": 0.25}}
+
+
+def benchmark_weights(columns):
+    """(portfolios x columns) weights of BENCHMARKS, renormalized over the columns present."""
+    W = np.zeros((len(BENCHMARKS), len(columns)))
+    for i, w_dict in enumerate(BENCHMARKS.values()):
+        for k, v in w_dict.items():
+            if k in columns: W[i, columns.get_loc(k)] = v
+        if W[i].sum() > 0: W[i] /= W[i].sum()
+    return W
+
+
+@stage("benchmark_compute")
+def benchmark_results(r, W, rf_rate, columnar=False, dates=None):
+    """
+    The fixed benchmark portfolios over the daily benchmark returns `r`: (results by name, date
+    axis or None). `W` is `benchmark_weights(r.columns)`; `dates` is `history_dates(r.index)` if
+    the caller has it.
+    """
+    # Both benchmarks in one pass of the metrics kernel (incl. VaR)
+    kern = portfolio_kernel(W, r.mean(), r.cov(), r, rf_rate)
+    out = {}
+    dates = dates or history_dates(r.index)
+    for i, (name, w_dict) in enumerate(BENCHMARKS.items()):
+        hist, drawdowns = format_history(r.index, kern["cumulative"][:, i], kern["drawdown"][:, i], columnar, dates)
+        active = W[i] > 0
+        risk_data = {"tickers": r.columns[active].tolist(), "weights": np.round(W[i][active] * 100, 1).tolist(),
+                     "risk_contribution": np.round(kern["risk_contribution"][i][active] * 100, 1).tolist()}
+        out[name] = {
+            "return": round(kern["return"][i] * 100, 1),
+            "volatility": round(kern["volatility"][i] * 100, 1),
+            "sharpe": round(kern["sharpe"][i], 2),
+            "var": float(kern["var"][i]),
+            "cvar": float(kern["cvar"][i]),
+            "allocation": {k: v * 100 for k, v in w_dict.items()},
+            "history": hist,
+            "drawdowns": drawdowns,
+            "risk_decomposition": risk_data
+        }
+    return out, dates if columnar else None
+
+
+class BenchmarkCache:
+    """
+    Benchmark results per trading day. The benchmarks never depend on a request beyond its date
+    range, so once per `price_date` their closes come from `fetch()` (a download of their own, not
+    of whatever basket arrives first) and their daily returns, weights and chart dates are prepared
+    over the whole history. A request slices those to its date range and only the range-dependent
+    numbers (moments, VaR/CVaR, cumulative, drawdown, risk decomposition) are computed; results
+    are kept per (range, rf bucket, layout) until a newer trading day clears them. Per process,
+    like ResultCache.
+    """
+
+    def __init__(self, fetch, max_entries=64):
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.price_date = None
+        self.day = None
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prepare(self):
+        levels = self.fetch()
+        valid = [b for b in BENCHMARK_TICKERS if b in levels.columns]
+        if not valid: return None
+        # Forward-filled on the benchmarks' own calendar; a late listing starts once every benchmark trades
+        r = levels[valid].dropna(how="all").ffill().dropna().pct_change().iloc[1:]
+        if r.empty: return None
+        return {"returns": r, "weights": benchmark_weights(r.columns), "dates": r.index.strftime('%Y-%m-%d').tolist()}
+
+    def get(self, index, rf_rate, price_date, columnar=False):
+        """(results by name, date axis or None) for the benchmark days after index[0] through index[-1]."""
+        key = (index[0], index[-1], rf_bucket(rf_rate), columnar)
+        with self._lock:
+            # An older price_date (a basket with a stale ticker) slices the newer day instead of resetting it
+            if self.price_date is None or price_date > self.price_date:
+                self.day = self._prepare()
+                self.price_date = price_date
+                self.entries.clear()
+            day = self.day
+            hit = self.entries.get(key)
+            if hit is not None: self.entries.move_to_end(key)
+        CACHE_REQUESTS.inc("benchmarks", "hit" if hit is not None else "miss")
+        if hit is not None: return hit
+        if day is None: return {}, None
+
+        days = day["returns"].index
+        i0, i1 = days.searchsorted(index[0], side="right"), days.searchsorted(index[-1], side="right")
+        if i1 - i0 < 2: return {}, None
+        r = day["returns"].iloc[i0:i1]
+        dates = [(r.index[0] - pd.Timedelta(days=1)).strftime('%Y-%m-%d')] + day["dates"][i0:i1]
+        result = benchmark_results(r, day["weights"], rf_rate, columnar, dates)
+        with self._lock:
+            if day is self.day:
+                self.entries[key] = result
+                while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+        return result
@@ -1,24 +1,33 @@
-import yfinance as yf
-import pandas as pd
+import os
+from .price_store import PriceStore
+
+PRICE_STORE_DIR = os.environ.get("PRICE_STORE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".price_store"))
+_default_store = None
 
 def get_risk_free_rate():
     """Fetches the current 13-week Treasury Bill rate (^IRX)."""
     try:
+        import yfinance as yf
         ticker = yf.Ticker("^IRX")
         hist = ticker.history(period="5d")
         if hist.empty: return 0.045
         return hist['Close'].iloc[-1] / 100.0
     except: return 0.045
 
-def fetch_market_data(tickers, period="3y"):
-    """Robust data fetching with error handling."""
-    raw = yf.download(tickers, period=period, progress=False, auto_adjust=True)
-    try:
-        # Handle MultiIndex columns if multiple tickers are returned
-        prices = raw['Close'] if 'Close' in raw.columns and isinstance(raw.columns, pd.MultiIndex) else raw['Close']
-    except:
-        prices = raw
+def get_price_store():
+    """Process-wide price store backed by Yahoo, created on first use."""
+    global _default_store
+    if _default_store is None: _default_store = PriceStore(PRICE_STORE_DIR)
+    return _default_store
+
+def fetch_market_data(tickers, period="3y", store=None, clean=True):
+    """
+    Robust data fetching with error handling.
+    Prices come from the local store, which only downloads bars newer than its last stored date.
+    """
+    store = store or get_price_store()
+    prices = store.get_prices(tickers, period=period)
     
     # Cleaning
-    prices = prices.dropna()
-    return prices
\ No newline at end of file
+    if clean: prices = prices.dropna()
+    return prices
@@ -0,0 +1,110 @@
+import os
+import time
+import contextvars
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .instrumentation import EXECUTOR_CPU_SECONDS, trace_handoff, run_traced, merge_spans
+
+MODES = ("serial", "thread", "process")
+
+
+def _attach(handles):
+    """Worker side: map shared blocks back to arrays without copying."""
+    blocks, arrays = [], {}
+    for name, (shm_name, shape, dtype, order) in handles.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, order=order)
+    return blocks, arrays
+
+
+def _process_entry(fn, handles, kwargs, handoff):
+    cpu0 = time.process_time()
+    blocks, arrays = _attach(handles)
+    try:
+        result, spans = run_traced(handoff, fn, arrays, **kwargs)
+    finally:
+        del arrays
+        for shm in blocks: shm.close()
+    return result, time.process_time() - cpu0, spans
+
+
+class StrategyExecutor:
+    """
+    Runs independent optimizer tasks as `fn(arrays, **kwargs)`.
+
+    `arrays` is a dict of large read-only inputs (covariance, returns, ...). In "process"
+    mode they are copied once per batch into `multiprocessing.shared_memory` and every
+    task attaches to the same blocks, so only small handles are pickled per task.
+    "thread" shares them directly and "serial" runs inline for debugging. Pools are
+    created on first use and kept for the life of the executor.
+
+    After each `run`, `last_stats` holds {"wall", "cpu"} seconds for the batch, with
+    worker-process CPU included in process mode.
+    """
+
+    def __init__(self, mode="serial", workers=None):
+        if mode not in MODES: raise ValueError(f"Unknown execution mode: {mode}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.last_stats = {"wall": 0.0, "cpu": 0.0}
+        self._pool = None
+
+    @property
+    def parallel(self):
+        return self.mode != "serial" and self.workers > 1
+
+    def _get_pool(self):
+        if self._pool is None:
+            pool_cls = ProcessPoolExecutor if self.mode == "process" else ThreadPoolExecutor
+            self._pool = pool_cls(max_workers=self.workers)
+        return self._pool
+
+    def run(self, tasks, arrays=None):
+        """`tasks` is a list of (fn, kwargs). Returns results in task order."""
+        arrays = arrays or {}
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        worker_cpu = 0.0
+        if self.mode == "serial" or not tasks:
+            results = [fn(arrays, **kw) for fn, kw in tasks]
+        elif self.mode == "thread":
+            pool = self._get_pool()
+            # Each task runs in a copy of the caller's context, so its stages land in the request trace
+            results = [f.result() for f in [pool.submit(contextvars.copy_context().run, fn, arrays, **kw) for fn, kw in tasks]]
+        else:
+            blocks, handles = [], {}
+            try:
+                for name, arr in arrays.items():
+                    # Keep Fortran order (e.g. a DataFrame's covariance) so BLAS sums in the same order as in-process
+                    arr = np.asarray(arr)
+                    order = "F" if arr.flags.f_contiguous and not arr.flags.c_contiguous else "C"
+                    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                    blocks.append(shm)
+                    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, order=order)[...] = arr
+                    handles[name] = (shm.name, arr.shape, arr.dtype.str, order)
+                pool = self._get_pool()
+                handoff = trace_handoff()
+                outs = [f.result() for f in [pool.submit(_process_entry, fn, handles, kw, handoff) for fn, kw in tasks]]
+            finally:
+                for shm in blocks: shm.close(); shm.unlink()
+            results = [r for r, _, _ in outs]
+            worker_cpu = sum(c for _, c, _ in outs)
+            for _, _, spans in outs: merge_spans(spans)
+        self.last_stats = {"wall": time.perf_counter() - wall0, "cpu": time.process_time() - cpu0 + worker_cpu}
+        EXECUTOR_CPU_SECONDS.inc(self.mode, amount=self.last_stats["cpu"])
+        return results
+
+    def shutdown(self):
+        if self._pool is not None: self._pool.shutdown(); self._pool = None
+
+
+_default_executor = None
+
+def get_default_executor():
+    """Process-wide executor from EXECUTION_MODE (serial|thread|process) and EXECUTION_WORKERS."""
+    global _default_executor
+    if _default_executor is None:
+        workers = os.environ.get("EXECUTION_WORKERS")
+        _default_executor = StrategyExecutor(os.environ.get("EXECUTION_MODE", "serial"), int(workers) if workers else None)
+    return _default_executor
@@ -0,0 +1,116 @@
+import numpy as np
+from .instrumentation import stage, record_solve
+
+
+@stage("frontier_cloud")
+def sample_portfolios(mean_returns, cov_matrix, num_portfolios=200, seed=0, chunk=4096):
+    """
+    Random long-only portfolios drawn in one Dirichlet batch (uniform on the simplex).
+    Returns annualized (vols, rets) arrays; vol is a row-wise quadratic form evaluated in chunks.
+    """
+    mu = np.asarray(mean_returns, dtype=float)
+    cov = np.asarray(cov_matrix, dtype=float)
+    rng = np.random.default_rng(seed)
+    W = rng.dirichlet(np.ones(len(mu)), size=num_portfolios)
+    rets = W @ mu * 252
+    var = np.empty(num_portfolios)
+    for s in range(0, num_portfolios, chunk):
+        Wc = W[s:s + chunk]
+        var[s:s + chunk] = np.einsum('ij,ij->i', Wc @ cov, Wc)
+    return np.sqrt(np.maximum(var, 0)) * np.sqrt(252), rets
+
+
+def _max_return_weights(mu, min_w, max_w):
+    """Highest-return portfolio in the box: everyone at min_w, then fill best assets up to max_w."""
+    n = len(mu)
+    w = np.full(n, float(min_w))
+    room = 1.0 - w.sum()
+    for i in np.argsort(mu)[::-1]:
+        if room <= 0: break
+        add = min(max_w - min_w, room)
+        w[i] += add; room -= add
+    return w
+
+
+def _active_set_qp(cov, A, b, lo, hi, state, max_iter=50, eps=1e-10):
+    """
+    min w'Cw s.t. A w = b, lo <= w <= hi by a primal-dual active-set iteration. `state` marks
+    each weight -1 (held at lo), +1 (held at hi) or 0 (free). Each pass solves the equality-
+    constrained problem over the free weights, then moves free weights that left the box onto
+    their bound and frees bounded weights whose multiplier has the wrong sign. Unchanged sets
+    satisfy the KKT conditions, so the result is exact; started from a neighbouring solution's
+    sets it takes one or two passes. Returns (w, state, passes), w None if it did not settle.
+    """
+    n, m = len(cov), len(b)
+    for it in range(1, max_iter + 1):
+        free = state == 0
+        w = np.where(state < 0, lo, hi).astype(float)
+        w[free] = 0.0
+        k = int(free.sum())
+        K = np.zeros((k + m, k + m))
+        K[:k, :k] = cov[np.ix_(free, free)]
+        K[:k, k:] = A[:, free].T
+        K[k:, :k] = A[:, free]
+        rhs = np.concatenate([-cov[free] @ w, b - A @ w])
+        try: sol = np.linalg.solve(K, rhs)
+        except np.linalg.LinAlgError: return None, state, it
+        w[free] = sol[:k]
+        g = cov @ w + A.T @ sol[k:]
+        new = state.copy()
+        new[free & (w < lo - 1e-12)] = -1
+        new[free & (w > hi + 1e-12)] = 1
+        new[((state < 0) & (g < -eps)) | ((state > 0) & (g > eps))] = 0
+        if np.array_equal(new, state): return np.clip(w, lo, hi), state, it
+        state = new
+    return None, state, max_iter
+
+
+@stage("frontier_curve")
+def trace_frontier(mean_returns, cov_matrix, min_w=0.0, max_w=1.0, num_points=30, tol=1e-10):
+    """
+    Exact efficient frontier under the weight box. Starts at the minimum-variance
+    portfolio and solves min w'Cw s.t. mu'w = r, sum(w) = 1 for evenly spaced targets
+    up to the highest attainable return, warm-starting each solve from the previous one's
+    active bounds (`_active_set_qp`; SLSQP at `tol` if that does not settle).
+    Returns (vols, rets, weights) annualized; infeasible targets are skipped.
+    """
+    from scipy.optimize import minimize
+    mu = np.asarray(mean_returns, dtype=float)
+    cov = np.asarray(cov_matrix, dtype=float)
+    n = len(mu)
+    if n * min_w > 1 + 1e-12 or n * max_w < 1 - 1e-12: return np.empty(0), np.empty(0), np.empty((0, n))
+    bounds = tuple((min_w, max_w) for _ in range(n))
+    ones = np.ones(n)
+    budget = {'type': 'eq', 'fun': lambda w: w.sum() - 1, 'jac': lambda w: ones}
+
+    # Solve on a unit-scale covariance so SLSQP's tolerance means the same thing for any data
+    cov_unit = cov / max(np.mean(np.diag(cov)), 1e-20)
+    def variance(w):
+        g = cov_unit @ w
+        return w @ g, 2 * g
+
+    def solve(constraints, b, x, state):
+        w, state, nit = _active_set_qp(cov_unit, np.array([c['jac'](x) for c in constraints]), b, min_w, max_w, state)
+        record_solve("active_set_frontier", nit, w is not None)
+        if w is not None: return w, state
+        res = minimize(variance, x, jac=True, method='SLSQP', bounds=bounds, constraints=constraints, tol=tol)
+        record_solve("slsqp_frontier", res.nit, res.success)
+        if not res.success: return None, state
+        return res.x, np.where(res.x <= min_w + 1e-9, -1, np.where(res.x >= max_w - 1e-9, 1, 0))
+
+    x, state = solve([budget], np.ones(1), np.clip(ones / n, min_w, max_w), np.zeros(n, dtype=int))
+    if x is None: return np.empty(0), np.empty(0), np.empty((0, n))
+    r_lo = mu @ x
+    r_hi = mu @ _max_return_weights(mu, min_w, max_w)
+
+    weights = [x]
+    for target in np.linspace(r_lo, r_hi, num_points)[1:]:
+        on_target = {'type': 'eq', 'fun': lambda w, t=target: mu @ w - t, 'jac': lambda w: mu}
+        w, state = solve([budget, on_target], np.array([1.0, target]), x, state)
+        if w is None: continue
+        x = w
+        weights.append(x)
+
+    W = np.array(weights)
+    vols = np.sqrt(np.maximum(np.einsum('ij,ij->i', W @ cov, W), 0)) * np.sqrt(252)
+    return vols, W @ mu * 252, W
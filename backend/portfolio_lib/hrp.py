@@ -0,0 +1,55 @@
+import numpy as np
+from .instrumentation import stage
+
+
+def correlation_linkage(cov_matrix, method='single'):
+    """Correlation -> distance sqrt((1 - rho) / 2) -> hierarchical linkage. Returns (corr, link)."""
+    import scipy.cluster.hierarchy as sch
+    from scipy.spatial.distance import squareform
+    cov = np.asarray(cov_matrix, dtype=float)
+    std_devs = np.sqrt(np.diag(cov))
+    corr = (cov / np.outer(std_devs, std_devs)).clip(-1, 1)
+    dist = np.sqrt((1 - corr) / 2)
+    link = sch.linkage(squareform(dist, checks=False), method)
+    return corr, link
+
+
+@stage("hrp")
+def hrp_allocation(cov_matrix, method='single', link=None):
+    """
+    Hierarchical Risk Parity on plain arrays.
+
+    The quasi-diagonal order is the leaf order of the linkage tree (an O(n) traversal),
+    and recursive bisection works on contiguous index ranges of the reordered covariance,
+    so every cluster block is a slice instead of a label lookup. Pass `link` to reuse a
+    linkage already built for the same matrix.
+
+    Returns (weights in the original asset order, link, order).
+    """
+    cov = np.asarray(cov_matrix, dtype=float)
+    n = cov.shape[0]
+    if link is None: _, link = correlation_linkage(cov, method)
+    import scipy.cluster.hierarchy as sch
+    order = sch.leaves_list(link)
+
+    cov_sorted = cov[np.ix_(order, order)]
+    inv_var = 1.0 / np.maximum(np.diag(cov_sorted), 1e-5)
+
+    def cluster_var(s, e):
+        ivp = inv_var[s:e] / inv_var[s:e].sum()
+        return max(ivp @ cov_sorted[s:e, s:e] @ ivp, 1e-5)
+
+    w = np.ones(n)
+    clusters = [(0, n)]
+    while clusters:
+        # Split every cluster in half by position, as in the original bisection
+        clusters = [c for s, e in clusters if e - s > 1 for c in ((s, s + (e - s) // 2), (s + (e - s) // 2, e))]
+        for i in range(0, len(clusters), 2):
+            (s0, e0), (s1, e1) = clusters[i], clusters[i + 1]
+            var0 = cluster_var(s0, e0); var1 = cluster_var(s1, e1)
+            alpha = 1 - var0 / (var0 + var1)
+            w[s0:e0] *= alpha; w[s1:e1] *= 1 - alpha
+
+    weights = np.empty(n)
+    weights[order] = w
+    return weights, link, order
@@ -0,0 +1,188 @@
+import time
+import logging
+import threading
+import contextvars
+from contextlib import ContextDecorator
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock: self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels): return self.values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            row = self.values.setdefault(labels, [0] * (len(self.buckets) + 2))
+            for i, upper in enumerate(self.buckets):
+                if value <= upper: row[i] += 1
+            row[-2] += 1; row[-1] += value
+
+    def count(self, *labels):
+        row = self.values.get(labels)
+        return row[-2] if row else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self.values.items()):
+                for upper, n in zip(self.buckets, row):
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [('le', upper)])} {n}")
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [('le', '+Inf')])} {row[-2]}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {round(row[-1], 6)}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, key)} {row[-2]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        self.metrics.append(Counter(name, help, labels)); return self.metrics[-1]
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.metrics.append(Histogram(name, help, labels, buckets)); return self.metrics[-1]
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(line for m in self.metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("portfolio_stage_seconds", "Wall time of each pipeline stage.", ["stage"])
+OPTIMIZER_RUNS = REGISTRY.counter("portfolio_optimizer_runs_total", "Optimizer solves.", ["solver"])
+OPTIMIZER_ITERATIONS = REGISTRY.counter("portfolio_optimizer_iterations_total", "Optimizer iterations summed over solves.", ["solver"])
+OPTIMIZER_UNCONVERGED = REGISTRY.counter("portfolio_optimizer_unconverged_total", "Solves that stopped without reporting success.", ["solver"])
+OPTIMIZER_FALLBACKS = REGISTRY.counter("portfolio_optimizer_fallbacks_total", "Solver errors answered with equal weights.", ["solver"])
+CACHE_REQUESTS = REGISTRY.counter("portfolio_cache_requests_total", "Cache lookups by cache and outcome.", ["cache", "result"])
+EXECUTOR_CPU_SECONDS = REGISTRY.counter("portfolio_executor_cpu_seconds_total", "CPU time of executor batches, workers included.", ["mode"])
+
+
+def record_solve(solver, nit, success=True):
+    OPTIMIZER_RUNS.inc(solver)
+    OPTIMIZER_ITERATIONS.inc(solver, amount=int(nit))
+    if not success: OPTIMIZER_UNCONVERGED.inc(solver)
+
+
+def record_fallback(solver):
+    OPTIMIZER_RUNS.inc(solver)
+    OPTIMIZER_FALLBACKS.inc(solver)
+
+
+class Trace:
+    """Per-request list of (stage, start offset, duration, nesting depth), filled in by `stage`."""
+
+    def __init__(self, t0=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, elapsed, depth):
+        with self._lock: self.spans.append((name, start, elapsed, depth))
+
+    def to_list(self):
+        return [{"stage": name, "start_ms": round(start * 1000, 2), "ms": round(elapsed * 1000, 2), "depth": depth}
+                for name, start, elapsed, depth in sorted(self.spans, key=lambda s: s[1])]
+
+
+_trace = contextvars.ContextVar("portfolio_trace", default=None)
+# Nesting depth per context, not per trace: executor threads each nest from the stage that submitted them
+_depth = contextvars.ContextVar("portfolio_stage_depth", default=0)
+
+def start_trace():
+    """Starts collecting stages for the current request/job context and returns the Trace."""
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+def end_trace():
+    _trace.set(None)
+
+def trace_handoff():
+    """
+    What a worker process needs to record stages into the current trace: (wall-clock time of the
+    trace start, depth), or None outside a trace. perf_counter origins differ between processes.
+    """
+    trace = _trace.get()
+    if trace is None: return None
+    return time.time() - (time.perf_counter() - trace.t0), _depth.get()
+
+def run_traced(handoff, fn, *args, **kwargs):
+    """Worker-process side of `trace_handoff`: (fn's result, its stage spans for `merge_spans`)."""
+    if handoff is None: return fn(*args, **kwargs), []
+    wall_t0, depth = handoff
+    trace = Trace(time.perf_counter() - (time.time() - wall_t0))
+    ctx = contextvars.copy_context()
+    def call():
+        _trace.set(trace); _depth.set(depth)
+        return fn(*args, **kwargs)
+    return ctx.run(call), trace.spans
+
+def merge_spans(spans):
+    """Adds spans recorded by `run_traced` in a worker process to the current trace."""
+    trace = _trace.get()
+    if trace is not None:
+        for span in spans: trace.add(*span)
+
+
+class stage(ContextDecorator):
+    """
+    Times a block (`with stage("hrp"):`) or a function (`@stage("hrp")`) into the
+    portfolio_stage_seconds histogram, and into the active request trace if there is one.
+    Stages run on executor worker processes reach the trace (see run_traced) but only that
+    process's registry.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def _recreate_cm(self):
+        # Decorated functions may run on several threads at once; each call gets its own timer
+        return stage(self.name)
+
+    def __enter__(self):
+        self._trace = _trace.get()
+        self._depth = _depth.get()
+        self._token = _depth.set(self._depth + 1)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._t0
+        STAGE_SECONDS.observe(elapsed, self.name)
+        _depth.reset(self._token)
+        if self._trace is not None:
+            self._trace.add(self.name, self._t0 - self._trace.t0, elapsed, self._depth)
+        log.debug("stage %s: %.3fs", self.name, elapsed)
+        return False
@@ -0,0 +1,110 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """One submitted run. `report(stage)` is handed to the pipeline as its progress callback."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"  # queued -> running -> done | failed | cancelled
+        self.stage = None
+        self.stages = []
+        self.result = None
+        self.error = None
+        self.exception = None  # kept so callers can map failures (e.g. bad input) to their own status
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    def report(self, stage):
+        # Stage boundaries double as cancellation points
+        if self._cancel.is_set(): raise JobCancelled()
+        now = time.time()
+        if self.stages and self.stages[-1]["elapsed"] is None:
+            self.stages[-1]["elapsed"] = round(now - self.stages[-1]["started"], 3)
+        self.stage = stage
+        self.stages.append({"name": stage, "started": now, "elapsed": None})
+
+    def _finish(self, status):
+        self.status = status
+        self.finished = time.time()
+        if self.stages and self.stages[-1]["elapsed"] is None:
+            self.stages[-1]["elapsed"] = round(self.finished - self.stages[-1]["started"], 3)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": [{"name": s["name"], "elapsed": s["elapsed"]} for s in self.stages],
+            "error": self.error,
+            "elapsed": round((self.finished or time.time()) - self.created, 3)
+        }
+
+
+class JobManager:
+    """
+    Runs pipeline calls on a bounded thread pool. At most `max_queue` jobs may wait for a
+    worker; further submissions raise QueueFull. Finished jobs are kept for `ttl` seconds.
+    """
+
+    def __init__(self, max_workers=2, max_queue=8, ttl=900):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="optimize-job")
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues `fn(*args, progress=job.report, **kwargs)` and returns the Job."""
+        with self._lock:
+            self._prune()
+            # Jobs a worker hasn't finished yet; beyond the workers themselves, at most max_queue may wait
+            if sum(j.finished is None for j in self.jobs.values()) >= self.max_workers + self.max_queue:
+                raise QueueFull()
+            job = Job()
+            self.jobs[job.id] = job
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job._cancel.is_set(): job._finish("cancelled"); return
+        job.status = "running"
+        try:
+            job.result = fn(*args, progress=job.report, **kwargs)
+            job._finish("done")
+        except JobCancelled:
+            job._finish("cancelled")
+        except Exception as e:
+            job.error = str(e)
+            job.exception = e
+            job._finish("failed")
+
+    def get(self, job_id):
+        with self._lock: return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None: return None
+        job._cancel.set()
+        # A job still waiting for a worker never starts; a running one stops at its next stage
+        if job.future is not None and job.future.cancel(): job._finish("cancelled")
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [k for k, j in self.jobs.items() if j.finished and j.finished < cutoff]:
+            del self.jobs[job_id]
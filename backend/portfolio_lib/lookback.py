@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from .shrinkage import RollingLedoitWolf, ledoit_wolf_pairwise
+
+DEFAULT_WINDOWS = [63, 126, 252, 504]
+# common: only dates on which every asset trades; pairwise: every date, with NaN where an asset has no data
+HISTORY_MODES = ("common", "pairwise")
+
+
+def window_statistics(returns, windows, target="identity"):
+    """
+    Yields (window, n_obs, cov, shrinkage) for each lookback window, shortest first.
+
+    Every window ends on the latest bar, so the windows are nested. Rows are folded into
+    a `RollingLedoitWolf` once as the window grows; each window's estimate is then
+    finished from its running sums in O(p^2) instead of a refit.
+    A window of `w` prices covers the trailing `w - 1` returns.
+
+    Returns with NaN (ragged histories) are estimated per window with `ledoit_wolf_pairwise`,
+    identity target only, and n_obs is then the window's row count.
+    """
+    X = np.asarray(returns, dtype=float)
+    T, p = X.shape
+    if np.isnan(X).any():
+        for w in sorted(windows):
+            m = w - 1
+            if m < 2 or m > T: continue
+            cov, shrink, _ = ledoit_wolf_pairwise(X[T - m:], target)
+            yield w, m, cov, shrink
+        return
+    lw = RollingLedoitWolf(p, target)
+    for w in sorted(windows):
+        m = w - 1
+        if m < 2 or m > T: continue
+        lw.add(X[T - m:T - lw.n])
+        cov, shrink = lw.estimate()
+        yield w, lw.n, cov, shrink
+
+
+def ewma_mean(returns, span):
+    """
+    Last value of `returns.ewm(span=span).mean()` as one weighted dot product.
+    NaN entries are skipped, each column normalized by the weights of its own observations;
+    a column with no observations in `returns` gets 0 rather than 0/0.
+    """
+    X = np.asarray(returns, dtype=float)
+    decay = 1.0 - 2.0 / (span + 1.0)
+    weights = decay ** np.arange(len(X) - 1, -1, -1)
+    M = np.isnan(X)
+    if not M.any(): return weights @ X / weights.sum()
+    total = weights @ ~M
+    return np.divide(weights @ np.where(M, 0.0, X), total, out=np.zeros(X.shape[1]), where=total > 0)
+
+
+class RollingEWMA:
+    """
+    `ewma_mean` over a sliding window of `window` rows, updated per row instead of recomputed:
+    S <- d * S + x_new - d^window * x_dropped, divided by the fixed weight total.
+    """
+
+    def __init__(self, rows, span):
+        X = np.asarray(rows, dtype=float)
+        self.window = len(X)
+        self.decay = 1.0 - 2.0 / (span + 1.0)
+        weights = self.decay ** np.arange(self.window - 1, -1, -1)
+        self.total = weights.sum()
+        self.acc = weights @ X
+
+    def roll(self, new_rows, old_rows):
+        """Appends `new_rows` and drops the same number of oldest rows (`old_rows`, oldest first)."""
+        new = np.atleast_2d(np.asarray(new_rows, dtype=float))
+        old = np.atleast_2d(np.asarray(old_rows, dtype=float))
+        h = len(new)
+        if h == 0: return
+        steps = self.decay ** np.arange(h - 1, -1, -1)
+        self.acc = self.decay ** h * self.acc + steps @ new - self.decay ** self.window * (steps @ old)
+
+    def mean(self):
+        return self.acc / self.total
+
+
+def search_lookback(returns, windows, score_fn, warm_start=True, executor=None, score_kwargs=None, target="identity"):
+    """
+    Scores every lookback window and returns (best_window, best_stats, scores).
+
+    `returns` are the full-history daily returns, computed once by the caller. Window
+    statistics are stacked into arrays {"means": (k, p), "covs": (k, p, p)} and
+    `score_fn(arrays, index, x0, **score_kwargs)` returns (score, weights) for window `index`.
+    With `warm_start`, each window's solve starts from the previous window's weights; with a
+    parallel `executor` the solves are dispatched together instead and each starts cold.
+    Ties keep the shorter window. `target` is the Ledoit-Wolf shrinkage target.
+    """
+    cols = returns.columns
+    stats = []
+    for w, n, cov, shrink in window_statistics(returns.values, windows, target):
+        stats.append((w, n, ewma_mean(returns.values[-n:], span=w), cov, shrink))
+    if not stats: return None, {}, {}
+
+    arrays = {'means': np.array([s[2] for s in stats]), 'covs': np.array([s[3] for s in stats])}
+    score_kwargs = score_kwargs or {}
+    if executor is not None and executor.parallel:
+        results = executor.run([(score_fn, dict(score_kwargs, index=i, x0=None)) for i in range(len(stats))], arrays)
+    else:
+        results = []; x0 = None
+        for i in range(len(stats)):
+            score, x = score_fn(arrays, index=i, x0=x0, **score_kwargs)
+            results.append((score, x))
+            if warm_start: x0 = x
+
+    scores = {}
+    best_score = -np.inf; best = None
+    for (w, n, mean, cov, shrink), (score, _) in zip(stats, results):
+        scores[w] = score
+        if score > best_score: best_score = score; best = (w, n, mean, cov, shrink)
+    if best is None: return None, {}, scores
+
+    w, n, mean, cov, shrink = best
+    return w, {'returns': returns.iloc[-n:], 'mean': pd.Series(mean, index=cols),
+               'cov': pd.DataFrame(cov, index=cols, columns=cols), 'shrink': shrink}, scores
@@ -1,90 +1,110 @@
 import numpy as np
 import pandas as pd
-from sklearn.covariance import LedoitWolf
+from .shrinkage import ledoit_wolf
+from .risk import historical_tail, target_var_leverage
 
-def get_shrunk_covariance(returns_df):
-    lw = LedoitWolf()
-    lw.fit(returns_df)
+# Most a volatility or VaR target may scale a portfolio
+MAX_LEVERAGE = 3.0
+
+def get_shrunk_covariance(returns_df, target="identity"):
+    """(DataFrame cov, shrinkage); the identity target matches sklearn's LedoitWolf."""
+    cov, shrinkage = ledoit_wolf(returns_df.values, target)
     return pd.DataFrame(
-        lw.covariance_, 
+        cov, 
         index=returns_df.columns, 
         columns=returns_df.columns
-    ), lw.shrinkage_
+    ), shrinkage
+
+def portfolio_kernel(weights, mean_returns=None, cov_matrix=None, returns_df=None, rf_rate=0.0, confidence_level=0.95, cash_rate=None):
+    """
+    Metrics for many portfolios at once. `weights` is (portfolios x assets) or a single vector.
+
+    Each input that is given unlocks its outputs, all computed with whole-matrix ops:
+      cov_matrix            -> "volatility", "risk_contribution" (each row sums to 1)
+      + mean_returns        -> "return", "sharpe"
+      returns_df            -> "daily", "cumulative", "drawdown" (dates x portfolios), "var", "cvar"
+
+    With `cash_rate` (annual), the unallocated 1 - sum(w) of each row earns it in "return" and
+    "daily", or pays it when the row is leveraged. Cash adds no volatility.
+    """
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    out = {}
+    if cov_matrix is not None:
+        cov_w = W @ np.asarray(cov_matrix, dtype=float)
+        var = np.einsum('ij,ij->i', cov_w, W)
+        out["volatility"] = np.sqrt(var) * np.sqrt(252)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out["risk_contribution"] = np.where(var[:, None] > 0, W * cov_w / var[:, None], 0.0)
+        if mean_returns is not None:
+            out["return"] = W @ np.asarray(mean_returns, dtype=float) * 252
+            if cash_rate: out["return"] = out["return"] + (1.0 - W.sum(axis=1)) * cash_rate
+            out["sharpe"] = (out["return"] - rf_rate) / np.maximum(out["volatility"], 0.05)
+    if returns_df is not None:
+        daily = np.asarray(returns_df, dtype=float) @ W.T
+        if cash_rate: daily = daily + (1.0 - W.sum(axis=1)) * (cash_rate / 252)
+        cum = np.cumprod(1 + daily, axis=0)
+        running_max = np.maximum.accumulate(cum, axis=0)
+        out["daily"] = daily
+        out["cumulative"] = cum
+        out["drawdown"] = (cum - running_max) / running_max
+        q, cvar = historical_tail(daily, confidence_level)
+        out["var"] = np.round(np.abs(q) * 100, 2)
+        out["cvar"] = np.round(cvar * 100, 2)
+    return out
 
-def get_ewma_means(returns_df, span):
-    return returns_df.ewm(span=span).mean().iloc[-1]
+def history_dates(index):
+    """Date axis for chart series: the day before the first return, then every return date."""
+    return [(index[0] - pd.Timedelta(days=1)).strftime('%Y-%m-%d')] + index.strftime('%Y-%m-%d').tolist()
+
+def format_history(index, cumulative, drawdown, columnar=False, dates=None):
+    """
+    Chart series for one portfolio from kernel columns. Records are [{"date", "value"}];
+    `columnar` returns bare value lists aligned with `history_dates(index)` instead.
+    Callers formatting several portfolios over one index can pass its `dates` once.
+    """
+    history_vals = [100.0] + np.round(cumulative * 100, 2).tolist()
+    drawdown_vals = [0.0] + np.round(drawdown * 100, 2).tolist()
+    if columnar: return history_vals, drawdown_vals
+    dates = dates or history_dates(index)
+    return [{"date": d, "value": v} for d, v in zip(dates, history_vals)], [{"date": d, "value": v} for d, v in zip(dates, drawdown_vals)]
 
 def calculate_metrics(weights, mean_returns, cov_matrix, rf_rate=0.0):
-    weights = np.array(weights)
-    ret = np.sum(mean_returns * weights) * 252
-    vol = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights))) * np.sqrt(252)
-    effective_vol = max(vol, 0.05)
-    excess_ret = ret - rf_rate
-    sharpe = excess_ret / effective_vol
-    return ret, vol, sharpe
+    k = portfolio_kernel(weights, mean_returns, cov_matrix, rf_rate=rf_rate)
+    return k["return"][0], k["volatility"][0], k["sharpe"][0]
 
-def apply_target_volatility(weights, cov_matrix, target_vol=None):
+def apply_target_volatility(weights, cov_matrix, target_vol=None, max_leverage=MAX_LEVERAGE):
+    """
+    Scales weights to an annual volatility of `target_vol`. As with apply_target_var, the
+    remainder 1 - sum(w) is cash at the risk-free rate; cash adds no volatility, so the
+    leverage is exactly target / current. Capped at `max_leverage`.
+    """
     if target_vol is None: return weights
     current_vol = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights))) * np.sqrt(252)
     if current_vol == 0: return weights
     leverage = target_vol / current_vol
-    leverage = min(leverage, 3.0)
+    leverage = min(leverage, max_leverage)
     return weights * leverage
 
 def get_portfolio_history(weights, returns_df):
-    daily_rets = returns_df.dot(weights)
-    cum_returns = (1 + daily_rets).cumprod()
-    
-    history_list = [{"date": (returns_df.index[0] - pd.Timedelta(days=1)).strftime('%Y-%m-%d'), "value": 100.0}]
-    for date, val in (cum_returns * 100).items():
-        history_list.append({"date": date.strftime('%Y-%m-%d'), "value": round(val, 2)})
-        
-    running_max = cum_returns.cummax()
-    drawdown = (cum_returns - running_max) / running_max
-    drawdown_list = [{"date": (returns_df.index[0] - pd.Timedelta(days=1)).strftime('%Y-%m-%d'), "value": 0.0}]
-    for date, val in (drawdown * 100).items():
-        drawdown_list.append({"date": date.strftime('%Y-%m-%d'), "value": round(val, 2)})
-        
-    return history_list, drawdown_list
+    k = portfolio_kernel(weights, returns_df=returns_df)
+    return format_history(returns_df.index, k["cumulative"][:, 0], k["drawdown"][:, 0])
 
 def get_risk_contribution(weights, cov_matrix):
-    weights = np.array(weights)
-    port_vol = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights)))
-    if port_vol == 0: return np.zeros_like(weights)
-    mcr = np.dot(cov_matrix, weights) / port_vol
-    rc = weights * mcr
-    return rc / port_vol
+    return portfolio_kernel(weights, cov_matrix=cov_matrix)["risk_contribution"][0]
 
-# --- THIS IS THE MISSING PIECE ---
 def calculate_historical_var(weights, returns_df, confidence_level=0.95):
     """Calculates 95% Historical Value at Risk."""
-    daily_rets = returns_df.dot(weights)
-    cutoff = (1.0 - confidence_level) * 100
-    var_value = np.percentile(daily_rets, cutoff)
-    # Return as positive percentage (e.g. 2.5)
-    return round(abs(var_value) * 100, 2)
+    # Returned as positive percentage (e.g. 2.5)
+    return float(portfolio_kernel(weights, returns_df=returns_df, confidence_level=confidence_level)["var"][0])
 
-def apply_target_var(weights, returns_df, target_var_percent=None):
+def apply_target_var(weights, returns_df, target_var_percent=None, rf_rate=0.0, method="historical", confidence_level=0.95, max_leverage=MAX_LEVERAGE):
     """
-    Scales weights to hit a specific 95% Daily VaR target.
-    Target VaR should be a positive number (e.g., 1.5 for 1.5% loss).
+    Scales weights so the daily VaR (`method`, see risk.METHODS) hits `target_var_percent`
+    (a positive number, e.g. 1.5 for a 1.5% loss). The remainder 1 - sum(w) is cash at
+    `rf_rate`, borrowed when leveraged, and the leverage is solved exactly for that portfolio
+    (risk.target_var_leverage) rather than assumed proportional. Capped at `max_leverage`.
     """
     if target_var_percent is None or target_var_percent <= 0: return weights
-    
-    # 1. Calculate Current Unlevered VaR
-    # We use the full history to be robust
-    daily_rets = returns_df.dot(weights)
-    cutoff = (1.0 - 0.95) * 100
-    current_var_value = np.percentile(daily_rets, cutoff)
-    current_var_percent = abs(current_var_value) * 100
-    
-    if current_var_percent == 0: return weights
-    
-    # 2. Calculate Leverage Ratio
-    # If current VaR is 0.5% and Target is 1.5%, leverage = 3.0x
-    leverage = target_var_percent / current_var_percent
-    
-    # Cap leverage for safety (e.g., 4x max)
-    leverage = min(leverage, 4.0)
-    
-    return weights * leverage
\ No newline at end of file
+    leverage = target_var_leverage(weights, returns_df, target_var_percent / 100.0, confidence_level, method, rf_rate)
+    if leverage is None: return weights
+    return weights * min(leverage, max_leverage)
@@ -1,35 +1,84 @@
 import numpy as np
 import pandas as pd
-import time
-from scipy.optimize import minimize
-import scipy.cluster.hierarchy as sch
-from scipy.spatial.distance import squareform
 from .math_utils import (
-    get_shrunk_covariance, get_ewma_means, calculate_metrics, 
-    get_portfolio_history, get_risk_contribution, apply_target_volatility,
-    calculate_historical_var, apply_target_var
+    calculate_metrics, apply_target_volatility, apply_target_var, portfolio_kernel, format_history, history_dates
 )
+from .lookback import DEFAULT_WINDOWS, HISTORY_MODES, search_lookback
+from .risk_budgeting import spinu_risk_budget
+from .hrp import hrp_allocation, correlation_linkage
+from .risk import risk_report
+from .universe import (use_clusters, cluster_blocks, default_cluster_size, composite_matrix, inverse_variance_composites,
+                       cluster_labels, project_to_box)
+from .execution import get_default_executor
+from .instrumentation import stage, record_solve, record_fallback
 
-def run_risk_parity(cov_matrix, min_w=0.0, max_w=1.0):
-    cov_scaled = cov_matrix * 252
+def _solve_info(res):
+    return {"nit": int(res.nit), "nfev": int(res.nfev), "njev": int(getattr(res, 'njev', 0)), "success": bool(res.success)}
+
+# Jacobian of the budget constraint sum(w) = 1
+def _budget_jac(x): return np.ones_like(x)
+
+# Per-asset (lo, hi) pairs; min_w and max_w may be scalars or per-asset arrays
+def _box(min_w, max_w, n): return tuple(zip(np.broadcast_to(min_w, n).tolist(), np.broadcast_to(max_w, n).tolist()))
+
+def run_risk_parity(cov_matrix, min_w=0.0, max_w=1.0, fast=False, return_info=False, budgets=None, x0=None):
+    """
+    Risk parity weights via SLSQP (equal risk contributions unless `budgets` is given).
+    `fast` supplies the closed-form gradient (and the budget Jacobian) so SLSQP
+    needs no finite differences. `return_info` also returns iteration/evaluation counts.
+    """
+    cov_scaled = np.asarray(cov_matrix, dtype=float) * 252 if fast else cov_matrix * 252
     n = cov_scaled.shape[0]
     initial_weights = np.ones(n) / n
+    budget = initial_weights if budgets is None else np.asarray(budgets, dtype=float) / np.sum(budgets)
+    start = initial_weights if x0 is None else np.clip(x0, min_w, max_w)
     def objective(w):
         w = np.array(w)
         p_vol = np.sqrt(np.dot(w.T, np.dot(cov_scaled, w)))
         rc = w * (np.dot(cov_scaled, w) / p_vol)
-        target = p_vol / n
+        target = p_vol * budget
         return np.sum(np.square(rc - target)) * 1000
-    constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1})
-    bounds = tuple((min_w, max_w) for _ in range(n))
+    def objective_and_grad(w):
+        g = cov_scaled @ w
+        p_vol = np.sqrt(w @ g)
+        d = w * g / p_vol - p_vol * budget
+        # d/dw of sum(d_i^2), with rc_i = w_i g_i / vol and target_i = vol * b_i
+        grad = (d * g + cov_scaled @ (d * w)) / p_vol - g * ((d * w) @ g) / p_vol**3 - g * (d @ budget) / p_vol
+        return np.sum(np.square(d)) * 1000, grad * 2000
+    constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 'jac': _budget_jac} if fast else
+                   {'type': 'eq', 'fun': lambda x: np.sum(x) - 1})
+    bounds = _box(min_w, max_w, n)
+    from scipy.optimize import minimize
     try:
-        res = minimize(objective, initial_weights, method='SLSQP', bounds=bounds, constraints=constraints, tol=1e-4)
-        return res.x
-    except: return initial_weights
+        if fast: res = minimize(objective_and_grad, start, jac=True, method='SLSQP', bounds=bounds, constraints=constraints, tol=1e-4)
+        else: res = minimize(objective, start, method='SLSQP', bounds=bounds, constraints=constraints, tol=1e-4)
+        record_solve("slsqp_risk_parity", res.nit, res.success)
+        return (res.x, _solve_info(res)) if return_info else res.x
+    except:
+        record_fallback("slsqp_risk_parity")
+        return (initial_weights, None) if return_info else initial_weights
 
-def run_max_sharpe(mean_rets, cov_matrix, rf_rate, min_w=0.0, max_w=1.0, tol=1e-6):
+def run_risk_budgeting(cov_matrix, min_w=0.0, max_w=1.0, budgets=None, return_info=False, x0=None):
+    """
+    Long-only risk budgeting with the Spinu Newton solver, started from `x0` if given. SLSQP
+    (warm-started from the Spinu weights) is only used when the `min_w`/`max_w` box actually binds.
+    """
+    w, info = spinu_risk_budget(cov_matrix, budgets, x0=x0)
+    record_solve("spinu", info['nit'], info['success'])
+    if info['success'] and np.all(w >= min_w - 1e-10) and np.all(w <= max_w + 1e-10):
+        info['solver'] = 'spinu'
+        return (w, info) if return_info else w
+    res = run_risk_parity(cov_matrix, min_w, max_w, fast=True, return_info=return_info, budgets=budgets, x0=w if info['success'] else x0)
+    if return_info and res[1] is not None: res[1]['solver'] = 'slsqp'
+    return res
+
+def run_max_sharpe(mean_rets, cov_matrix, rf_rate, min_w=0.0, max_w=1.0, tol=1e-6, x0=None, fast=False, return_info=False):
+    """
+    Penalized max-Sharpe weights via SLSQP (see `run_risk_parity` for `fast`/`return_info`).
+    """
     n = len(mean_rets)
     initial_weights = np.ones(n) / n
+    start = initial_weights if x0 is None else np.clip(x0, min_w, max_w)
     def objective(w):
         w = np.array(w)
         ret = np.sum(mean_rets * w) * 252
@@ -38,146 +87,318 @@ def run_max_sharpe(mean_rets, cov_matrix, rf_rate, min_w=0.0, max_w=1.0, tol=1e-
         penalty = 0.5 * np.sum(w**2)
         excess_sharpe = (ret - rf_rate) / effective_vol
         return -excess_sharpe + penalty
-    constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1})
-    bounds = tuple((min_w, max_w) for _ in range(n))
+    mu_a = np.asarray(mean_rets, dtype=float) * 252
+    cov_a = np.asarray(cov_matrix, dtype=float) * 252
+    def objective_and_grad(w):
+        g = cov_a @ w
+        vol = np.sqrt(w @ g)
+        excess = mu_a @ w - rf_rate
+        if vol > 0.05:
+            # Quotient rule on excess / vol, with d(vol)/dw = cov w / vol
+            grad = -mu_a / vol + excess * g / vol**3
+        else:
+            # Below the 5% vol floor the denominator is constant
+            vol = 0.05; grad = -mu_a / vol
+        return -excess / vol + 0.5 * (w @ w), grad + w
+    constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 'jac': _budget_jac} if fast else
+                   {'type': 'eq', 'fun': lambda x: np.sum(x) - 1})
+    bounds = _box(min_w, max_w, n)
+    from scipy.optimize import minimize
     try:
-        res = minimize(objective, initial_weights, method='SLSQP', bounds=bounds, constraints=constraints, tol=tol)
-        return res.x
-    except: return initial_weights
-
-def run_hrp(cov_matrix):
-    std_devs = np.sqrt(np.diag(cov_matrix))
-    outer_v = np.outer(std_devs, std_devs)
-    corr = (cov_matrix / outer_v).clip(-1, 1)
-    dist = np.sqrt((1 - corr) / 2)
-    link = sch.linkage(squareform(dist, checks=False), 'single')
-    
-    def get_ivp(cov):
-        variances = np.diag(cov)
-        floored_vars = np.maximum(variances, 1e-5)
-        ivp = 1. / floored_vars
-        return ivp / ivp.sum()
-
-    def get_rec_bipart(cov, sort_ix):
-        w = pd.Series(1.0, index=sort_ix); c_items = [sort_ix]
-        while len(c_items) > 0:
-            c_items = [i[j:k] for i in c_items for j, k in ((0, len(i) // 2), (len(i) // 2, len(i))) if len(i) > 1]
-            for i in range(0, len(c_items), 2):
-                c0 = c_items[i]; c1 = c_items[i + 1]
-                w0 = get_ivp(cov.loc[c0, c0]); w1 = get_ivp(cov.loc[c1, c1])
-                var0 = np.dot(np.dot(w0.T, cov.loc[c0, c0]), w0)
-                var1 = np.dot(np.dot(w1.T, cov.loc[c1, c1]), w1)
-                var0 = max(var0, 1e-5); var1 = max(var1, 1e-5)
-                alpha = 1 - var0 / (var0 + var1)
-                w[c0] *= alpha; w[c1] *= 1 - alpha
-        return w
+        if fast: res = minimize(objective_and_grad, start, jac=True, method='SLSQP', bounds=bounds, constraints=constraints, tol=tol)
+        else: res = minimize(objective, start, method='SLSQP', bounds=bounds, constraints=constraints, tol=tol)
+        record_solve("slsqp_max_sharpe", res.nit, res.success)
+        return (res.x, _solve_info(res)) if return_info else res.x
+    except:
+        record_fallback("slsqp_max_sharpe")
+        return (initial_weights, None) if return_info else initial_weights
+
+def _cvar_lp(R, T, alpha, min_w, max_w):
+    """The Rockafellar-Uryasev LP over the scenario rows `R`, each weighted as one of `T`."""
+    from scipy.optimize import linprog
+    from scipy import sparse
+    m, n = R.shape
+    c = np.concatenate([np.zeros(n), [1.0], np.full(m, 1.0 / ((1.0 - alpha) * T))])
+    A_ub = sparse.hstack([sparse.csr_matrix(-R), sparse.csr_matrix(-np.ones((m, 1))), -sparse.identity(m, format='csr')], format='csr')
+    A_eq = np.concatenate([np.ones(n), np.zeros(m + 1)])[None, :]
+    bounds = list(_box(min_w, max_w, n)) + [(None, None)] + [(0, None)] * m
+    res = linprog(c, A_ub=A_ub, b_ub=np.zeros(m), A_eq=A_eq, b_eq=[1.0], bounds=bounds, method='highs')
+    if res.status != 0: raise ValueError(res.message)
+    return res
+
+def run_min_cvar(returns, min_w=0.0, max_w=1.0, alpha=0.95, return_info=False, x0=None):
+    """
+    Minimum-CVaR weights over the historical return scenarios, as the Rockafellar-Uryasev LP
+      min  z + sum(u) / ((1 - alpha) T)   s.t.  u_t >= -r_t.w - z,  u >= 0,  sum(w) = 1,  min_w <= w <= max_w
+    in (w, z, u), solved with HiGHS. At the optimum z is the VaR and the objective the CVaR.
+
+    Only scenarios in the tail bind, so longer histories are solved over a working set: the
+    worst eight tail sizes of scenarios for `x0` (equal weights by default). Dropping a
+    scenario's constraint relaxes the LP, so a solution with no dropped loss above z is optimal
+    for the full set; otherwise those scenarios join the set and it is solved again.
+    """
+    R = np.asarray(returns, dtype=float)
+    T, n = R.shape
+    initial_weights = np.ones(n) / n
+    # More scenarios than the tail holds, or lowering z would be unbounded; past half the rows, solve them all
+    k = 8 * int(np.ceil((1.0 - alpha) * T)) + 1
+    active = np.zeros(T, dtype=bool)
+    if k > T // 2: active[:] = True
+    else: active[np.argsort(R @ (initial_weights if x0 is None else x0), kind="stable")[:k]] = True
+    try:
+        nit = 0
+        while True:
+            res = _cvar_lp(R[active], T, alpha, min_w, max_w)
+            nit += res.nit
+            w, z = res.x[:n], res.x[n]
+            violated = ~active & (-(R @ w) - z > 1e-9)
+            if not violated.any(): break
+            active |= violated
+        record_solve("highs_min_cvar", nit, res.success)
+        return (w, {"nit": int(nit), "success": bool(res.success), "var": float(z), "cvar": float(res.fun), "scenarios": int(active.sum())}) if return_info else w
+    except:
+        record_fallback("highs_min_cvar")
+        return (initial_weights, None) if return_info else initial_weights
+
+def run_hrp(cov_matrix, method='single', return_tree=False):
+    """
+    HRP weights in the column order of `cov_matrix`.
+    With `return_tree`, also returns {"linkage", "order"} so callers (e.g. the dendrogram) can reuse them.
+    """
+    weights, link, order = hrp_allocation(cov_matrix, method)
+    return (weights, {"linkage": link, "order": order}) if return_tree else weights
+
+# Module-level task functions so the executor can ship them to worker processes.
+# Each takes the shared arrays first (see StrategyExecutor.run) and is one stage of the request trace.
+@stage("lookback_score")
+def _score_window_task(arrays, index, x0, rf_rate):
+    mean, cov = arrays['means'][index], arrays['covs'][index]
+    # Use a loose tolerance for the lookback search to improve speed
+    w_ms = run_max_sharpe(mean, cov, rf_rate, tol=1e-3, x0=x0, fast=True)
+    _, _, score = calculate_metrics(w_ms, mean, cov, rf_rate)
+    return score, w_ms
+
+@stage("risk_parity")
+def _risk_budgeting_task(arrays, min_w=0.0, max_w=1.0, x0=None):
+    return run_risk_budgeting(arrays['cov'], min_w, max_w, x0=x0)
+
+@stage("max_sharpe")
+def _max_sharpe_task(arrays, rf_rate, min_w=0.0, max_w=1.0, x0=None):
+    return run_max_sharpe(arrays['mean'], arrays['cov'], rf_rate, min_w, max_w, fast=True, x0=x0)
+
+def _hrp_task(arrays):
+    return run_hrp(arrays['cov'], return_tree=True)
+
+@stage("min_cvar")
+def _min_cvar_task(arrays, min_w=0.0, max_w=1.0, x0=None):
+    return run_min_cvar(arrays['returns'], min_w, max_w, x0=x0)
 
-    def get_quasi_diag(link):
-        link = link.astype(int)
-        sort_ix = pd.Series([link[-1, 0], link[-1, 1]])
-        num_items = link[-1, 3]
-        while sort_ix.max() >= num_items:
-            sort_ix.index = range(0, sort_ix.shape[0] * 2, 2)
-            df0 = sort_ix[sort_ix >= num_items]
-            i = df0.index; j = df0.values - num_items
-            sort_ix[i] = link[j, 0]
-            df0 = pd.Series(link[j, 1], index=i + 1)
-            sort_ix = pd.concat([sort_ix, df0]).sort_index()
-            sort_ix.index = range(sort_ix.shape[0])
-        return sort_ix.tolist()
-
-    sort_ix = get_quasi_diag(link)
-    sort_ix = corr.index[sort_ix].tolist()
-    hrp_weights = get_rec_bipart(cov_matrix, sort_ix)
-    return hrp_weights[cov_matrix.columns].values
-
-def find_optimal_allocations(prices, min_w, max_w, rf_rate, target_value=None, target_type="volatility"):
-    windows = [63, 126, 252, 504]
+@stage("lookback_score")
+def _composite_score_task(arrays, index, x0, rf_rate, blocks):
+    # Large universes score a window on its inverse-variance cluster composites instead of every asset
+    B = inverse_variance_composites(arrays['covs'][index], blocks)
+    mean, cov = B.T @ arrays['means'][index], B.T @ arrays['covs'][index] @ B
+    w = run_max_sharpe(mean, cov, rf_rate, tol=1e-3, x0=x0, fast=True)
+    _, _, score = calculate_metrics(w, mean, cov, rf_rate)
+    return score, w
+
+@stage("cluster_solve")
+def _cluster_task(arrays, block, rf_rate):
+    # Max Sharpe and Min CVaR weights inside one cluster, each summing to 1
+    if len(block) == 1: return np.ones(1), np.ones(1)
+    cov = arrays['cov'][np.ix_(block, block)]
+    return run_max_sharpe(arrays['mean'][block], cov, rf_rate, fast=True), run_min_cvar(arrays['returns'][:, block])
+
+def _clustered_strategies(executor, arrays, blocks, link, rf_rate, min_w, max_w):
+    """
+    Large-universe strategies. Risk Parity is solved exactly on the full covariance (the Spinu
+    solver scales to thousands of assets). Max Sharpe and Min CVaR are solved inside every
+    correlation cluster (one executor task per cluster); each cluster then becomes one composite
+    asset per strategy, the composites are optimized against each other, and an asset's weight
+    is its cluster's weight times its weight within the cluster. Constrained runs bound each
+    composite by [min_w, max_w] x cluster size and finish with a projection onto the exact box,
+    as does Risk Parity when the box binds. HRP runs on the whole universe with the shared linkage.
+    Returns (raw weights as in find_optimal_allocations, HRP tree).
+    """
+    n = len(arrays['mean'])
+    w_rp, *within = executor.run([(_risk_budgeting_task, {})] + [(_cluster_task, {"block": b, "rf_rate": rf_rate}) for b in blocks], arrays)
+    raw = {"Risk Parity": {"unconstrained": w_rp, "constrained": project_to_box(w_rp, min_w, max_w)}}
+    sizes = np.array([len(b) for b in blocks])
+    modes = {"unconstrained": (0.0, 1.0), "constrained": (np.minimum(min_w * sizes, 1.0), np.minimum(max_w * sizes, 1.0))}
+    for j, s_name in enumerate(("Max Sharpe", "Min CVaR")):
+        B = composite_matrix(blocks, [w[j] for w in within], n)
+        cov = B.T @ arrays['cov'] @ B
+        raw[s_name] = {}
+        for mode, (lo, hi) in modes.items():
+            if s_name == "Max Sharpe": v = run_max_sharpe(B.T @ arrays['mean'], cov, rf_rate, lo, hi, fast=True)
+            else: v = run_min_cvar(arrays['returns'] @ B, lo, hi)
+            raw[s_name][mode] = project_to_box(B @ v, min_w, max_w) if mode == "constrained" else B @ v
+    w_hrp, _, order = hrp_allocation(arrays['cov'], link=link)
+    raw["HRP"] = {"unconstrained": w_hrp, "constrained": w_hrp}
+    return {s: raw[s] for s in ("Risk Parity", "Max Sharpe", "HRP", "Min CVaR")}, {"linkage": link, "order": order}
+
+def fit_regime(prices, rf_rate, windows=None, warm_start=True, executor=None, shrinkage_target="identity", universe="auto", cluster_size=None, history="common"):
+    """
+    The bound-independent half of the pipeline: returns, the lookback search and (clustered) the
+    linkage and clusters. Returns a regime dict for `solve_strategies` and `strategy_results`,
+    so scenarios over the same tickers can share one fit. Options as in find_optimal_allocations.
+    """
+    if history not in HISTORY_MODES: raise ValueError(f"Unknown history mode: {history}")
+    executor = executor or get_default_executor()
+    clustered = use_clusters(universe, prices.shape[1])
+    windows = list(windows) if windows is not None else list(DEFAULT_WINDOWS)
     if len(prices) < 200: windows = [len(prices) - 5]
-    best_score = -np.inf; best_window = 252; best_stats = {}
-
-    t_regime = time.time()
-    for w in windows:
-        if w >= len(prices): continue
-        recent = prices.iloc[-w:]
-        rets = recent.pct_change().dropna()
-        if rets.empty: continue
-        
-        t_w = time.time()
-        cov, shrink = get_shrunk_covariance(rets)
-        mean = get_ewma_means(rets, span=w)
-        # Use a loose tolerance for the lookback search to improve speed
-        w_ms = run_max_sharpe(mean, cov, rf_rate, tol=1e-3)
-        _, _, score = calculate_metrics(w_ms, mean, cov, rf_rate)
-        
-        if score > best_score:
-            best_score = score; best_window = w
-            best_stats = {'returns': rets, 'mean': mean, 'cov': cov, 'shrink': shrink}
-        print(f"  [Timing] Window {w}: {time.time() - t_w:.2f}s")
-    print(f"[Timing] Regime Analysis: {time.time() - t_regime:.2f}s")
+    windows = [w for w in windows if w < len(prices)]
+
+    blocks = link = None
+    with stage("regime"):
+        # Returns are computed once; each window's statistics are derived from running sums
+        returns = prices.pct_change().dropna() if history == "common" else prices.pct_change().dropna(how="all")
+        score_fn, score_kwargs = _score_window_task, {"rf_rate": rf_rate}
+        if clustered:
+            # One linkage of the full-history correlation serves the window scores, the clusters, HRP and the dendrogram
+            _, link = correlation_linkage(np.cov(returns.fillna(0.0).values, rowvar=False))
+            blocks = cluster_blocks(link, cluster_size or default_cluster_size(prices.shape[1]))
+            score_fn, score_kwargs = _composite_score_task, {"rf_rate": rf_rate, "blocks": blocks}
+        best_window, best_stats, _ = search_lookback(returns, windows, score_fn, warm_start=warm_start,
+                                                     executor=executor, score_kwargs=score_kwargs, target=shrinkage_target)
     
     if not best_stats: raise ValueError("Optimization failed")
+    if history == "pairwise": best_stats['returns'] = best_stats['returns'].fillna(0.0)
+    arrays = {"mean": best_stats['mean'].values, "cov": best_stats['cov'].values, "returns": best_stats['returns'].values}
+    return {"window": best_window, "stats": best_stats, "arrays": arrays, "clustered": clustered, "blocks": blocks, "link": link}
+
+def solve_strategies(regime, min_w, max_w, rf_rate, executor=None, warm=None):
+    """
+    Weights of every strategy and mode under the `min_w`/`max_w` box: (raw, hrp_tree).
+
+    `warm` is the (raw, hrp_tree) of another solve on the same regime and rf_rate. Its
+    unconstrained and HRP weights do not depend on the box and are reused as they are, and
+    its constrained weights start the constrained solves. Clustered regimes ignore `warm`.
+    """
+    executor = executor or get_default_executor()
+    arrays = regime['arrays']
+    with stage("strategies"):
+        if regime['clustered']:
+            return _clustered_strategies(executor, arrays, regime['blocks'], regime['link'], rf_rate, min_w, max_w)
+        if warm is not None:
+            prev, hrp_tree = warm
+            rp_c, ms_c = executor.run([
+                (_risk_budgeting_task, {"min_w": min_w, "max_w": max_w, "x0": prev["Risk Parity"]["constrained"]}),
+                (_max_sharpe_task, {"rf_rate": rf_rate, "min_w": min_w, "max_w": max_w, "x0": prev["Max Sharpe"]["constrained"]}),
+            ], arrays)
+            rp_u, ms_u, w_hrp, mc_u = (prev[s]["unconstrained"] for s in ("Risk Parity", "Max Sharpe", "HRP", "Min CVaR"))
+            mc_x0 = prev["Min CVaR"]["constrained"]
+        else:
+            # HRP ignores the weight bounds, so one run (and its linkage) serves both modes and the dendrogram
+            # The six solves are independent; the executor shares one copy of mean/cov/returns between them
+            rp_u, rp_c, ms_u, ms_c, (w_hrp, hrp_tree), mc_u = executor.run([
+                (_risk_budgeting_task, {}),
+                (_risk_budgeting_task, {"min_w": min_w, "max_w": max_w}),
+                (_max_sharpe_task, {"rf_rate": rf_rate}),
+                (_max_sharpe_task, {"rf_rate": rf_rate, "min_w": min_w, "max_w": max_w}),
+                (_hrp_task, {}),
+                (_min_cvar_task, {}),
+            ], arrays)
+            mc_x0 = mc_u
+        # The long-only optimum is also the constrained one when it fits the box; otherwise its tail seeds the LP
+        if np.all(mc_u >= min_w - 1e-9) and np.all(mc_u <= max_w + 1e-9): mc_c = mc_u
+        else: mc_c = _min_cvar_task(arrays, min_w, max_w, x0=mc_x0)
+        raw = {
+            "Risk Parity": {"unconstrained": rp_u, "constrained": rp_c},
+            "Max Sharpe": {"unconstrained": ms_u, "constrained": ms_c},
+            "HRP": {"unconstrained": w_hrp, "constrained": w_hrp},
+            "Min CVaR": {"unconstrained": mc_u, "constrained": mc_c}
+        }
+    return raw, hrp_tree
+
+def strategy_results(regime, raw, hrp_tree, rf_rate, target_value=None, target_type="volatility", var_method="historical", columnar=False):
+    """Applies the target to `raw` and computes every metric; returns find_optimal_allocations' result."""
+    best_window, best_stats, arrays, clustered, blocks = (regime[k] for k in ("window", "stats", "arrays", "clustered", "blocks"))
 
-    def bundle(w):
-        w_final = w
-        
+    def apply_target(w):
         if target_value is not None and target_value > 0:
             if target_type == "volatility":
                 # target_value is annual vol % (e.g. 0.15)
-                w_final = apply_target_volatility(w, best_stats['cov'], target_value)
+                return apply_target_volatility(w, best_stats['cov'], target_value)
             elif target_type == "var":
                 # target_value is daily VaR % (e.g. 1.5)
-                w_final = apply_target_var(w, best_stats['returns'], target_value)
-
-
-        r, v, s = calculate_metrics(w_final, best_stats['mean'], best_stats['cov'], rf_rate)
-        rc = get_risk_contribution(w_final, best_stats['cov'])
-        hist, drawdowns = get_portfolio_history(w_final, best_stats['returns'])
-        
-        # --- CALCULATE VAR ---
-        var_95 = calculate_historical_var(w_final, best_stats['returns']) # <--- CALCULATION IS HERE
-        
-        risk_data = {"tickers": list(best_stats['cov'].columns), "weights": np.round(w_final * 100, 1).tolist(), "risk_contribution": np.round(rc * 100, 1).tolist()}
-        
-        return {
-            "weights": w_final,
-            "metrics": {
-                "return": r, 
-                "volatility": v, 
-                "sharpe": s, 
-                "var": var_95  # <--- PACKED INTO RESPONSE HERE
-            },
-            "history": hist,
-            "drawdowns": drawdowns,
-            "risk_decomposition": risk_data
-        }
+                return apply_target_var(w, best_stats['returns'], target_value, rf_rate, var_method)
+        return w
 
-    t_strat = time.time()
-    strategies = {
-        "Risk Parity": {
-            "unconstrained": bundle(run_risk_parity(best_stats['cov'])),
-            "constrained": bundle(run_risk_parity(best_stats['cov'], min_w, max_w))
-        },
-        "Max Sharpe": {
-            "unconstrained": bundle(run_max_sharpe(best_stats['mean'], best_stats['cov'], rf_rate)),
-            "constrained": bundle(run_max_sharpe(best_stats['mean'], best_stats['cov'], rf_rate, min_w, max_w))
-        },
-        "HRP": {
-            "unconstrained": bundle(run_hrp(best_stats['cov'])),
-            "constrained": bundle(run_hrp(best_stats['cov']))
-        }
-    }
-    print(f"[Timing] Strategy Calculation: {time.time() - t_strat:.2f}s")
+    # All ten portfolios go through the metrics kernel and the VaR/CVaR engine in one batch
+    with stage("strategy_metrics"):
+        keys = [(s_name, mode) for s_name in raw for mode in raw[s_name]]
+        W = np.array([apply_target(raw[s_name][mode]) for s_name, mode in keys])
+        # Targeted portfolios hold the remainder in cash at rf (see apply_target_var), so the metrics carry it too
+        cash_rate = rf_rate if target_value is not None and target_value > 0 else None
+        k = portfolio_kernel(W, best_stats['mean'], best_stats['cov'], best_stats['returns'], rf_rate, cash_rate=cash_rate)
+        risk = risk_report(k["daily"])
+        tickers = list(best_stats['cov'].columns)
+        strategies = {s_name: {} for s_name in raw}
+        dates = history_dates(best_stats['returns'].index)
+        for i, (s_name, mode) in enumerate(keys):
+            hist, drawdowns = format_history(best_stats['returns'].index, k["cumulative"][:, i], k["drawdown"][:, i], columnar, dates)
+            strategies[s_name][mode] = {
+                "weights": W[i],
+                "metrics": {
+                    "return": k["return"][i],
+                    "volatility": k["volatility"][i],
+                    "sharpe": k["sharpe"][i],
+                    "var": float(k["var"][i]),
+                    "cvar": float(k["cvar"][i]),
+                    "risk": {m: {"var": round(float(v[i]) * 100, 2), "cvar": round(float(c[i]) * 100, 2)} for m, (v, c) in risk.items()}
+                },
+                "history": hist,
+                "drawdowns": drawdowns,
+                "risk_decomposition": {"tickers": tickers, "weights": np.round(W[i] * 100, 1).tolist(), "risk_contribution": np.round(k["risk_contribution"][i] * 100, 1).tolist()}
+            }
 
-    std = np.sqrt(np.diag(best_stats['cov']))
-    corr_matrix = best_stats['cov'] / np.outer(std, std)
-    corr_data = {"tickers": list(best_stats['cov'].columns), "matrix": np.round(corr_matrix.values, 2).tolist()}
+    clusters = composites = None
+    if clustered:
+        # A large universe's n x n correlation is too big to ship or draw, so report the clusters' instead
+        B = inverse_variance_composites(arrays['cov'], blocks)
+        labels = cluster_labels(tickers, blocks)
+        clusters = [[tickers[i] for i in b] for b in blocks]
+        composites = {"mean": pd.Series(B.T @ arrays['mean'], index=labels),
+                      "cov": pd.DataFrame(B.T @ arrays['cov'] @ B, index=labels, columns=labels)}
+    corr_cov = composites['cov'] if clustered else best_stats['cov']
+    std = np.sqrt(np.diag(corr_cov))
+    corr_matrix = corr_cov / np.outer(std, std)
+    corr_data = {"tickers": list(corr_cov.columns), "matrix": np.round(corr_matrix.values, 2).tolist()}
     
     return {
         "lookback_days": int(best_window),
         "shrinkage": best_stats['shrink'],
         "strategies": strategies,
+        "history_dates": dates if columnar else None,
         "correlation": corr_data,
         "debug_cov": best_stats['cov'],
-        "debug_mean": best_stats['mean']
-    }
\ No newline at end of file
+        "debug_linkage": hrp_tree['linkage'],
+        "debug_mean": best_stats['mean'],
+        "clusters": clusters,
+        "composites": composites
+    }
+
+def find_optimal_allocations(prices, min_w, max_w, rf_rate, target_value=None, target_type="volatility", windows=None, warm_start=True, executor=None, columnar=False, progress=None, shrinkage_target="identity", var_method="historical", universe="auto", cluster_size=None, history="common"):
+    """
+    `progress(stage)`, if given, is called as the "regime" and "strategies" stages start.
+    The window search and the seven strategy solves run on `executor` (default: get_default_executor()).
+    `shrinkage_target` picks the Ledoit-Wolf target (see shrinkage.TARGETS) and `var_method` the
+    VaR used by target_type="var" (see risk.METHODS). Targeted portfolios hold the rest in cash at rf_rate.
+
+    `universe` is "dense", "clustered" or "auto" (see universe.UNIVERSE_MODES). Clustered runs split
+    the assets into correlation clusters of at most `cluster_size` (default about sqrt(n)), score
+    the windows on cluster composites and solve as in `_clustered_strategies`; "clusters" and
+    "composites" (inverse-variance cluster mean/cov) are then set in the result.
+
+    `history="pairwise"` takes a ragged `prices` panel (NaN before a listing) and keeps every
+    date: covariances are pairwise-complete (see lookback.window_statistics) and scenario-based
+    parts (history, VaR/CVaR, Min CVaR) count a missing return as a flat day.
+    """
+    executor = executor or get_default_executor()
+    if progress: progress("regime")
+    regime = fit_regime(prices, rf_rate, windows, warm_start, executor, shrinkage_target, universe, cluster_size, history)
+    if progress: progress("strategies")
+    raw, hrp_tree = solve_strategies(regime, min_w, max_w, rf_rate, executor)
+    return strategy_results(regime, raw, hrp_tree, rf_rate, target_value, target_type, var_method, columnar)
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import threading
+from contextlib import ExitStack
+import numpy as np
+import pandas as pd
+from .instrumentation import stage, CACHE_REQUESTS
+
+# One structured record per trading day; each ticker lives in its own .npy file
+# so reads can be memory-mapped and only the requested tickers are touched.
+BAR_DTYPE = np.dtype([('date', 'datetime64[D]'), ('close', 'f8')])
+
+
+def _close_frame(raw):
+    """Extracts the Close panel from a yfinance download (single or MultiIndex columns)."""
+    if raw is None or raw.empty: return pd.DataFrame()
+    try:
+        prices = raw['Close'] if 'Close' in raw.columns and isinstance(raw.columns, pd.MultiIndex) else raw['Close']
+    except:
+        prices = raw
+    if isinstance(prices, pd.Series): prices = prices.to_frame()
+    if getattr(prices.index, 'tz', None) is not None:
+        prices.index = prices.index.tz_localize(None)
+    return prices
+
+
+def period_start(period, today=None):
+    """Converts a yfinance-style period ('5d', '6mo', '3y', 'max') to a start date."""
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    if period is None or period == 'max': return pd.Timestamp('1970-01-01')
+    if period.endswith('mo'): return today - pd.DateOffset(months=int(period[:-2]))
+    if period.endswith('y'): return today - pd.DateOffset(years=int(period[:-1]))
+    if period.endswith('d'): return today - pd.Timedelta(days=int(period[:-1]))
+    raise ValueError(f"Unsupported period: {period}")
+
+
+class PriceProvider:
+    """Source of adjusted daily closes. Subclasses implement `fetch`."""
+
+    def fetch(self, tickers, start, end=None):
+        """Returns closes for `tickers` on [start, end) as a DataFrame (dates x tickers)."""
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    def fetch(self, tickers, start, end=None):
+        import yfinance as yf
+        raw = yf.download(list(tickers), start=pd.Timestamp(start).strftime('%Y-%m-%d'),
+                          end=None if end is None else pd.Timestamp(end).strftime('%Y-%m-%d'),
+                          progress=False, auto_adjust=True)
+        return _close_frame(raw)
+
+
+class FrameProvider(PriceProvider):
+    """Serves prices from an in-memory DataFrame. Used for offline runs and tests."""
+
+    def __init__(self, prices, latency=0.0):
+        self.prices = prices
+        self.latency = latency
+        self.calls = 0
+
+    def fetch(self, tickers, start, end=None):
+        self.calls += 1
+        if self.latency: time.sleep(self.latency)
+        cols = [t for t in tickers if t in self.prices.columns]
+        out = self.prices.loc[self.prices.index >= pd.Timestamp(start), cols]
+        if end is not None: out = out.loc[out.index < pd.Timestamp(end)]
+        return out
+
+
+class PriceStore:
+    """
+    On-disk cache of adjusted closes, one memory-mappable .npy series per ticker.
+    Each refresh only asks the provider for bars from the last stored date onward.
+    Refreshes hold a per-ticker lock, so request and job threads never fetch or write one ticker twice.
+    """
+
+    def __init__(self, root, provider=None, max_age=3600, rtol=1e-6):
+        self.root = root
+        self.provider = provider or YahooProvider()
+        self.max_age = max_age  # Seconds before a ticker is checked for new bars again
+        self.rtol = rtol        # Tolerance before an overlapping bar counts as re-adjusted
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _lock(self, ticker):
+        with self._locks_guard: return self._locks.setdefault(ticker, threading.Lock())
+
+    # --- Storage ---
+    def _path(self, ticker, ext):
+        return os.path.join(self.root, ticker.replace(os.sep, '_') + ext)
+
+    def _load_meta(self, ticker):
+        try:
+            with open(self._path(ticker, '.json')) as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def _load_bars(self, ticker):
+        try: return np.load(self._path(ticker, '.npy'), mmap_mode='r')
+        except (OSError, ValueError): return None
+
+    def _write(self, ticker, bars, meta):
+        # Write-then-rename so concurrent workers (processes or job threads) never read a half-written file
+        for ext, writer in (('.npy', lambda f: np.save(f, bars)), ('.json', lambda f: f.write(json.dumps(meta).encode()))):
+            tmp = self._path(ticker, f'{ext}.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(tmp, 'wb') as f: writer(f)
+            os.replace(tmp, self._path(ticker, ext))
+
+    def last_date(self, ticker):
+        meta = self._load_meta(ticker)
+        if meta is None or not meta.get('last_date'): return None
+        return pd.Timestamp(meta['last_date'])
+
+    def read(self, ticker, start=None):
+        bars = self._load_bars(ticker)
+        if bars is None or len(bars) == 0: return pd.Series(dtype=float, name=ticker)
+        dates = bars['date']
+        i0 = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'D')))
+        return pd.Series(np.asarray(bars['close'][i0:]), index=pd.DatetimeIndex(dates[i0:]), name=ticker)
+
+    # --- Refresh ---
+    @stage("price_store_refresh")
+    def refresh(self, tickers, start):
+        """Brings `tickers` up to date from `start`. Returns (cold_count, warm_count) fetched."""
+        # Sorted acquisition keeps overlapping baskets from deadlocking; staleness is decided under the
+        # locks, so a caller that waited on another's fetch finds the ticker fresh
+        with ExitStack() as held:
+            for t in sorted(set(tickers)): held.enter_context(self._lock(t))
+            return self._refresh(tickers, start)
+
+    def _refresh(self, tickers, start):
+        start = pd.Timestamp(start).normalize()
+        now = time.time()
+        cold, warm = [], {}
+        for t in tickers:
+            meta = self._load_meta(t)
+            if meta is None or pd.Timestamp(meta['coverage_start']) > start:
+                cold.append(t)
+            elif now - meta['checked_at'] >= self.max_age:
+                warm.setdefault(self._refresh_from(t, start), []).append(t)
+
+        if cold:
+            fetched = self.provider.fetch(cold, start)
+            for t in cold:
+                s = fetched[t].dropna() if t in fetched.columns else pd.Series(dtype=float)
+                bars = self._to_bars(s)
+                self._write(t, bars, {'coverage_start': str(start.date()), 'checked_at': now, 'last_date': self._last(bars)})
+
+        for since, group in warm.items():
+            fetched = self.provider.fetch(group, since)
+            for t in group:
+                s = fetched[t].dropna() if t in fetched.columns else pd.Series(dtype=float)
+                self._merge(t, s, now)
+
+        n_warm = sum(len(g) for g in warm.values())
+        CACHE_REQUESTS.inc("price_store", "miss", amount=len(cold))
+        CACHE_REQUESTS.inc("price_store", "stale", amount=n_warm)
+        CACHE_REQUESTS.inc("price_store", "hit", amount=len(tickers) - len(cold) - n_warm)
+        return len(cold), n_warm
+
+    def _refresh_from(self, ticker, start):
+        """
+        First date a warm refresh asks for: the last two stored bars are fetched again. The last one
+        may have been stored intraday and is replaced; the one before it has settled and is compared.
+        Empty series (unknown ticker) are retried from the original start.
+        """
+        bars = self._load_bars(ticker)
+        if bars is None or len(bars) == 0: return start
+        return pd.Timestamp(bars['date'][max(len(bars) - 2, 0)])
+
+    def _merge(self, ticker, new, checked_at):
+        meta = self._load_meta(ticker)
+        meta['checked_at'] = checked_at
+        bars = self._load_bars(ticker)
+        old = np.array(bars) if bars is not None else np.empty(0, dtype=BAR_DTYPE)
+        new_bars = self._to_bars(new)
+        if len(old) and len(new_bars):
+            if len(old) > 1:
+                # A dividend or split re-adjusts the whole history: the settled bar moves too. Rescale
+                # so the series stays continuous; a provisional last bar alone never triggers this.
+                settled = old[-2]
+                overlap = new_bars['close'][new_bars['date'] == settled['date']]
+                if len(overlap) and settled['close'] != 0 and not np.isclose(overlap[0], settled['close'], rtol=self.rtol, atol=0):
+                    old['close'] *= overlap[0] / settled['close']
+            # Refetched bars win, including the provisional last one
+            old = old[old['date'] < new_bars['date'][0]]
+        bars = np.concatenate([old, new_bars])
+        meta['last_date'] = self._last(bars)
+        self._write(ticker, bars, meta)
+
+    @staticmethod
+    def _last(bars):
+        return str(bars['date'][-1]) if len(bars) else None
+
+    @staticmethod
+    def _to_bars(series):
+        bars = np.empty(len(series), dtype=BAR_DTYPE)
+        if len(series):
+            bars['date'] = series.index.values.astype('datetime64[D]')
+            bars['close'] = series.values
+        return bars
+
+    # --- Public read path ---
+    def get_prices(self, tickers, period="3y"):
+        """Returns a (dates x tickers) panel of closes. Tickers with no data are omitted."""
+        tickers = list(dict.fromkeys(tickers))
+        start = period_start(period)
+        self.refresh(tickers, start)
+        series = [s for s in (self.read(t, start) for t in tickers) if not s.empty]
+        if not series: return pd.DataFrame()
+
+        # Align on the union of dates with searchsorted instead of pandas' per-column reindexing
+        dates = series[0].index.values
+        for s in series[1:]:
+            if len(s) != len(dates) or not np.array_equal(s.index.values, dates):
+                dates = np.union1d(dates, s.index.values)
+        panel = np.full((len(dates), len(series)), np.nan)
+        for j, s in enumerate(series):
+            panel[np.searchsorted(dates, s.index.values), j] = s.values
+        return pd.DataFrame(panel, index=pd.DatetimeIndex(dates), columns=[s.name for s in series])
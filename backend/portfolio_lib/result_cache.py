@@ -0,0 +1,163 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from .serialization import dumps
+from .instrumentation import CACHE_REQUESTS
+
+
+def make_key(**fields):
+    """Content hash of the inputs that determine an optimize response."""
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def rf_bucket(rf_rate, bucket_bps=5):
+    """Risk-free rate rounded to `bucket_bps` so tiny T-bill moves don't defeat the cache."""
+    return int(round(rf_rate * 10000 / bucket_bps)) * bucket_bps
+
+
+class MemoryBackend:
+    """LRU of payloads bounded by entry count and total encoded size."""
+
+    def __init__(self, max_entries=128, max_bytes=256 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (payload, size, price_date)
+        self.bytes = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None: return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, payload, size, price_date):
+        if key in self.entries: self.bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (payload, size, price_date)
+        self.bytes += size
+        evicted = 0
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, old_size, _) = self.entries.popitem(last=False)
+            self.bytes -= old_size; evicted += 1
+        return evicted
+
+    def drop_before(self, price_date):
+        stale = [k for k, (_, _, d) in self.entries.items() if d < price_date]
+        for k in stale: self.bytes -= self.entries.pop(k)[1]
+        return len(stale)
+
+
+class DiskBackend:
+    """One JSON file per entry; file mtime is the LRU clock, so entries survive restarts."""
+
+    def __init__(self, root, max_bytes=1024 * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key): return os.path.join(self.root, key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f: entry = json.loads(f.read())
+            os.utime(self._path(key))
+            return entry['payload'], entry['price_date']
+        except (OSError, ValueError, KeyError): return None
+
+    def put(self, key, body, price_date):
+        tmp = self._path(key) + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(b'{"price_date":' + json.dumps(price_date).encode() + b',"payload":' + body + b'}')
+        os.replace(tmp, self._path(key))
+        return self._evict()
+
+    def _files(self):
+        out = []
+        for name in os.listdir(self.root):
+            if not name.endswith('.json'): continue
+            try: st = os.stat(os.path.join(self.root, name))
+            except OSError: continue
+            out.append((st.st_mtime, st.st_size, name))
+        return out
+
+    def _evict(self):
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, name in files:
+            if total <= self.max_bytes: break
+            try: os.remove(os.path.join(self.root, name)); total -= size; evicted += 1
+            except OSError: pass
+        return evicted
+
+    def drop_before(self, price_date):
+        dropped = 0
+        for _, _, name in self._files():
+            path = os.path.join(self.root, name)
+            try:
+                with open(path, 'rb') as f: head = f.read(64)
+                if json.loads(head[head.index(b':') + 1:head.index(b',')]) < price_date:
+                    os.remove(path); dropped += 1
+            except (OSError, ValueError): pass
+        return dropped
+
+
+class ResultCache:
+    """
+    Content-addressed cache of optimize payloads: in-process LRU in front of an optional
+    on-disk store. Keys include the last price date, and once a newer price date is seen
+    every entry for older dates is dropped, so a store refresh invalidates old results.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=256 * 2**20, disk_dir=None, disk_max_bytes=1024 * 2**20):
+        self.memory = MemoryBackend(max_entries, max_bytes)
+        self.disk = DiskBackend(disk_dir, disk_max_bytes) if disk_dir else None
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+        self.latest_price_date = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.counters["hits"] += 1
+                CACHE_REQUESTS.inc("result", "hit")
+                return entry[0]
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                payload, price_date = entry
+                with self._lock:
+                    self.counters["hits"] += 1; self.counters["disk_hits"] += 1
+                    self.counters["evictions"] += self.memory.put(key, payload, len(dumps(payload)), price_date)
+                CACHE_REQUESTS.inc("result", "disk_hit")
+                return payload
+        with self._lock: self.counters["misses"] += 1
+        CACHE_REQUESTS.inc("result", "miss")
+        return None
+
+    def put(self, key, payload, price_date):
+        body = dumps(payload)
+        self.observe_price_date(price_date)
+        with self._lock:
+            self.counters["stores"] += 1
+            self.counters["evictions"] += self.memory.put(key, payload, len(body), price_date)
+        if self.disk is not None:
+            evicted = self.disk.put(key, body, price_date)
+            with self._lock: self.counters["evictions"] += evicted
+
+    def observe_price_date(self, price_date):
+        """Drops entries computed on older prices once the store has advanced."""
+        with self._lock:
+            if self.latest_price_date is not None and price_date <= self.latest_price_date: return
+            self.latest_price_date = price_date
+            dropped = self.memory.drop_before(price_date)
+        if self.disk is not None: dropped += self.disk.drop_before(price_date)
+        with self._lock: self.counters["invalidations"] += dropped
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self.memory.entries), bytes=self.memory.bytes,
+                        hit_rate=round(self.counters["hits"] / lookups, 4) if lookups else None)
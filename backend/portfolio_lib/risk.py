@@ -0,0 +1,141 @@
+import numpy as np
+from statistics import NormalDist
+
+# historical:     empirical quantile / tail mean of the portfolio's daily returns
+# gaussian:       normal with the sample mean and volatility
+# cornish_fisher: normal quantile corrected for sample skew and excess kurtosis
+# filtered:       historical on EWMA-devolatilized returns rescaled to today's EWMA vol (FHS)
+METHODS = ("historical", "gaussian", "cornish_fisher", "filtered")
+
+_NORMAL = NormalDist()
+# Gauss-Legendre nodes on [-1, 1]; the Cornish-Fisher CVaR averages its quantile over the tail with them
+_GL_NODES, _GL_WEIGHTS = np.polynomial.legendre.leggauss(32)
+
+
+def _check_method(method):
+    if method not in METHODS: raise ValueError(f"Unknown VaR method: {method}")
+
+
+def portfolio_returns(weights, returns, cash_rate=None):
+    """
+    Daily returns (T x k) of each row of `weights`. With `cash_rate` (annual), the unallocated
+    1 - sum(w) earns it, or pays it when the portfolio is leveraged (sum(w) > 1).
+    """
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    daily = np.asarray(returns, dtype=float) @ W.T
+    if cash_rate: daily = daily + (1.0 - W.sum(axis=1)) * (cash_rate / 252)
+    return daily
+
+
+def historical_tail(daily, alpha=0.95):
+    """
+    Per column of `daily`: the (1 - alpha) quantile with np.percentile's linear interpolation,
+    and the Rockafellar-Uryasev CVaR of the losses. One np.partition call replaces the sort:
+    only the order statistics around the quantile and the worst ceil(T(1 - alpha)) days are placed.
+    """
+    daily = np.asarray(daily, dtype=float)
+    T = len(daily)
+    h = (T - 1) * (1.0 - alpha)
+    lo = int(np.floor(h)); hi = min(lo + 1, T - 1)
+    m = min(max(int(np.ceil(T * (1.0 - alpha))), 1), T)
+    part = np.partition(daily, sorted({lo, hi, m - 1}), axis=0)
+    a, b, t = part[lo], part[hi], h - lo
+    q = b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t  # numpy's _lerp, so q equals np.percentile
+    # CVaR = zeta + E[(loss - zeta)+] / (1 - alpha) at zeta = the m-th worst loss (a minimizer)
+    cvar = -part[m - 1] + np.sum(part[m - 1] - part[:m], axis=0) / ((1.0 - alpha) * T)
+    return q, cvar
+
+
+def _moments(daily):
+    mu = daily.mean(axis=0)
+    sigma = daily.std(axis=0, ddof=1)
+    c = daily - mu
+    m2 = np.mean(c ** 2, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = np.where(m2 > 0, np.mean(c ** 3, axis=0) / m2 ** 1.5, 0.0)
+        kurt = np.where(m2 > 0, np.mean(c ** 4, axis=0) / m2 ** 2 - 3.0, 0.0)
+    return mu, sigma, skew, kurt
+
+
+def _cornish_fisher(z, skew, kurt):
+    return (z + (z ** 2 - 1) * skew / 6 + (z ** 3 - 3 * z) * kurt / 24
+            - (2 * z ** 3 - 5 * z) * skew ** 2 / 36)
+
+
+def ewma_volatility(daily, decay=0.94):
+    """
+    RiskMetrics EWMA volatility per column: row t uses returns before t (seeded with the sample
+    variance), row T is the one-day-ahead forecast. Returns (T + 1) x k.
+    """
+    daily = np.atleast_2d(np.asarray(daily, dtype=float).T).T
+    sq = daily ** 2
+    s2 = np.empty((len(daily) + 1, daily.shape[1]))
+    s2[0] = sq.mean(axis=0)
+    for t in range(len(daily)): s2[t + 1] = decay * s2[t] + (1 - decay) * sq[t]
+    return np.sqrt(s2)
+
+
+def tail_risk(daily, alpha=0.95, method="historical", decay=0.94):
+    """Daily (VaR, CVaR) per column of `daily` as positive loss fractions."""
+    _check_method(method)
+    daily = np.atleast_2d(np.asarray(daily, dtype=float).T).T
+    if method == "historical":
+        q, cvar = historical_tail(daily, alpha)
+        return -q, cvar
+    if method == "filtered":
+        vol = ewma_volatility(daily, decay)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = np.where(vol[:-1] > 0, daily / vol[:-1], 0.0) * vol[-1]
+        q, cvar = historical_tail(scaled, alpha)
+        return -q, cvar
+
+    mu, sigma, skew, kurt = _moments(daily)
+    z = _NORMAL.inv_cdf(1.0 - alpha)
+    if method == "gaussian":
+        return -(mu + z * sigma), -(mu - sigma * _NORMAL.pdf(z) / (1.0 - alpha))
+    # CVaR is the average Cornish-Fisher quantile over the tail u in (0, 1 - alpha)
+    u = (_GL_NODES + 1) * (1.0 - alpha) / 2
+    zu = np.array([_NORMAL.inv_cdf(x) for x in u])[:, None]
+    tail_mean = _GL_WEIGHTS @ _cornish_fisher(zu, skew, kurt) / 2
+    return -(mu + _cornish_fisher(z, skew, kurt) * sigma), -(mu + tail_mean * sigma)
+
+
+def var_cvar(weights, returns, alpha=0.95, method="historical", cash_rate=None, decay=0.94):
+    """Daily VaR and CVaR (positive loss fractions) for every row of `weights` in one batch."""
+    return tail_risk(portfolio_returns(weights, returns, cash_rate), alpha, method, decay)
+
+
+def risk_report(daily, alpha=0.95, methods=METHODS, decay=0.94):
+    """
+    {method: (var, cvar)} for every column of the portfolio returns `daily` (e.g. the metrics
+    kernel's "daily", or `portfolio_returns`).
+    """
+    return {m: tail_risk(daily, alpha, m, decay) for m in methods}
+
+
+def target_var_leverage(weights, returns, target, alpha=0.95, method="historical", cash_rate=0.0, decay=0.94):
+    """
+    Leverage L such that holding L * w, with 1 - L * sum(w) in cash at `cash_rate` (borrowed
+    when negative), has daily VaR `target` (a fraction). Returns None if no L > 0 reaches it.
+
+    The return is c + L * x with c the daily cash rate and x = r.w - sum(w) * c. Historical,
+    Gaussian and Cornish-Fisher VaR are translation and scale equivariant, so
+    VaR(L) = L * VaR(x) - c and L is solved in closed form. Filtered VaR is only scale
+    equivariant, so with a nonzero cash rate it is solved with Brent's method instead.
+    """
+    _check_method(method)
+    w = np.asarray(weights, dtype=float)
+    c = (cash_rate or 0.0) / 252
+    x = np.asarray(returns, dtype=float) @ w - w.sum() * c
+    base = float(tail_risk(x, alpha, method, decay)[0][0])
+    if base <= 0: return None
+    if method != "filtered" or c == 0: return (target + c) / base if target + c > 0 else None
+
+    from scipy.optimize import brentq
+    f = lambda L: float(tail_risk(c + L * x, alpha, method, decay)[0][0]) - target
+    lo, hi = 0.0, max((target + c) / base, 1e-6)
+    while f(hi) < 0:
+        lo, hi = hi, hi * 2
+        if hi > 1e6: return None
+    if f(lo) > 0: return None
+    return brentq(f, lo, hi, xtol=1e-12)
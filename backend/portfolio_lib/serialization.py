@@ -0,0 +1,54 @@
+import gzip
+import json
+import numpy as np
+
+# Optional accelerators: orjson for encoding, brotli for compression. Both fall back cleanly.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COLUMNAR_MIME = "application/vnd.portfolio.columnar+json"
+MIN_COMPRESS_BYTES = 1024
+
+
+def wants_columnar(request):
+    """Columnar series are opt-in: `"format": "columnar"` in the body or the columnar Accept type."""
+    body = request.get_json(silent=True) or {}
+    return body.get('format') == 'columnar' or COLUMNAR_MIME in request.headers.get('Accept', '')
+
+
+def _default(obj):
+    if isinstance(obj, np.generic): return obj.item()
+    if isinstance(obj, np.ndarray): return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """JSON bytes, via orjson when installed (NaN/inf become null there)."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def compress(body, accept_encoding):
+    """Returns (body, content_encoding) using the best codec the client accepts."""
+    if len(body) < MIN_COMPRESS_BYTES: return body, None
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    if brotli is not None and 'br' in accepted: return brotli.compress(body, quality=4), 'br'
+    if 'gzip' in accepted: return gzip.compress(body, compresslevel=5), 'gzip'
+    return body, None
+
+
+def json_response(app, payload, status=200, columnar=False, accept_encoding=None):
+    """Flask response with fast JSON encoding and negotiated compression."""
+    body, encoding = compress(dumps(payload), accept_encoding)
+    response = app.response_class(body, status=status, mimetype=COLUMNAR_MIME if columnar else 'application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,249 @@
+import numpy as np
+
+# identity:             scaled identity (sklearn's LedoitWolf; Ledoit & Wolf 2004, "well-conditioned")
+# constant_correlation: sample variances, average pairwise correlation (Ledoit & Wolf 2004, "Honey")
+# single_factor:        equal-weighted market factor model (Ledoit & Wolf 2003)
+TARGETS = ("identity", "constant_correlation", "single_factor")
+
+
+def _check_target(target):
+    if target not in TARGETS: raise ValueError(f"Unknown shrinkage target: {target}")
+
+
+def _as_float(X):
+    """float32 input stays float32 (half the memory for wide universes); anything else becomes float64."""
+    X = np.asarray(X)
+    return X if X.dtype in (np.float32, np.float64) else X.astype(np.float64)
+
+
+def ledoit_wolf(X, target="identity", assume_centered=False):
+    """
+    Ledoit-Wolf shrunk covariance of the rows of `X` (samples x assets) -> (cov, shrinkage).
+
+    The identity target reproduces sklearn's `LedoitWolf().fit(X)` (covariance_, shrinkage_)
+    without the import, the input validation copies or the second p x p product it spends
+    on `beta`. Covariances use the 1/n normalization throughout, as sklearn does.
+    """
+    _check_target(target)
+    X = np.atleast_2d(_as_float(X))
+    n, p = X.shape
+    Y = X if assume_centered else X - X.mean(axis=0)
+    S = Y.T @ Y / n
+    if p == 1: return S, 0.0
+    if target == "identity":
+        norms = np.einsum('ij,ij->i', Y, Y)
+        return _identity(n, S, norms @ norms)
+    Y2 = Y * Y
+    P = Y2.T @ Y2 / n
+    if target == "constant_correlation":
+        return _constant_correlation(n, S, P, (Y2 * Y).T @ Y / n)
+    ym = Y.mean(axis=1)
+    Yz = Y * ym[:, None]
+    return _single_factor(n, S, P, Y.T @ ym / n, ym @ ym / n, Y2.T @ Yz / n, Yz.T @ Yz / n)
+
+
+def ledoit_wolf_pairwise(X, target="identity"):
+    """
+    Ledoit-Wolf for ragged histories: `X` (samples x assets) may hold NaN where an asset has
+    no data, and no rows are thrown away. Each column is centered on its own observations and
+    every moment uses only the rows where both assets are present, so entry (i, j) of the
+    sample covariance and of the shrinkage estimate is averaged over its own count N_ij:
+
+        S_ij = sum_t y_ti y_tj / N_ij,   beta = (1/p) sum_ij (sum_t y_ti^2 y_tj^2 / N_ij^2 - S_ij^2 / N_ij)
+
+    With no NaN every N_ij = n and this is exactly `ledoit_wolf(X)`. Pairwise estimates need
+    not be positive semidefinite, so negative eigenvalues of the result are lifted to a small
+    floor. Identity target only. Returns (cov, shrinkage, N).
+    """
+    if target != "identity": raise ValueError("Pairwise Ledoit-Wolf supports the identity target only")
+    X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+    M = ~np.isnan(X)
+    counts = M.sum(axis=0)
+    Y = np.where(M, X - np.where(M, X, 0.0).sum(axis=0) / np.maximum(counts, 1), 0.0)
+    Mf = M.astype(np.float64)
+    N = Mf.T @ Mf
+    Nd = np.maximum(N, 1.0)
+    S = Y.T @ Y / Nd
+    p = S.shape[0]
+    if p == 1: return S, 0.0, N
+    Y2 = Y * Y
+    # _identity's beta_ / n equals sum_ij P_ij / n^2 for complete data; hand it the per-entry version
+    n_ref = float(N.mean())
+    beta_ = n_ref ** 2 * np.sum(Y2.T @ Y2 / Nd ** 2 - S ** 2 / Nd) + n_ref * np.sum(S ** 2)
+    cov, shrinkage = _identity(n_ref, S, beta_)
+
+    try: np.linalg.cholesky(cov)  # Cheaper than eigh when, as usual, there is nothing to repair
+    except np.linalg.LinAlgError:
+        w, V = np.linalg.eigh(cov)
+        cov = (V * np.maximum(w, 1e-10 * np.mean(np.diag(cov)))) @ V.T
+    return cov, shrinkage, N
+
+
+# --- Finishing steps, shared by the batch and rolling estimators. Moments are centered and /n ---
+
+def _identity(n, emp_cov, beta_):
+    """sklearn's formula; `beta_` is sum_t |x_t - mean|^4 (not normalized)."""
+    p = len(emp_cov)
+    trace = np.diag(emp_cov)
+    mu = trace.sum() / p
+    delta_ = np.sum(emp_cov ** 2)
+    beta = 1.0 / (p * n) * (beta_ / n - delta_)
+    delta = (delta_ - 2.0 * mu * trace.sum() + p * mu ** 2) / p
+    beta = min(beta, delta)
+    shrinkage = 0.0 if beta == 0 else beta / delta
+
+    cov = (1.0 - shrinkage) * emp_cov
+    cov.flat[::p + 1] += shrinkage * mu
+    return cov, shrinkage
+
+
+def _blend(S, F, pi, rho, gamma, n):
+    shrinkage = 0.0 if gamma <= 0 else float(np.clip((pi - rho) / gamma / n, 0.0, 1.0))
+    return shrinkage * F + (1.0 - shrinkage) * S, shrinkage
+
+
+def _constant_correlation(n, S, P, Q):
+    """P = E[y_i^2 y_j^2], Q = E[y_i^3 y_j] (Ledoit-Wolf covCor)."""
+    p = len(S)
+    var = np.diag(S).copy()
+    sd = np.sqrt(var)
+    inv = np.where(sd > 0, 1.0 / np.where(sd > 0, sd, 1.0), 0.0)
+    corr = S * np.outer(inv, inv)
+    rbar = (corr.sum() - np.trace(corr)) / (p * (p - 1))
+    F = rbar * np.outer(sd, sd)
+    F.flat[::p + 1] = var
+
+    phi = P - S ** 2
+    theta = Q - var[:, None] * S
+    theta.flat[::p + 1] = 0.0
+    rho = np.trace(phi) + rbar * np.sum(np.outer(inv, sd) * theta)
+    return _blend(S, F, phi.sum(), rho, np.sum((F - S) ** 2), n)
+
+
+def _single_factor(n, S, P, cm, vm, YZ, ZZ):
+    """cm = cov(y_i, m), vm = var(m), YZ = E[y_i^2 y_j m], ZZ = E[y_i y_j m^2] (Ledoit-Wolf covMarket)."""
+    p = len(S)
+    var = np.diag(S)
+    if vm <= 0: return S.copy(), 0.0
+    F = np.outer(cm, cm) / vm
+    F.flat[::p + 1] = var
+
+    pi = P.sum() - np.sum(S ** 2)
+    v1 = YZ - cm[:, None] * S
+    v3 = ZZ - vm * S
+    roff1 = (v1.sum(axis=0) @ cm - np.diag(v1) @ cm) / vm
+    roff3 = (cm @ v3 @ cm - np.diag(v3) @ cm ** 2) / vm ** 2
+    rho = np.trace(P) - np.sum(var ** 2) + 2 * roff1 - roff3
+    return _blend(S, F, pi, rho, np.sum((F - S) ** 2), n)
+
+
+def _ledoit_wolf_from_sums(n, s1, s11, v, r2):
+    """Identity-target Ledoit-Wolf from raw-moment sums over n rows (x, x x^T, |x|^2 x, |x|^4)."""
+    p = len(s1)
+    mean = s1 / n
+    emp_cov = s11 / n - np.outer(mean, mean)
+    if p == 1: return emp_cov, 0.0
+
+    # beta_ = sum_i |x_i - mean|^4, expanded in terms of the raw sums
+    mm = mean @ mean
+    s_sq = mean @ s11 @ mean           # sum_i (x_i . mean)^2
+    rs = v @ mean                      # sum_i |x_i|^2 (x_i . mean)
+    r1 = np.trace(s11)                 # sum_i |x_i|^2
+    s = s1 @ mean                      # sum_i x_i . mean
+    beta_ = r2 + 4 * s_sq + n * mm ** 2 - 4 * rs + 2 * mm * r1 - 4 * mm * s
+    return _identity(n, emp_cov, beta_)
+
+
+class RollingLedoitWolf:
+    """
+    Ledoit-Wolf over a sliding window, kept as raw-moment sums. Rows enter with `add` and
+    leave with `remove` (rank-one updates, O(p^2) per row), so rolling the window never
+    refits from scratch; `estimate()` centers the sums and finishes the shrunk covariance.
+
+    The identity target needs x x^T plus two cheap sums. The other targets also keep the
+    fourth-moment matrices their shrinkage intensity depends on: (x^2)(x^2)^T, (x^2)x^T and
+    (x^3)x^T for constant correlation, and market-weighted cross moments for single factor.
+    `dtype=np.float32` halves the memory of those p x p sums.
+    """
+
+    def __init__(self, p, target="identity", dtype=np.float64):
+        _check_target(target)
+        self.p, self.target, self.dtype = p, target, np.dtype(dtype)
+        z = lambda *shape: np.zeros(shape, dtype=self.dtype)
+        self.n = 0
+        self.s1 = z(p); self.s11 = z(p, p)
+        if target == "identity":
+            self.v = z(p); self.r2 = 0.0
+            return
+        self.s2 = z(p); self.a21 = z(p, p); self.a22 = z(p, p)
+        if target == "constant_correlation":
+            self.s3 = z(p); self.a31 = z(p, p)
+        else:
+            # w = equal-weighted market return of each row
+            self.sw = 0.0; self.sw2 = 0.0
+            self.xw = z(p); self.x2w = z(p); self.xw2 = z(p)
+            self.b11 = z(p, p); self.b21 = z(p, p); self.b12 = z(p, p)
+
+    def add(self, rows, sign=1.0):
+        X = np.atleast_2d(np.asarray(rows, dtype=self.dtype))
+        self.n += int(sign) * len(X)
+        self.s1 += sign * X.sum(axis=0)
+        self.s11 += sign * (X.T @ X)
+        if self.target == "identity":
+            norms = np.einsum('ij,ij->i', X, X)
+            self.v += sign * (norms @ X)
+            self.r2 += sign * (norms @ norms)
+            return
+        X2 = X * X
+        self.s2 += sign * X2.sum(axis=0)
+        self.a21 += sign * (X2.T @ X)
+        self.a22 += sign * (X2.T @ X2)
+        if self.target == "constant_correlation":
+            X3 = X2 * X
+            self.s3 += sign * X3.sum(axis=0)
+            self.a31 += sign * (X3.T @ X)
+        else:
+            w = X.mean(axis=1)
+            Xw = X * w[:, None]
+            self.sw += sign * float(w.sum()); self.sw2 += sign * float(w @ w)
+            self.xw += sign * (w @ X); self.x2w += sign * (w @ X2); self.xw2 += sign * ((w * w) @ X)
+            self.b11 += sign * (X.T @ Xw)
+            self.b21 += sign * (X2.T @ Xw)
+            self.b12 += sign * (Xw.T @ Xw)
+
+    def remove(self, rows):
+        self.add(rows, -1.0)
+
+    def reset(self, rows):
+        """Recomputes the sums from `rows`, discarding rounding drift from many add/remove pairs."""
+        self.__init__(np.shape(rows)[1], self.target, self.dtype); self.add(rows)
+
+    def estimate(self):
+        """(cov, shrinkage) for the rows currently in the window."""
+        if self.target == "identity":
+            return _ledoit_wolf_from_sums(self.n, self.s1, self.s11, self.v, self.r2)
+        n = self.n
+        m = self.s1 / n
+        mi, mj = m[:, None], m[None, :]
+        A11, A21, s2 = self.s11 / n, self.a21 / n, self.s2 / n
+        S = A11 - mi * mj
+        if self.p == 1: return S, 0.0
+        # Central moments from raw ones: expand (x_i - m_i)^a (x_j - m_j)^b term by term
+        P = (self.a22 / n - 2 * A21 * mj - 2 * A21.T * mi + s2[:, None] * mj ** 2 + mi ** 2 * s2[None, :]
+             + 4 * mi * mj * A11 - 3 * mi ** 2 * mj ** 2)
+        if self.target == "constant_correlation":
+            Q = (self.a31 / n - (self.s3 / n)[:, None] * mj - 3 * mi * A21 + 3 * mi * mj * s2[:, None]
+                 + 3 * mi ** 2 * A11 - 3 * mi ** 3 * mj)
+            return _constant_correlation(n, S, P, Q)
+
+        mw, w2 = self.sw / n, self.sw2 / n
+        xw, x2w, xw2 = self.xw / n, self.x2w / n, self.xw2 / n
+        B11 = self.b11 / n
+        R = A21 - mj * s2[:, None] - 2 * mi * A11 + 2 * mi ** 2 * mj                 # E[y_i^2 y_j]
+        Rw = (self.b21 / n - mj * x2w[:, None] - 2 * mi * B11 + 2 * mi * mj * xw[:, None]
+              + mi ** 2 * xw[None, :] - mi ** 2 * mj * mw)                          # E[y_i^2 y_j w]
+        L1 = B11 - mj * xw[:, None] - mi * xw[None, :] + mi * mj * mw                # E[y_i y_j w]
+        L2 = self.b12 / n - mj * xw2[:, None] - mi * xw2[None, :] + mi * mj * w2     # E[y_i y_j w^2]
+        YZ = Rw - mw * R
+        ZZ = L2 - 2 * mw * L1 + mw ** 2 * S
+        return _single_factor(n, S, P, xw - m * mw, w2 - mw ** 2, YZ, ZZ)
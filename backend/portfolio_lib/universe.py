@@ -0,0 +1,104 @@
+import numpy as np
+from .instrumentation import stage
+
+# "auto" clusters baskets larger than LARGE_UNIVERSE tickers and solves smaller ones densely
+UNIVERSE_MODES = ("auto", "dense", "clustered")
+LARGE_UNIVERSE = 150
+
+
+def use_clusters(universe, n_assets):
+    if universe not in UNIVERSE_MODES: raise ValueError(f"Unknown universe mode: {universe}")
+    return universe == "clustered" or (universe == "auto" and n_assets > LARGE_UNIVERSE)
+
+
+@stage("prescreen")
+def prescreen(prices, min_history=252, max_corr=0.98):
+    """
+    Drops tickers that would only add noise or cost to a large optimization, on the raw
+    (ragged) price panel: fewer than `min_history` prices (capped at the panel length), no
+    price variation, or daily-return correlation above `max_corr` with a ticker already kept.
+    Longer histories are kept first, so of two near duplicates the older listing survives.
+
+    Returns (prices of the kept tickers, {ticker: reason} for the dropped ones).
+    """
+    need = min(min_history, len(prices))
+    counts = prices.notna().sum().values
+    dropped = {t: "history" for t, c in zip(prices.columns, counts) if c < need}
+    cols = [t for t in prices.columns if t not in dropped]
+
+    # Correlations over the trailing `need` rows; a missing day counts as a zero return
+    R = prices[cols].iloc[-need:].pct_change().iloc[1:].fillna(0.0).values
+    sd = R.std(axis=0)
+    dropped.update({t: "constant" for t, s in zip(cols, sd) if s == 0})
+    live = sd > 0
+    Z = (R[:, live] - R[:, live].mean(axis=0)) / sd[live]
+    corr = Z.T @ Z / len(Z)
+    names = [t for t, ok in zip(cols, live) if ok]
+
+    # Greedy pass, longest history first: each kept ticker removes its near duplicates
+    order = np.argsort(-counts[[prices.columns.get_loc(t) for t in names]], kind="stable")
+    removed = np.zeros(len(names), dtype=bool)
+    for i in order:
+        if removed[i]: continue
+        dup = corr[i] > max_corr
+        dup[i] = False
+        for j in np.flatnonzero(dup & ~removed): dropped[names[j]] = "duplicate"
+        removed |= dup
+    kept = [t for t in prices.columns if t not in dropped]
+    return prices[kept], dropped
+
+
+def cluster_blocks(link, max_size):
+    """
+    Correlation clusters from an HRP linkage: the tree is split top-down until no cluster has
+    more than `max_size` leaves, then neighbouring clusters in leaf order are merged while they
+    fit (single linkage tends to peel off singletons). Returns index arrays in leaf order.
+    """
+    import scipy.cluster.hierarchy as sch
+    blocks, stack = [], [sch.to_tree(link)]
+    while stack:
+        node = stack.pop()
+        if node.get_count() <= max_size: blocks.append(node.pre_order())
+        else: stack += [node.get_right(), node.get_left()]  # Left pops first, keeping leaf order
+    merged = [blocks[0]]
+    for b in blocks[1:]:
+        if len(merged[-1]) + len(b) <= max_size: merged[-1] = merged[-1] + b
+        else: merged.append(b)
+    return [np.array(b) for b in merged]
+
+
+def default_cluster_size(n_assets):
+    """About sqrt(n) assets per cluster, so the per-cluster and across-cluster problems are of similar size."""
+    return max(int(np.ceil(np.sqrt(n_assets))), 2)
+
+
+def composite_matrix(blocks, within, n_assets):
+    """(n x k) loadings of k composite assets: column j holds `within[j]` on the tickers of block j."""
+    B = np.zeros((n_assets, len(blocks)))
+    for j, (b, w) in enumerate(zip(blocks, within)): B[b, j] = w
+    return B
+
+
+def inverse_variance_composites(cov, blocks):
+    """`composite_matrix` with inverse-variance weights inside each block."""
+    iv = 1.0 / np.maximum(np.diag(cov), 1e-12)
+    return composite_matrix(blocks, [iv[b] / iv[b].sum() for b in blocks], len(iv))
+
+
+def cluster_labels(tickers, blocks):
+    """One name per cluster: its first ticker in leaf order, plus how many others it holds."""
+    return [tickers[b[0]] + (f" +{len(b) - 1}" if len(b) > 1 else "") for b in blocks]
+
+
+def project_to_box(w, min_w, max_w, iters=100):
+    """
+    Euclidean projection of `w` onto {sum(x) = 1, min_w <= x <= max_w}: x = clip(w - tau), with
+    tau found by bisection (the sum is monotone in tau). Assumes the box admits sum 1.
+    """
+    w = np.asarray(w, dtype=float)
+    lo, hi = np.min(w - max_w), np.max(w - min_w)
+    for _ in range(iters):
+        tau = (lo + hi) / 2
+        if np.clip(w - tau, min_w, max_w).sum() > 1: lo = tau
+        else: hi = tau
+    return np.clip(w - (lo + hi) / 2, min_w, max_w)
@@ -1,41 +1,163 @@
 import numpy as np
-import scipy.cluster.hierarchy as sch
-from scipy.spatial.distance import squareform
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import io
 import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from .hrp import correlation_linkage
+from .frontier import sample_portfolios, trace_frontier
+from .instrumentation import stage, CACHE_REQUESTS
 
-def generate_dendrogram_image(cov_matrix):
+IMAGE_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+@stage("dendrogram")
+def dendrogram_tree(labels, link):
+    """
+    The dendrogram as compact JSON for client-side drawing: leaf labels in plot order, their
+    original indices, and one 4-point polyline per merge (scipy's icoord/dcoord; leaf i sits
+    at x = 10 * i + 5, y is the merge distance).
+    """
+    # Laid out here rather than with sch.dendrogram(no_plot=True), which recurses once per tree
+    # level and overflows the stack on the deep, chained trees of large universes
+    import scipy.cluster.hierarchy as sch
+    link = np.asarray(link, dtype=float)
+    n = len(link) + 1
+    leaves = sch.leaves_list(link)
+    left, right, dist = link[:, 0].astype(int), link[:, 1].astype(int), link[:, 2]
+    x = np.empty(2 * n - 1); y = np.zeros(2 * n - 1)
+    x[leaves] = 10 * np.arange(n) + 5
+    y[n:] = dist
+    for k in range(n - 1): x[n + k] = (x[left[k]] + x[right[k]]) / 2  # Children always precede their merge
+    icoord = np.stack([x[left], x[left], x[right], x[right]], axis=1)
+    dcoord = np.stack([y[left], dist, dist, y[right]], axis=1)
+    return {"labels": [labels[i] for i in leaves], "leaves": leaves.tolist(),
+            "icoord": np.round(icoord, 2).tolist(), "dcoord": np.round(dcoord, 4).tolist()}
+
+
+def dendrogram_key(cov_matrix):
+    """Content hash of the correlation matrix (to 6 dp) and labels; the linkage is a function of both."""
+    cov = np.asarray(cov_matrix, dtype=float)
+    sd = np.sqrt(np.diag(cov))
+    corr = np.round((cov / np.outer(sd, sd)).clip(-1, 1), 6) + 0.0  # + 0.0 folds -0.0 into 0.0
+    h = hashlib.sha256(corr.tobytes())
+    h.update("\x1f".join(map(str, getattr(cov_matrix, 'columns', range(len(cov))))).encode())
+    return h.hexdigest()[:32]
+
+
+@stage("dendrogram_render")
+def render_dendrogram(cov_matrix, link=None, fmt="png", labels=None):
+    """
+    Draws the dendrogram with matplotlib and returns the encoded image bytes (png or svg).
+    With `link` and `labels` given, `cov_matrix` is not needed.
+    """
+    # Imported here so only renders pay for matplotlib. The Figure API draws through Agg (or
+    # the SVG backend) by itself, so no global backend switch (matplotlib.use) is needed
+    import scipy.cluster.hierarchy as sch
+    from matplotlib.figure import Figure
+    if link is None: _, link = correlation_linkage(cov_matrix)
+
+    # Figure API rather than pyplot: no global figure state, so threads can render concurrently
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    sch.dendrogram(np.asarray(link, dtype=float), labels=list(cov_matrix.columns if labels is None else labels), leaf_rotation=90, ax=ax)
+    ax.set_title("Asset Hierarchy (HRP Clustering)", fontsize=14)
+    ax.set_ylabel("Distance (Correlation)", fontsize=10)
+    fig.tight_layout()
+
+    img = io.BytesIO()
+    fig.savefig(img, format=fmt, transparent=True)
+    return img.getvalue()
+
+
+class DendrogramRenderer:
+    """
+    LRU of rendered dendrogram images keyed by (`dendrogram_key`, format), so a correlation
+    matrix that was drawn once is never drawn again. `submit` schedules the render on a
+    background thread and returns the key at once, which keeps matplotlib off the request
+    path; `get` waits for a pending render. Per process, like JobManager.
+    """
+
+    def __init__(self, max_entries=64, workers=1):
+        self.max_entries = max_entries
+        self.workers = workers
+        self.entries = OrderedDict()  # (key, fmt) -> Future of image bytes
+        self._lock = threading.Lock()
+        self._pool = None  # Created on first submit, so importing (or preloading) starts no threads
+
+    def _lookup(self, key, fmt):
+        fut = self.entries.get((key, fmt))
+        if fut is not None: self.entries.move_to_end((key, fmt))
+        CACHE_REQUESTS.inc("dendrogram", "hit" if fut is not None else "miss")
+        return fut
+
+    def _store(self, key, fmt, fut):
+        self.entries[(key, fmt)] = fut
+        while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+
+    def submit(self, cov_matrix, link=None, fmt="png"):
+        """Queues a render unless one is cached or pending. Returns the key."""
+        key = dendrogram_key(cov_matrix)
+        with self._lock:
+            if self._lookup(key, fmt) is None:
+                if self._pool is None: self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="dendrogram")
+                self._store(key, fmt, self._pool.submit(render_dendrogram, cov_matrix, link, fmt))
+        return key
+
+    def restore(self, key, labels, link, fmt="png"):
+        """Queues the render behind an earlier response's image URL again if it was evicted (or the process restarted)."""
+        with self._lock:
+            if self._lookup(key, fmt) is None:
+                if self._pool is None: self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="dendrogram")
+                self._store(key, fmt, self._pool.submit(render_dendrogram, None, link, fmt, labels))
+
+    def render(self, cov_matrix, link=None, fmt="png"):
+        """Cached image bytes, rendering inline on a miss."""
+        key = dendrogram_key(cov_matrix)
+        with self._lock: fut = self._lookup(key, fmt)
+        if fut is not None: return fut.result()
+        fut = Future(); fut.set_result(render_dendrogram(cov_matrix, link, fmt))
+        with self._lock: self._store(key, fmt, fut)
+        return fut.result()
+
+    def get(self, key, fmt="png", timeout=60):
+        """Image bytes for `key`, waiting for a pending render; None if unknown, evicted or failed."""
+        with self._lock: fut = self.entries.get((key, fmt))
+        if fut is None: return None
+        try: return fut.result(timeout)
+        except Exception as e:
+            print(f"Dendrogram Error: {e}")
+            return None
+
+
+_renderer = None
+
+def get_dendrogram_renderer():
+    """Process-wide DendrogramRenderer, created on first use."""
+    global _renderer
+    if _renderer is None: _renderer = DendrogramRenderer()
+    return _renderer
+
+
+def generate_dendrogram_image(cov_matrix, link=None):
+    """The HRP dendrogram as base64 PNG, cached by correlation matrix. Pass the HRP `link` to skip re-clustering."""
     try:
-        std_devs = np.sqrt(np.diag(cov_matrix))
-        corr = (cov_matrix / np.outer(std_devs, std_devs)).clip(-1, 1)
-        dist = np.sqrt((1 - corr) / 2)
-        link = sch.linkage(squareform(dist, checks=False), 'single')
-        
-        plt.figure(figsize=(10, 5))
-        sch.dendrogram(link, labels=cov_matrix.columns, leaf_rotation=90)
-        plt.title("Asset Hierarchy (HRP Clustering)", fontsize=14)
-        plt.ylabel("Distance (Correlation)", fontsize=10)
-        plt.tight_layout()
-        
-        img = io.BytesIO()
-        plt.savefig(img, format='png', transparent=True)
-        img.seek(0)
-        plt.close()
-        return base64.b64encode(img.getvalue()).decode('utf8')
+        return base64.b64encode(get_dendrogram_renderer().render(cov_matrix, link)).decode('utf8')
     except Exception as e:
         print(f"Dendrogram Error: {e}")
         return None
 
-def generate_efficient_frontier(mean_returns, cov_matrix, num_portfolios=200):
-    results = []
-    n_assets = len(mean_returns)
-    for _ in range(num_portfolios):
-        weights = np.random.random(n_assets)
-        weights /= np.sum(weights)
-        ret = np.sum(mean_returns * weights) * 252
-        vol = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights))) * np.sqrt(252)
-        results.append({"x": round(vol * 100, 2), "y": round(ret * 100, 2)})
-    return results
\ No newline at end of file
+def generate_efficient_frontier(mean_returns, cov_matrix, num_portfolios=200, seed=0):
+    """Cloud of random portfolios as [{"x": vol %, "y": return %}], sampled in one seeded batch."""
+    vols, rets = sample_portfolios(mean_returns, cov_matrix, num_portfolios, seed)
+    return [{"x": x, "y": y} for x, y in zip(np.round(vols * 100, 2).tolist(), np.round(rets * 100, 2).tolist())]
+
+def generate_frontier_curve(mean_returns, cov_matrix, min_w=0.0, max_w=1.0, num_points=30):
+    """The exact efficient frontier under the weight bounds, in the same point format as the cloud."""
+    try:
+        vols, rets, _ = trace_frontier(mean_returns, cov_matrix, min_w, max_w, num_points)
+        return [{"x": x, "y": y} for x, y in zip(np.round(vols * 100, 2).tolist(), np.round(rets * 100, 2).tolist())]
+    except Exception as e:
+        print(f"Frontier Error: {e}")
+        return []
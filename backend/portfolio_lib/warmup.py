@@ -0,0 +1,45 @@
+import time
+import importlib
+import numpy as np
+import pandas as pd
+from .optimizers import find_optimal_allocations
+from .execution import StrategyExecutor
+from .visuals import generate_dendrogram_image
+
+# Imported on first use by the modules that need them (see optimizers, frontier, hrp, visuals, data)
+LAZY_MODULES = ("scipy.optimize", "scipy.cluster.hierarchy", "scipy.spatial.distance",
+                "matplotlib.figure", "matplotlib.backends.backend_agg", "yfinance")
+
+
+def preload():
+    """Imports LAZY_MODULES now. Missing optional ones are skipped and returned."""
+    missing = []
+    for name in LAZY_MODULES:
+        try: importlib.import_module(name)
+        except ImportError: missing.append(name)
+    return missing
+
+
+def warmup(render=True):
+    """
+    Pays first-use costs up front: the lazy imports, then one small serial pipeline run
+    (SLSQP, Spinu, HRP, BLAS setup) and, with `render`, one dendrogram (matplotlib's font
+    cache). Returns {step: seconds}.
+
+    Call it before workers fork (`PRELOAD=1 gunicorn --preload app:app`) so every worker
+    inherits the loaded modules copy-on-write, or per worker before it serves traffic.
+    Runs inline and starts no threads or processes, so it is safe to fork afterwards. Its
+    stages and solves show up in /metrics like any others.
+    """
+    timings = {}
+    def step(name, fn):
+        t0 = time.perf_counter(); fn(); timings[name] = round(time.perf_counter() - t0, 4)
+
+    step("imports", preload)
+    rng = np.random.default_rng(0)
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(3e-4, 0.01, (260, 4)), axis=0)),
+                          index=pd.bdate_range("2020-01-01", periods=260), columns=["A", "B", "C", "D"])
+    result = {}
+    step("optimize", lambda: result.update(find_optimal_allocations(prices, 0.0, 1.0, 0.0, executor=StrategyExecutor("serial"))))
+    if render: step("render", lambda: generate_dendrogram_image(result['debug_cov'], result['debug_linkage']))
+    return timings
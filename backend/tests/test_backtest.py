@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio_lib import backtest
+from portfolio_lib.backtest import rebalance_points, walk_forward
+from portfolio_lib.lookback import RollingEWMA
+from portfolio_lib.shrinkage import RollingLedoitWolf, ledoit_wolf
+
+# Two assets over six days. With window=2 and a 2-day schedule the book is set at the closes of
+# rows 1 and 3 and held over rows 2-3 and 4-5.
+TWO_PERIODS = pd.DataFrame([[0.01, 0.00], [0.00, 0.01], [0.10, 0.00], [0.10, -0.10], [0.00, 0.05], [-0.10, 0.00]],
+                           index=pd.bdate_range("2026-03-02", periods=6), columns=["A", "B"])
+
+
+def fixed_hrp(monkeypatch, *weights):
+    """HRP returns `weights` in turn, one per rebalance."""
+    queue = [np.array(w) for w in weights]
+    monkeypatch.setattr(backtest, "hrp_allocation", lambda cov: (queue.pop(0), None))
+
+
+def test_two_period_walk_forward_by_hand(monkeypatch):
+    fixed_hrp(monkeypatch, [0.5, 0.5], [0.2, 0.8])
+    first, second, summary = walk_forward(TWO_PERIODS, window=2, schedule=2, strategies=("HRP",))
+    assert (first["rebalance"], second["rebalance"]) == ("2026-03-03", "2026-03-05")
+    assert first["dates"] == ["2026-03-04", "2026-03-05"] and second["dates"] == ["2026-03-06", "2026-03-09"]
+
+    # Period 1: half in each; A grows 1.1 then 1.21, B 1.0 then 0.9
+    p1 = first["strategies"]["HRP"]
+    assert p1["weights"] == {"A": 50.0, "B": 50.0} and p1["turnover"] == 1.0
+    assert p1["period_return"] == pytest.approx(0.055)
+    np.testing.assert_allclose(p1["equity"], [1.05, 1.055], atol=1e-6)
+
+    # The book drifted to (0.605, 0.45) / 1.055, so moving to (0.2, 0.8) trades 2 * (0.605 / 1.055 - 0.2)
+    p2 = second["strategies"]["HRP"]
+    assert p2["turnover"] == pytest.approx(2 * (0.605 / 1.055 - 0.2), abs=1e-4)
+    assert p2["period_return"] == pytest.approx(0.02)
+    np.testing.assert_allclose(p2["equity"], [1.055 * 1.04, 1.055 * 1.02], atol=1e-6)
+
+    s = summary["strategies"]["HRP"]
+    daily = np.array([0.05, 1.055 / 1.05 - 1, 0.04, 1.02 / 1.04 - 1])
+    assert s["days"] == 4
+    assert s["total_return"] == pytest.approx(1.055 * 1.02 - 1)
+    assert s["max_drawdown"] == pytest.approx(1.02 / 1.04 - 1)
+    assert s["avg_turnover"] == pytest.approx((1 + 2 * (0.605 / 1.055 - 0.2)) / 2)
+    assert s["return"] == pytest.approx(daily.mean() * 252)
+    assert s["volatility"] == pytest.approx(daily.std() * np.sqrt(252))
+
+
+def test_rebalance_schedule():
+    dates = pd.bdate_range("2026-01-26", "2026-04-30")
+    # Every 5 rows from the first full window, never on the last row
+    assert rebalance_points(dates, 10, 5) == list(range(9, len(dates) - 1, 5))
+    # Month ends after the first full window; the final month's end is the last row, so it is not a rebalance
+    assert [dates[t].strftime('%Y-%m-%d') for t in rebalance_points(dates, 10, "monthly")] == \
+        ["2026-02-06", "2026-02-27", "2026-03-31"]
+    assert rebalance_points(dates, len(dates), "monthly") == []
+    with pytest.raises(ValueError): rebalance_points(dates, 10, "daily")
+
+
+@pytest.mark.parametrize("resync", [1, 3, 24])
+def test_rolling_estimates_match_a_fresh_fit(monkeypatch, resync):
+    rng = np.random.default_rng(0)
+    returns = pd.DataFrame(rng.normal(0.0004, 0.01, (300, 4)) + rng.normal(0, 0.006, (300, 1)),
+                           index=pd.bdate_range("2025-01-01", periods=300), columns=list("ABCD"))
+    seen = []
+    monkeypatch.setattr(backtest, "run_max_sharpe", lambda mean, cov, *a, **kw: seen.append((mean, cov)) or np.full(4, 0.25))
+    resets = []
+    reset = RollingLedoitWolf.reset
+    monkeypatch.setattr(RollingLedoitWolf, "reset", lambda self, rows: resets.append(len(rows)) or reset(self, rows))
+
+    window = 60
+    points = rebalance_points(returns.index, window, 10)
+    records = list(walk_forward(returns, window, 10, strategies=("Max Sharpe",), resync=resync))
+    assert len(records) == len(points) + 1 == len(seen) + 1
+    # Exact sums every `resync` rebalances, incremental updates in between
+    assert len(resets) == len(range(0, len(points), resync))
+
+    X = returns.values
+    for t, (mean, cov), record in zip(points, seen, records):
+        rows = X[t - window + 1:t + 1]
+        cov_fit, shrink = ledoit_wolf(rows)
+        np.testing.assert_allclose(cov, cov_fit, rtol=1e-9)
+        np.testing.assert_allclose(mean, RollingEWMA(rows, span=window).mean(), rtol=1e-9, atol=1e-15)
+        assert record["shrinkage"] == round(float(shrink), 4)
@@ -0,0 +1,74 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio_lib import data
+from portfolio_lib.benchmarks import BENCHMARK_TICKERS, BenchmarkCache
+from portfolio_lib.price_store import PriceStore, FrameProvider
+
+app = pytest.importorskip("app")
+
+TICKERS = [f"T{i:02d}" for i in range(8)]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The Flask app on an offline price store, with fresh caches and a fixed risk-free rate."""
+    days = 400
+    rng = np.random.default_rng(0)
+    rets = rng.normal(0.0004, 0.01, (days, len(TICKERS) + 5)) + rng.normal(0, 0.006, (days, 1))
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=days)
+    prices = pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=index, columns=TICKERS + BENCHMARK_TICKERS)
+    monkeypatch.setattr(data, "_default_store", PriceStore(str(tmp_path), FrameProvider(prices)))
+    monkeypatch.setattr(app, "get_risk_free_rate", lambda: 0.045)
+    monkeypatch.setattr(app, "benchmark_cache", BenchmarkCache(lambda: data.fetch_market_data(BENCHMARK_TICKERS, clean=False)))
+    return app.app.test_client()
+
+
+def post_batch(client, scenarios, **base):
+    r = client.post('/api/optimize/batch', json={"tickers": TICKERS, "min_weight": 0, **base, "scenarios": scenarios})
+    assert r.status_code == 200
+    return [json.loads(line) for line in r.data.splitlines()]
+
+
+def test_batch_shares_fits_and_warm_starts(client, monkeypatch):
+    fits = []
+    fit_regime = app.fit_regime
+    monkeypatch.setattr(app, "fit_regime", lambda prices, *a, **kw: fits.append(list(prices.columns)) or fit_regime(prices, *a, **kw))
+    scenarios = [{"max_weight": 30}, {"max_weight": 25}, {"max_weight": 30}, {"max_weight": 26},
+                 {"var_method": "bogus"}, {"tickers": TICKERS[:4], "max_weight": 40}, {"max_weight": 20, "target_value": 10}]
+    lines = post_batch(client, scenarios)
+
+    # One fit per ticker set, announced before its first scenario
+    assert fits == [TICKERS, TICKERS[:4]]
+    assert [(l["type"], l.get("group")) for l in lines if l["type"] == "group"] == [("group", 0), ("group", 1)]
+    by_index = {l["index"]: l for l in lines if l["type"] in ("scenario", "error")}
+    assert sorted(by_index) == list(range(len(scenarios)))
+
+    solves = {i: (l["group"], l["solve"], l["solved_from"]) for i, l in by_index.items() if l["type"] == "scenario"}
+    assert solves == {0: (0, "cold", None), 1: (0, "warm", 0), 2: (0, "reused", 0), 3: (0, "warm", 1),
+                      5: (1, "cold", None), 6: (0, "warm", 1)}
+    # A bad scenario is reported in place and the rest still run
+    assert by_index[4]["type"] == "error" and "var_method" in by_index[4]["error"]
+
+    summary = lines[-1]
+    assert summary["type"] == "summary"
+    assert {k: summary[k] for k in ("scenarios", "groups", "solved", "errors", "reused", "warm", "cold")} == \
+        {"scenarios": 7, "groups": 2, "solved": 6, "errors": 1, "reused": 1, "warm": 3, "cold": 2}
+
+
+def test_batch_scenario_matches_single_request(client):
+    lines = post_batch(client, [{"max_weight": 30}, {"max_weight": 25}])
+    warm = next(l for l in lines if l.get("index") == 1)
+    single = client.post('/api/optimize', json={"tickers": TICKERS, "min_weight": 0, "max_weight": 25}).get_json()
+    for name, result in single["strategies"].items():
+        expected, got = result["constrained"]["allocation"], warm["strategies"][name]["constrained"]["allocation"]
+        assert max(abs(expected[t] - got[t]) for t in expected) < 0.5
+
+
+def test_batch_download_failure_is_a_json_error(client, monkeypatch):
+    def unavailable(*args, **kwargs): raise ConnectionError("provider unavailable")
+    monkeypatch.setattr(app, "fetch_market_data", unavailable)
+    r = client.post('/api/optimize/batch', json={"tickers": TICKERS, "scenarios": [{}]})
+    assert r.status_code == 500
+    assert r.get_json() == {"error": "provider unavailable"}
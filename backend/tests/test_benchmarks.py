@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from portfolio_lib.benchmarks import BENCHMARK_TICKERS, BenchmarkCache, benchmark_results, benchmark_weights
+
+
+def benchmark_prices(days=500, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2023-01-02", periods=days)
+    return pd.DataFrame(100 * np.cumprod(1 + rng.normal(2e-4, 0.008, (days, 5)), axis=0), index=index, columns=BENCHMARK_TICKERS)
+
+
+class CountingFetch:
+    def __init__(self, prices):
+        self.prices, self.calls = prices, 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.prices
+
+
+def test_fetches_once_per_trading_day():
+    fetch = CountingFetch(benchmark_prices())
+    cache = BenchmarkCache(fetch)
+    index = fetch.prices.index
+    cache.get(index, 0.045, "2024-12-05")
+    cache.get(index[100:], 0.045, "2024-12-05")
+    cache.get(index[200:], 0.045, "2024-12-04")  # a stale basket keeps the newer day
+    assert fetch.calls == 1
+    cache.get(index, 0.045, "2024-12-06")
+    assert fetch.calls == 2
+
+
+def test_slice_matches_a_fresh_run_over_the_range():
+    prices = benchmark_prices()
+    cache = BenchmarkCache(CountingFetch(prices))
+    index = prices.index[150:400]
+    for columnar in (False, True):
+        sliced = cache.get(index, 0.045, "2024-12-05", columnar)
+        r = prices.loc[index].pct_change().iloc[1:]
+        assert sliced == benchmark_results(r, benchmark_weights(r.columns), 0.045, columnar)
+    assert sliced[0]["60/40"]["risk_decomposition"]["tickers"] == ["SPY", "BND"]
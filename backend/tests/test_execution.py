@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from multiprocessing import shared_memory
+from portfolio_lib import execution
+from portfolio_lib.execution import MODES, StrategyExecutor
+from portfolio_lib.optimizers import find_optimal_allocations
+
+
+def random_prices(days=600, n=12, seed=0):
+    rng = np.random.default_rng(seed)
+    rets = rng.normal(0.0004, 0.01, (days, n)) + rng.normal(0, 0.006, (days, 1))
+    index = pd.bdate_range("2023-01-02", periods=days)
+    return pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=index, columns=[f"T{i:02d}" for i in range(n)])
+
+
+def assert_same_weights(result, expected):
+    assert result["lookback_days"] == expected["lookback_days"]
+    assert list(result["strategies"]) == list(expected["strategies"])
+    for name, modes in expected["strategies"].items():
+        for mode, s in modes.items():
+            np.testing.assert_array_equal(result["strategies"][name][mode]["weights"], s["weights"], err_msg=f"{name} {mode}")
+
+
+def failing_task(arrays, fail):
+    if fail: raise RuntimeError("task failed")
+    return float(arrays["x"].sum())
+
+
+@pytest.fixture
+def created_segments(monkeypatch):
+    """Names of the shared-memory blocks the parent creates."""
+    names = []
+    class Recording(shared_memory.SharedMemory):
+        def __init__(self, name=None, create=False, size=0):
+            super().__init__(name, create, size)
+            if create: names.append(self.name)
+    monkeypatch.setattr(execution.shared_memory, "SharedMemory", Recording)
+    return names
+
+
+def assert_released(names):
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError): shared_memory.SharedMemory(name=name)
+
+
+@pytest.fixture(scope="module")
+def serial_result():
+    return find_optimal_allocations(random_prices(), 0.0, 0.3, 0.045, executor=StrategyExecutor("serial"))
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("universe", ["dense", "clustered"])
+def test_modes_give_identical_weights(mode, universe, serial_result, created_segments):
+    executor = StrategyExecutor(mode, workers=2)
+    try:
+        result = find_optimal_allocations(random_prices(), 0.0, 0.3, 0.045, executor=executor, universe=universe)
+        expected = serial_result if universe == "dense" else \
+            find_optimal_allocations(random_prices(), 0.0, 0.3, 0.045, executor=StrategyExecutor("serial"), universe=universe)
+    finally:
+        executor.shutdown()
+    assert (result["clusters"] is not None) == (universe == "clustered")
+    assert_same_weights(result, expected)
+    if mode == "process": assert_released(created_segments)
+    else: assert created_segments == []
+
+
+def test_segments_are_released_when_a_task_fails(created_segments):
+    executor = StrategyExecutor("process", workers=2)
+    try:
+        with pytest.raises(RuntimeError, match="task failed"):
+            executor.run([(failing_task, {"fail": False}), (failing_task, {"fail": True})], {"x": np.ones(1000)})
+        assert executor.run([(failing_task, {"fail": False})], {"x": np.ones(10)}) == [10.0]
+    finally:
+        executor.shutdown()
+    assert len(created_segments) == 2
+    assert_released(created_segments)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+import scipy.optimize
+from portfolio_lib.optimizers import run_max_sharpe, run_risk_parity
+
+
+def factor_cov(n, k=3, seed=1):
+    rng = np.random.default_rng(seed)
+    B = rng.normal(0, 0.01, (n, k))
+    return B @ B.T + np.diag(rng.uniform(1e-5, 4e-4, n))
+
+
+def captured(monkeypatch, solve):
+    """The objective (and constraints) a solver hands to SLSQP."""
+    seen = {}
+    minimize = scipy.optimize.minimize
+    def spy(fun, x0, **kwargs):
+        seen.update(fun=fun, jac=kwargs.get('jac'), constraints=kwargs['constraints'])
+        return minimize(fun, x0, **kwargs)
+    monkeypatch.setattr(scipy.optimize, "minimize", spy)
+    solve()
+    monkeypatch.undo()
+    return seen
+
+
+def check_gradient(fast, slow, points):
+    """The analytic value matches the plain objective and the gradient matches central differences."""
+    for w in points:
+        value, grad = fast(w)
+        assert value == pytest.approx(slow(w), rel=1e-12)
+        h = 1e-6
+        numeric = np.array([(slow(w + h * e) - slow(w - h * e)) / (2 * h) for e in np.eye(len(w))])
+        np.testing.assert_allclose(grad, numeric, rtol=1e-5, atol=1e-6 * np.abs(numeric).max())
+
+
+def random_weights(n, count=5, seed=3):
+    rng = np.random.default_rng(seed)
+    return list(rng.dirichlet(np.ones(n), count))
+
+
+@pytest.mark.parametrize("budgets", [None, np.linspace(1, 2, 12)])
+def test_risk_parity_gradient(monkeypatch, budgets):
+    cov = factor_cov(12)
+    fast = captured(monkeypatch, lambda: run_risk_parity(cov, fast=True, budgets=budgets))
+    slow = captured(monkeypatch, lambda: run_risk_parity(cov, budgets=budgets))
+    assert fast['jac'] is True and slow['jac'] is None
+    check_gradient(fast['fun'], slow['fun'], random_weights(12))
+
+
+@pytest.mark.parametrize("scale", [1.0, 0.01])
+def test_max_sharpe_gradient(monkeypatch, scale):
+    # scale=0.01 puts every portfolio under the 5% vol floor, where the denominator is constant
+    cov = factor_cov(12) * scale
+    mu = np.random.default_rng(5).normal(4e-4, 3e-4, 12)
+    fast = captured(monkeypatch, lambda: run_max_sharpe(mu, cov, 0.045, fast=True))
+    slow = captured(monkeypatch, lambda: run_max_sharpe(mu, cov, 0.045))
+    check_gradient(fast['fun'], slow['fun'], random_weights(12))
+
+
+def test_budget_jacobian(monkeypatch):
+    cov = factor_cov(8)
+    constraint = captured(monkeypatch, lambda: run_risk_parity(cov, fast=True))['constraints']
+    w = random_weights(8)[0]
+    np.testing.assert_array_equal(constraint['jac'](w), np.ones(8))
+
+
+@pytest.mark.parametrize("n", [25, 100])
+def test_fast_mode_reaches_the_same_weights_with_fewer_evaluations(n):
+    cov = factor_cov(n)
+    mu = np.random.default_rng(5).normal(4e-4, 3e-4, n)
+    for solve in (lambda **kw: run_risk_parity(cov, **kw), lambda **kw: run_max_sharpe(mu, cov, 0.045, **kw)):
+        w_slow, slow = solve(return_info=True)
+        w_fast, fast = solve(fast=True, return_info=True)
+        assert fast['nfev'] < slow['nfev']
+        np.testing.assert_allclose(w_fast, w_slow, atol=5e-3)
@@ -0,0 +1,45 @@
+import time
+import pytest
+from portfolio_lib.execution import MODES, StrategyExecutor
+from portfolio_lib.instrumentation import stage, start_trace, end_trace
+
+
+def nested_task(arrays, pause):
+    # Module level, so process workers can unpickle it
+    with stage("task"):
+        with stage("solve"): time.sleep(pause)
+    return pause
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_executor_stages_reach_the_trace(mode):
+    executor = StrategyExecutor(mode, workers=4)
+    try:
+        executor.run([(nested_task, {"pause": 0.0})])  # start the pool outside the trace
+        trace = start_trace()
+        with stage("request"):
+            with stage("strategies"):
+                assert executor.run([(nested_task, {"pause": 0.02})] * 4) == [0.02] * 4
+        end_trace()
+    finally:
+        executor.shutdown()
+
+    spans = trace.to_list()
+    depths = {}
+    for s in spans: depths.setdefault(s["stage"], set()).add(s["depth"])
+    # Concurrent tasks nest under the stage that submitted them, each at the same depth
+    assert depths == {"request": {0}, "strategies": {1}, "task": {2}, "solve": {3}}
+    assert sum(s["stage"] == "solve" for s in spans) == 4
+    outer = next(s for s in spans if s["stage"] == "strategies")
+    for s in spans:
+        if s["stage"] == "solve":
+            assert s["ms"] >= 15
+            # Worker-process spans are shifted onto the request's clock (allow for rounding)
+            assert outer["start_ms"] - 1 <= s["start_ms"] <= outer["start_ms"] + outer["ms"] + 1
+
+
+def test_stages_outside_a_trace_record_nothing():
+    trace = start_trace()
+    end_trace()
+    with stage("untraced"): pass
+    assert trace.to_list() == []
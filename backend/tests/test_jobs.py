@@ -0,0 +1,110 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio_lib import data
+from portfolio_lib.benchmarks import BENCHMARK_TICKERS, BenchmarkCache
+from portfolio_lib.jobs import JobManager, QueueFull
+from portfolio_lib.price_store import PriceStore, FrameProvider
+
+app = pytest.importorskip("app")
+
+TICKERS = [f"T{i:02d}" for i in range(6)]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The Flask app on an offline price store and its own job manager."""
+    days = 400
+    rng = np.random.default_rng(0)
+    rets = rng.normal(0.0004, 0.01, (days, len(TICKERS) + 5)) + rng.normal(0, 0.006, (days, 1))
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=days)
+    prices = pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=index, columns=TICKERS + BENCHMARK_TICKERS)
+    monkeypatch.setattr(data, "_default_store", PriceStore(str(tmp_path), FrameProvider(prices)))
+    monkeypatch.setattr(app, "get_risk_free_rate", lambda: 0.045)
+    monkeypatch.setattr(app, "benchmark_cache", BenchmarkCache(lambda: data.fetch_market_data(BENCHMARK_TICKERS, clean=False)))
+    monkeypatch.setattr(app, "jobs", JobManager(max_workers=1, max_queue=1))
+    yield app.app.test_client()
+    app.jobs._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def staged(gate, started=None):
+    """A pipeline stand-in: reports 'first', waits for `gate`, then reports 'second'."""
+    def run(*args, progress=None):
+        progress("first")
+        if started: started.set()
+        gate.wait(5)
+        progress("second")
+        return {"ok": True}
+    return run
+
+
+def finish(job):
+    job.future.result(timeout=30)
+    return job
+
+
+def test_queue_limit_returns_429(client, monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(app, "run_optimization", staged(gate))
+    # One running on the single worker and one waiting fill the queue
+    codes = [client.post('/api/jobs', json={"tickers": TICKERS}).status_code for _ in range(3)]
+    gate.set()
+    assert codes == [202, 202, 429]
+    for job in list(app.jobs.jobs.values()): finish(job)
+    assert client.post('/api/jobs', json={"tickers": TICKERS}).status_code == 202
+
+
+def test_queue_full_counts_unfinished_jobs():
+    manager = JobManager(max_workers=1, max_queue=0)
+    gate = threading.Event()
+    try:
+        job = manager.submit(staged(gate))
+        with pytest.raises(QueueFull): manager.submit(staged(gate))
+        gate.set(); finish(job)
+        finish(manager.submit(staged(gate)))
+    finally:
+        manager._pool.shutdown(wait=True)
+
+
+def test_cancel_stops_at_the_next_stage_boundary(client, monkeypatch):
+    gate, started = threading.Event(), threading.Event()
+    monkeypatch.setattr(app, "run_optimization", staged(gate, started))
+    running = client.post('/api/jobs', json={"tickers": TICKERS}).get_json()["job_id"]
+    queued = client.post('/api/jobs', json={"tickers": TICKERS}).get_json()["job_id"]
+    assert started.wait(5)
+
+    # The waiting job is dropped at once; the running one finishes its current stage first
+    assert client.delete(f'/api/jobs/{queued}').get_json()["status"] == "cancelled"
+    assert client.delete(f'/api/jobs/{running}').get_json()["status"] == "running"
+    gate.set()
+    job = finish(app.jobs.get(running))
+    assert job.status == "cancelled" and [s["name"] for s in job.stages] == ["first"]
+    assert client.get(f'/api/jobs/{running}/result').status_code == 409
+    assert client.delete('/api/jobs/unknown').status_code == 404
+
+
+def test_failed_jobs_map_bad_input_to_400(client):
+    job_id = client.post('/api/jobs', json={"tickers": TICKERS, "var_method": "bogus"}).get_json()["job_id"]
+    job = finish(app.jobs.get(job_id))
+    assert job.status == "failed"
+    r = client.get(f'/api/jobs/{job_id}/result')
+    assert r.status_code == 400 and "var_method" in r.get_json()["error"]
+
+
+def test_failed_jobs_map_other_errors_to_500(client, monkeypatch):
+    def broken(*args, progress=None): raise RuntimeError("solver exploded")
+    monkeypatch.setattr(app, "run_optimization", broken)
+    job_id = client.post('/api/jobs', json={"tickers": TICKERS}).get_json()["job_id"]
+    finish(app.jobs.get(job_id))
+    r = client.get(f'/api/jobs/{job_id}/result')
+    assert r.status_code == 500 and r.get_json() == {"error": "solver exploded"}
+
+
+def test_completed_job_serves_the_pipeline_result(client):
+    job_id = client.post('/api/jobs', json={"tickers": TICKERS, "min_weight": 0}).get_json()["job_id"]
+    job = finish(app.jobs.get(job_id))
+    assert job.status == "done"
+    assert [s["name"] for s in job.stages][:3] == ["download", "regime", "strategies"]
+    body = client.get(f'/api/jobs/{job_id}/result').get_json()
+    assert set(body["strategies"]["Risk Parity"]["unconstrained"]["allocation"]) == set(TICKERS)
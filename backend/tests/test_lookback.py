@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio_lib.execution import StrategyExecutor
+from portfolio_lib.lookback import ewma_mean
+from portfolio_lib.math_utils import calculate_metrics
+from portfolio_lib.optimizers import fit_regime, run_max_sharpe
+
+RF_RATE = 0.045
+WINDOWS = [63, 126, 252, 504]
+
+
+def factor_prices(n_tickers=12, days=760, seed=0):
+    """Daily closes driven by two common factors plus idiosyncratic noise."""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0.0003, 0.01, (days, 2))
+    loadings = rng.uniform(0.3, 1.2, (2, n_tickers))
+    rets = factors @ loadings + rng.normal(0.0002, 0.012, (days, n_tickers))
+    index = pd.bdate_range("2021-01-04", periods=days)
+    return pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=index, columns=[f"T{i:02d}" for i in range(n_tickers)])
+
+
+def pandas_loop_search(prices, rf_rate):
+    """
+    The search as it was first written: every window refits Ledoit-Wolf (sklearn) and the
+    EWMA mean on its own slice, then scores a cold max-Sharpe solve. Returns (window, stats).
+    """
+    from sklearn.covariance import LedoitWolf
+    windows = WINDOWS if len(prices) >= 200 else [len(prices) - 5]
+    best_score, best_window, best_stats = -np.inf, None, None
+    for w in windows:
+        if w >= len(prices): continue
+        rets = prices.iloc[-w:].pct_change().dropna()
+        lw = LedoitWolf().fit(rets)
+        cov = pd.DataFrame(lw.covariance_, index=rets.columns, columns=rets.columns)
+        mean = rets.ewm(span=w).mean().iloc[-1]
+        w_ms = run_max_sharpe(mean, cov, rf_rate, tol=1e-3)
+        _, _, score = calculate_metrics(w_ms, mean, cov, rf_rate)
+        if score > best_score:
+            best_score, best_window = score, w
+            best_stats = {'returns': rets, 'mean': mean, 'cov': cov, 'shrink': lw.shrinkage_}
+    return best_window, best_stats
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("warm_start", [True, False])
+def test_search_matches_pandas_loop(seed, warm_start):
+    pytest.importorskip("sklearn")
+    prices = factor_prices(seed=seed)
+    window, stats = pandas_loop_search(prices, RF_RATE)
+    regime = fit_regime(prices, RF_RATE, warm_start=warm_start, executor=StrategyExecutor("serial"), universe="dense")
+    new = regime['stats']
+
+    assert regime['window'] == window
+    assert new['returns'].index.equals(stats['returns'].index)
+    np.testing.assert_allclose(new['mean'].values, stats['mean'].values, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(new['cov'].values, stats['cov'].values, rtol=1e-9, atol=1e-14)
+    assert new['shrink'] == pytest.approx(stats['shrink'], rel=1e-9)
+
+    # The strategy weights solved on either window's statistics agree
+    w_old = run_max_sharpe(stats['mean'], stats['cov'], RF_RATE)
+    w_new = run_max_sharpe(new['mean'].values, new['cov'].values, RF_RATE, fast=True)
+    np.testing.assert_allclose(w_new, w_old, atol=1e-4)
+
+
+def test_short_history_uses_one_window():
+    pytest.importorskip("sklearn")
+    prices = factor_prices(days=150, seed=3)
+    window, stats = pandas_loop_search(prices, RF_RATE)
+    regime = fit_regime(prices, RF_RATE, executor=StrategyExecutor("serial"), universe="dense")
+    assert regime['window'] == window == len(prices) - 5
+    np.testing.assert_allclose(regime['stats']['cov'].values, stats['cov'].values, rtol=1e-9, atol=1e-14)
+
+
+def test_ewma_mean_skips_missing_observations():
+    rets = factor_prices(n_tickers=3, days=80).pct_change().iloc[1:]
+    rets.iloc[:20, 1] = np.nan
+    rets.iloc[:, 2] = np.nan
+    with np.errstate(all="raise"):
+        mean = ewma_mean(rets.values, span=len(rets))
+    np.testing.assert_allclose(mean[:2], rets.ewm(span=len(rets)).mean().iloc[-1].values[:2], rtol=1e-12)
+    assert mean[2] == 0.0
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio_lib.shrinkage import ledoit_wolf, ledoit_wolf_pairwise
+
+app = pytest.importorskip("app")
+
+LISTED = 500  # the late ticker's first bar
+
+
+def ragged_prices(days=760, seed=0):
+    """Four tickers on one calendar; LATE lists `LISTED` bars in."""
+    rng = np.random.default_rng(seed)
+    rets = rng.normal(0.0003, 0.01, (days, 4)) + rng.normal(0, 0.006, (days, 1))
+    index = pd.bdate_range("2022-01-03", periods=days)
+    prices = pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=index, columns=["AAA", "BBB", "CCC", "LATE"])
+    prices.iloc[:LISTED, 3] = np.nan
+    return prices
+
+
+def test_pairwise_matches_ledoit_wolf_on_complete_data():
+    X = ragged_prices().iloc[:, :3].pct_change().values[1:]
+    cov, shrink, N = ledoit_wolf_pairwise(X)
+    cov_lw, shrink_lw = ledoit_wolf(X)
+    np.testing.assert_allclose(cov, cov_lw, rtol=1e-12)
+    assert shrink == pytest.approx(shrink_lw, rel=1e-12)
+    assert np.all(N == len(X))
+
+
+def test_pairwise_uses_every_overlapping_row():
+    X = ragged_prices().pct_change().values[1:]
+    cov, shrink, N = ledoit_wolf_pairwise(X)
+    observed = ~np.isnan(X[:, 3])
+    assert N[0, 1] == len(X) and N[0, 3] == N[3, 3] == observed.sum()
+    assert np.all(np.linalg.eigvalsh(cov) > 0)
+
+    # Off the diagonal the identity target only scales the sample covariance by 1 - shrinkage
+    S = cov / (1 - shrink)
+    Y = X - np.nanmean(X, axis=0)
+    np.testing.assert_allclose(S[0, 1], Y[:, 0] @ Y[:, 1] / len(X), rtol=1e-10)
+    np.testing.assert_allclose(S[0, 3], Y[observed, 0] @ Y[observed, 3] / observed.sum(), rtol=1e-10)
+
+
+def test_select_prices_keeps_history_before_a_listing():
+    prices = ragged_prices()
+    tickers = list(prices.columns)
+    common, *_ = app._select_prices(prices, tickers, 0.5, "dense", "common")
+    pairwise, *_ = app._select_prices(prices, tickers, 0.5, "dense", "pairwise")
+    assert len(common) == len(prices) - LISTED
+    assert len(pairwise) == len(prices)
+    assert pairwise["LATE"].isna().sum() == LISTED and pairwise["AAA"].notna().all()
+
+
+@pytest.mark.parametrize("cut, message", [(slice(0, -20), "Insufficient history for LATE"),
+                                          (slice(-100, None), "Insufficient recent history for LATE")])
+def test_select_prices_rejects_thin_histories(cut, message):
+    prices = ragged_prices()
+    prices.iloc[cut, 3] = np.nan
+    with pytest.raises(app.InputError, match=message):
+        app._select_prices(prices, list(prices.columns), 0.5, "dense", "pairwise")
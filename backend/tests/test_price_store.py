@@ -0,0 +1,96 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio_lib.price_store import PriceStore, FrameProvider
+
+START = pd.Timestamp("2024-01-01")
+
+
+class RecordingProvider(FrameProvider):
+    """FrameProvider that remembers the start date of every fetch."""
+
+    def __init__(self, prices, latency=0.0):
+        super().__init__(prices, latency)
+        self.starts = []
+
+    def fetch(self, tickers, start, end=None):
+        self.starts.append(pd.Timestamp(start))
+        return super().fetch(tickers, start, end)
+
+
+def closes(days=40, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(START, periods=days)
+    return pd.DataFrame(100 * np.cumprod(1 + rng.normal(0, 0.01, (days, 2)), axis=0), index=index, columns=["AAA", "BBB"])
+
+
+def stored(store, ticker):
+    return store.read(ticker, START)
+
+
+def assert_same_closes(actual, expected, rtol=0.0):
+    # The store keeps day-resolution dates, so compare dates and values rather than index dtypes
+    assert actual.index.equals(expected.index)
+    np.testing.assert_allclose(actual.values, expected.values, rtol=rtol)
+
+
+def test_cold_fill(tmp_path):
+    prices = closes()
+    provider = RecordingProvider(prices)
+    store = PriceStore(str(tmp_path), provider)
+    assert store.refresh(["AAA", "BBB"], START) == (2, 0)
+    assert_same_closes(stored(store, "AAA"), prices["AAA"])
+    assert store.last_date("BBB") == prices.index[-1]
+    # Fresh within max_age: no second download
+    assert store.refresh(["AAA", "BBB"], START) == (0, 0)
+    assert provider.calls == 1
+
+
+def test_warm_refresh_fetches_only_the_tail(tmp_path):
+    prices = closes()
+    provider = RecordingProvider(prices.iloc[:30])
+    store = PriceStore(str(tmp_path), provider, max_age=0)
+    store.refresh(["AAA", "BBB"], START)
+    provider.prices = prices
+    assert store.refresh(["AAA", "BBB"], START) == (0, 2)
+    # Only the last two stored bars are asked for again, not the whole history
+    assert provider.starts[-1] == prices.index[28]
+    panel = store.get_prices(["AAA", "BBB"], period="max")
+    for t in ("AAA", "BBB"): assert_same_closes(panel[t], prices[t])
+
+
+def test_provisional_last_bar_is_replaced(tmp_path):
+    prices = closes()
+    intraday = prices.iloc[:30].copy()
+    intraday.iloc[-1] *= 1.03
+    provider = RecordingProvider(intraday)
+    store = PriceStore(str(tmp_path), provider, max_age=0)
+    store.refresh(["AAA"], START)
+    provider.prices = prices
+    store.refresh(["AAA"], START)
+    # The settled history is untouched; only the provisional bar changes
+    assert_same_closes(stored(store, "AAA"), prices["AAA"])
+
+
+def test_readjusted_history_is_rescaled(tmp_path):
+    prices = closes()
+    provider = RecordingProvider(prices.iloc[:30])
+    store = PriceStore(str(tmp_path), provider, max_age=0)
+    store.refresh(["AAA"], START)
+    # A dividend re-adjusts every close before the ex-date, so the settled bar moves
+    adjusted = prices.copy()
+    adjusted.iloc[:35] *= 0.98
+    provider.prices = adjusted
+    store.refresh(["AAA"], START)
+    assert_same_closes(stored(store, "AAA"), adjusted["AAA"], rtol=1e-12)
+
+
+def test_concurrent_refresh_fetches_once(tmp_path):
+    provider = RecordingProvider(closes(), latency=0.05)
+    store = PriceStore(str(tmp_path), provider)
+    threads = [threading.Thread(target=store.refresh, args=(["AAA", "BBB"], START)) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert provider.calls == 1
+    assert len(stored(store, "AAA")) == 40
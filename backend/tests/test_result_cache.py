@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio_lib import data
+from portfolio_lib.benchmarks import BENCHMARK_TICKERS, BenchmarkCache
+from portfolio_lib.price_store import PriceStore, FrameProvider
+from portfolio_lib.result_cache import ResultCache, rf_bucket
+
+TICKERS = [f"T{i:02d}" for i in range(5)]
+
+
+def disk_entries(root): return sorted(name for name in os.listdir(root) if name.endswith('.json'))
+
+
+def test_new_price_date_clears_both_layers(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put("old", {"v": 1}, "2026-01-02")
+    cache.put("same_day", {"v": 2}, "2026-01-02")
+    assert cache.get("old") == {"v": 1} and len(disk_entries(tmp_path)) == 2
+
+    # An older or equal date changes nothing
+    cache.observe_price_date("2026-01-01"); cache.observe_price_date("2026-01-02")
+    assert cache.stats()["invalidations"] == 0
+
+    cache.put("new", {"v": 3}, "2026-01-05")
+    assert list(cache.memory.entries) == ["new"] and disk_entries(tmp_path) == ["new.json"]
+    assert cache.stats()["invalidations"] == 4
+    assert cache.get("old") is None and cache.get("new") == {"v": 3}
+
+
+def test_disk_layer_survives_a_restart(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).put("k", {"v": [1, 2]}, "2026-01-02")
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.get("k") == {"v": [1, 2]} and cache.get("k") == {"v": [1, 2]}
+    stats = cache.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["entries"]) == (2, 1, 1)
+    # A restarted process that first sees newer prices drops the stale file
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.observe_price_date("2026-01-05")
+    assert disk_entries(tmp_path) == [] and cache.get("k") is None
+
+
+def test_rf_bucket():
+    assert rf_bucket(0.0450) == rf_bucket(0.0451) == 450
+    assert rf_bucket(0.0453) == 455
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app on an offline price store with an empty result cache."""
+    app = pytest.importorskip("app")
+    days = 400
+    rng = np.random.default_rng(0)
+    rets = rng.normal(0.0004, 0.01, (days, len(TICKERS) + 5)) + rng.normal(0, 0.006, (days, 1))
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=days)
+    prices = pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=index, columns=TICKERS + BENCHMARK_TICKERS)
+    monkeypatch.setattr(data, "_default_store", PriceStore(str(tmp_path / "prices"), FrameProvider(prices)))
+    monkeypatch.setattr(app, "get_risk_free_rate", lambda: 0.045)
+    monkeypatch.setattr(app, "benchmark_cache", BenchmarkCache(lambda: data.fetch_market_data(BENCHMARK_TICKERS, clean=False)))
+    monkeypatch.setattr(app, "result_cache", ResultCache(disk_dir=str(tmp_path / "results")))
+    return app
+
+
+def test_key_ignores_ticker_order_but_not_the_inputs(app, monkeypatch):
+    client = app.app.test_client()
+    base = {"tickers": TICKERS, "min_weight": 0, "max_weight": 60, "frontier_samples": 0}
+
+    def hit(rf=0.045, **changes):
+        monkeypatch.setattr(app, "get_risk_free_rate", lambda: rf)
+        before = app.result_cache.stats()["hits"]
+        assert client.post('/api/optimize', json={**base, **changes}).status_code == 200
+        return app.result_cache.stats()["hits"] > before
+
+    assert not hit()
+    assert hit(tickers=TICKERS[::-1])
+    assert hit(rf=0.0451)  # same 5 bp bucket
+    for changes in ({"min_weight": 5}, {"max_weight": 50}, {"target_value": 12}, {"target_mode": "var", "target_value": 2},
+                    {"shrinkage_target": "single_factor"}, {"rf": 0.046}):
+        assert not hit(**changes), changes
+        assert hit(**changes), changes
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from portfolio_lib.optimizers import _cvar_lp, run_min_cvar
+from portfolio_lib.risk import METHODS, historical_tail, portfolio_returns, tail_risk, target_var_leverage
+
+
+def fat_tailed_returns(T=756, n=12, seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.standard_t(4, (T, 1)) * 0.008
+    return market * rng.uniform(0.5, 1.5, n) + rng.standard_t(5, (T, n)) * 0.01 + 3e-4
+
+
+def test_historical_tail_matches_percentile():
+    daily = fat_tailed_returns(T=501, n=4)
+    q, cvar = historical_tail(daily, 0.95)
+    np.testing.assert_allclose(q, np.percentile(daily, 5, axis=0), rtol=1e-12)
+    # Rockafellar-Uryasev at alpha = 0.95 over 501 days: the 26 worst, the last of them at 0.05 * 501 - 25 weight
+    worst = np.sort(daily, axis=0)[:26]
+    expected = -(worst[:25].sum(axis=0) + (0.05 * 501 - 25) * worst[25]) / (0.05 * 501)
+    np.testing.assert_allclose(cvar, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("box", [(0.0, 1.0), (0.02, 0.2)])
+@pytest.mark.parametrize("warm", [False, True])
+def test_working_set_matches_full_lp(box, warm):
+    R = fat_tailed_returns()
+    T, n = R.shape
+    # A poor warm start: the worst days of one asset miss part of the optimum's tail, so the set grows
+    x0 = np.eye(n)[0] if warm else None
+    w, info = run_min_cvar(R, *box, return_info=True, x0=x0)
+    full = _cvar_lp(R, T, 0.95, *box)
+    assert info["scenarios"] < T
+    if warm: assert info["scenarios"] > 8 * int(np.ceil(0.05 * T)) + 1
+    assert info["cvar"] == pytest.approx(full.fun, rel=1e-9)
+    assert w.sum() == pytest.approx(1.0) and w.min() >= box[0] - 1e-9 and w.max() <= box[1] + 1e-9
+    # The LP objective is the historical CVaR of the weights it returns
+    assert historical_tail(R @ w, 0.95)[1] == pytest.approx(info["cvar"], rel=1e-9)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("cash_rate", [0.0, 0.045])
+def test_target_var_leverage_hits_the_target(method, cash_rate):
+    R = fat_tailed_returns(n=5, seed=1)
+    w = np.full(5, 0.2)
+    target = 0.02
+    L = target_var_leverage(w, R, target, 0.95, method, cash_rate)
+    var, _ = tail_risk(portfolio_returns(L * w, R, cash_rate), 0.95, method)
+    assert var[0] == pytest.approx(target, rel=1e-9)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from portfolio_lib.optimizers import run_risk_budgeting, run_risk_parity
+from portfolio_lib.risk_budgeting import spinu_risk_budget
+
+
+def factor_cov(n, k=5, seed=2):
+    rng = np.random.default_rng(seed)
+    B = rng.normal(0, 0.01, (n, k))
+    return B @ B.T + np.diag(rng.uniform(1e-5, 4e-4, n))
+
+
+def rc_shares(w, cov):
+    rc = w * (cov @ w)
+    return rc / rc.sum()
+
+
+@pytest.mark.parametrize("n", [25, 100])
+def test_exact_where_slsqp_is_approximate(n):
+    cov = factor_cov(n)
+    w, info = run_risk_budgeting(cov, return_info=True)
+    w_old = run_risk_parity(cov, fast=n > 25)
+    assert info['solver'] == 'spinu'
+    assert w.sum() == pytest.approx(1.0)
+    # The long-only equal-risk portfolio is unique: Spinu reaches it, SLSQP (tol 1e-4) only nears it
+    err = np.max(np.abs(rc_shares(w, cov) * n - 1))
+    assert err < 1e-6
+    assert err < np.max(np.abs(rc_shares(w_old, cov) * n - 1))
+
+
+def test_large_universe():
+    cov = factor_cov(2000)
+    w, info = run_risk_budgeting(cov, return_info=True)
+    assert info['solver'] == 'spinu' and info['success']
+    assert np.max(np.abs(rc_shares(w, cov) * 2000 - 1)) < 1e-6
+
+
+def test_binding_box_falls_back_to_slsqp():
+    n = 25
+    cov = np.diag(np.linspace(1e-5, 4e-4, n))
+    w, info = run_risk_budgeting(cov, 0.0, 0.06, return_info=True)
+    w_old = run_risk_parity(cov, 0.0, 0.06)
+    assert info['solver'] == 'slsqp'
+    assert w.max() <= 0.06 + 1e-9 and w.sum() == pytest.approx(1.0, abs=1e-3)
+    # Warm-started from the Spinu weights, the fallback ends at least as close to equal risk
+    assert np.max(np.abs(rc_shares(w, cov) * n - 1)) <= np.max(np.abs(rc_shares(w_old, cov) * n - 1)) + 1e-3
+    np.testing.assert_allclose(w, w_old, atol=5e-3)
+
+
+def test_custom_budgets():
+    n = 25
+    cov = factor_cov(n, k=3, seed=4)
+    budgets = np.linspace(1, 3, n)
+    w = run_risk_budgeting(cov, budgets=budgets)
+    np.testing.assert_allclose(rc_shares(w, cov), budgets / budgets.sum(), atol=1e-8)
+
+
+def test_warm_start_from_the_optimum():
+    cov = factor_cov(200)
+    w, info = spinu_risk_budget(cov)
+    w_warm, info_warm = spinu_risk_budget(cov, x0=w)
+    assert info_warm['success'] and info_warm['nit'] < info['nit']
+    np.testing.assert_allclose(w_warm, w, atol=1e-9)
+
+
+def test_zero_budgets_get_zero_weight():
+    n = 25
+    cov = factor_cov(n, seed=6)
+    budgets = np.r_[np.zeros(5), np.ones(n - 5)]
+    w, info = spinu_risk_budget(cov, budgets)
+    assert info['success'] and np.all(w[:5] == 0)
+    np.testing.assert_allclose(w[5:], spinu_risk_budget(cov[5:, 5:])[0], atol=1e-10)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from portfolio_lib.shrinkage import TARGETS, RollingLedoitWolf, ledoit_wolf
+
+
+def daily_returns(n=400, p=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0003, 0.01, (n, 3)) @ rng.uniform(0.2, 1.0, (3, p)) + rng.normal(0.0002, 0.012, (n, p))
+
+
+@pytest.mark.parametrize("n, p", [(252, 30), (60, 120), (500, 1)])
+def test_identity_matches_sklearn(n, p):
+    sk = pytest.importorskip("sklearn.covariance")
+    X = daily_returns(n, p)
+    cov, shrink = ledoit_wolf(X)
+    cov_sk, shrink_sk = sk.ledoit_wolf(X)
+    np.testing.assert_allclose(cov, cov_sk, rtol=1e-10, atol=1e-16)
+    assert shrink == pytest.approx(shrink_sk, abs=1e-10)
+
+
+def test_float32_input_stays_float32():
+    sk = pytest.importorskip("sklearn.covariance")
+    X = daily_returns()
+    cov32, shrink32 = ledoit_wolf(X.astype(np.float32))
+    cov_sk, shrink_sk = sk.ledoit_wolf(X)
+    assert cov32.dtype == np.float32
+    np.testing.assert_allclose(cov32, cov_sk, rtol=1e-5)
+    assert shrink32 == pytest.approx(shrink_sk, abs=1e-6)
+
+
+@pytest.mark.parametrize("target", TARGETS)
+@pytest.mark.parametrize("dtype, rtol", [(np.float64, 1e-10), (np.float32, 1e-4)])
+def test_rolling_matches_a_fresh_fit(target, dtype, rtol):
+    X = daily_returns(p=20).astype(dtype)
+    window = 126
+    rolling = RollingLedoitWolf(X.shape[1], target, dtype=dtype)
+    rolling.add(X[:window])
+    for t in range(window, len(X) + 1):
+        if t > window:
+            rolling.add(X[t - 1]); rolling.remove(X[t - 1 - window])
+        if t % 45 == 0 or t == len(X):
+            cov, shrink = rolling.estimate()
+            cov_fit, shrink_fit = ledoit_wolf(X[t - window:t].astype(np.float64), target)
+            np.testing.assert_allclose(cov, cov_fit, rtol=rtol, atol=rtol * np.abs(cov_fit).max())
+            assert shrink == pytest.approx(shrink_fit, rel=rtol, abs=rtol)
+
+
+@pytest.mark.parametrize("target", TARGETS)
+def test_reset_equals_adding_the_window(target):
+    X = daily_returns(n=200, p=10)
+    a = RollingLedoitWolf(10, target); a.add(X[:150]); a.remove(X[:50])
+    b = RollingLedoitWolf(10, target); b.reset(X[50:150])
+    np.testing.assert_allclose(a.estimate()[0], b.estimate()[0], rtol=1e-9)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from portfolio_lib.universe import prescreen, project_to_box
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("box", [(0.0, 0.3), (0.02, 0.15), "per-asset"])
+def test_project_to_box(seed, box):
+    rng = np.random.default_rng(seed)
+    n = 12
+    w = rng.normal(1 / n, 0.15, n)
+    min_w, max_w = (rng.uniform(0, 0.05, n), rng.uniform(0.12, 0.4, n)) if box == "per-asset" else box
+    x = project_to_box(w, min_w, max_w)
+    assert x.sum() == pytest.approx(1.0, abs=1e-12)
+    assert np.all(x >= min_w) and np.all(x <= max_w)
+    # Optimality: every coordinate strictly inside the box moved by the same shift tau
+    inside = (x > min_w + 1e-12) & (x < max_w - 1e-12)
+    assert inside.any()
+    tau = (w - x)[inside]
+    np.testing.assert_allclose(tau, tau[0], atol=1e-12)
+    # ... and the clipped ones sit on the side that shift pushes them to
+    assert np.all(w[x <= min_w + 1e-12] - tau[0] <= np.broadcast_to(min_w, n)[x <= min_w + 1e-12] + 1e-12)
+    assert np.all(w[x >= max_w - 1e-12] - tau[0] >= np.broadcast_to(max_w, n)[x >= max_w - 1e-12] - 1e-12)
+
+
+def test_project_to_box_keeps_feasible_weights():
+    w = np.array([0.1, 0.2, 0.3, 0.4])
+    np.testing.assert_allclose(project_to_box(w, 0.0, 0.5), w, atol=1e-12)
+
+
+def screened_panel(days=400, seed=0):
+    rng = np.random.default_rng(seed)
+    rets = rng.normal(0.0004, 0.01, (days, 4)) + rng.normal(0, 0.004, (days, 1))
+    index = pd.bdate_range("2024-01-01", periods=days)
+    prices = pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=index, columns=["OLD", "B", "C", "D"])
+    # NEW tracks OLD to within a few basis points but lists 100 days later; SHORT has 200 prices
+    prices["NEW"] = prices["OLD"] * (1 + rng.normal(0, 0.0005, days))
+    prices.iloc[:100, prices.columns.get_loc("NEW")] = np.nan
+    prices["SHORT"] = 100 * np.cumprod(1 + rng.normal(0, 0.01, days))
+    prices.iloc[:200, prices.columns.get_loc("SHORT")] = np.nan
+    prices["FLAT"] = 50.0
+    return prices
+
+
+def test_prescreen_drops_short_constant_and_duplicate_tickers():
+    prices = screened_panel()
+    kept, dropped = prescreen(prices, min_history=252)
+    assert dropped == {"SHORT": "history", "FLAT": "constant", "NEW": "duplicate"}
+    assert list(kept.columns) == ["OLD", "B", "C", "D"]
+    pd.testing.assert_frame_equal(kept, prices[["OLD", "B", "C", "D"]])
+
+
+def test_prescreen_keeps_the_older_listing_whichever_column_comes_first():
+    prices = screened_panel()
+    kept, dropped = prescreen(prices[["NEW", "B", "C", "D", "OLD"]], min_history=252)
+    assert dropped == {"NEW": "duplicate"} and "OLD" in kept.columns
+
+
+def test_prescreen_thresholds():
+    prices = screened_panel()
+    # A laxer correlation limit keeps the near-duplicate; a shorter history requirement keeps SHORT
+    assert "NEW" in prescreen(prices, max_corr=0.9999)[0].columns
+    assert "SHORT" in prescreen(prices, min_history=150)[0].columns
+    # The history requirement is capped at the panel length
+    assert "SHORT" in prescreen(prices.iloc[-180:], min_history=252)[0].columns
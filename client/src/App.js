@@ -216,12 +216,12 @@ function App() {
 
             {/* 3. Global Visualization Area */}
             {results.meta.frontier && (
-                <EfficientFrontierChart cloudData={results.meta.frontier} strategies={results.strategies} />
+                <EfficientFrontierChart cloudData={results.meta.frontier} curveData={results.meta.frontier_curve} strategies={results.strategies} />
             )}
 
             {/* 4. Tab Navigation */}
             <div className="tabs-header">
-                {["Risk Parity", "Max Sharpe", "HRP"].map(tab => {
+                {["Risk Parity", "Max Sharpe", "HRP", "Min CVaR"].map(tab => {
                     const rec = getRecommendedStrategy(results.meta.lookback, results.meta.shrinkage);
                     const isRec = rec.includes(tab.split(" ")[0]);
                     return (
@@ -256,6 +256,16 @@ function App() {
                         globalCorrelation={results.meta.diagnostics.correlation}
                     />
                 }
+                {activeTab === "Min CVaR" && 
+                    <StrategyCard 
+                        title="Min CVaR" 
+                        data={results.strategies["Min CVaR"]} 
+                        color="#c0392b" 
+                        minWeight={minWeight} maxWeight={maxWeight}
+                        isRecommended={false} 
+                        globalCorrelation={results.meta.diagnostics.correlation}
+                    />
+                }
                 {activeTab === "HRP" && (
                     <>
                         <StrategyCard 
@@ -267,7 +277,7 @@ function App() {
                             globalCorrelation={results.meta.diagnostics.correlation}
                         />
                         {/* HRP Dendrogram */}
-                        <DendrogramViewer imageBase64={results.meta.dendrogram} />
+                        <DendrogramViewer dendrogram={results.meta.dendrogram} />
                     </>
                 )}
                 
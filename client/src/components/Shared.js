@@ -24,10 +24,12 @@ export const CombinedChart = ({ strategies, benchmarks }) => {
 
   // 1. Merge Data
   // We need a single array of objects: [{date: '2023-01-01', RP: 100, MS: 100, HRP: 100, 6040: 100...}]
-  // We'll assume all histories share the same dates (which they do from the backend).
+  // Strategies share one date axis; benchmarks follow their own trading calendar, so they are matched by date.
   
   // Base data on the first strategy's history
   const baseHistory = strategies["Risk Parity"].constrained.history;
+  const benchmarkByDate = (name) => new Map((benchmarks?.[name]?.history || []).map(d => [d.date, d.value]));
+  const sixtyForty = benchmarkByDate("60/40"), permanent = benchmarkByDate("Permanent");
   
   const mergedData = baseHistory.map((day, index) => {
     const row = { date: day.date };
@@ -36,11 +38,12 @@ export const CombinedChart = ({ strategies, benchmarks }) => {
     row["Risk Parity"] = strategies["Risk Parity"].constrained.history[index]?.value;
     row["Max Sharpe"] = strategies["Max Sharpe"].constrained.history[index]?.value;
     row["HRP"] = strategies["HRP"].unconstrained.history[index]?.value; // HRP is unconstrained
+    row["Min CVaR"] = strategies["Min CVaR"].constrained.history[index]?.value;
     
     // Add Benchmarks
     if (benchmarks) {
-        row["60/40"] = benchmarks["60/40"].history[index]?.value;
-        row["Permanent"] = benchmarks["Permanent"].history[index]?.value;
+        row["60/40"] = sixtyForty.get(day.date);
+        row["Permanent"] = permanent.get(day.date);
     }
     return row;
   });
@@ -64,12 +67,13 @@ export const CombinedChart = ({ strategies, benchmarks }) => {
             <Line type="monotone" dataKey="Risk Parity" stroke="#27ae60" strokeWidth={2} dot={false} />
             <Line type="monotone" dataKey="Max Sharpe" stroke="#2980b9" strokeWidth={2} dot={false} />
             <Line type="monotone" dataKey="HRP" stroke="#8e44ad" strokeWidth={2} dot={false} />
+            <Line type="monotone" dataKey="Min CVaR" stroke="#c0392b" strokeWidth={2} dot={false} />
             
             {/* Benchmarks (Dashed/Lighter) */}
             {benchmarks && (
                 <>
-                <Line type="monotone" dataKey="60/40" stroke="#95a5a6" strokeWidth={2} strokeDasharray="5 5" dot={false} />
-                <Line type="monotone" dataKey="Permanent" stroke="#d35400" strokeWidth={2} strokeDasharray="5 5" dot={false} />
+                <Line type="monotone" dataKey="60/40" stroke="#95a5a6" strokeWidth={2} strokeDasharray="5 5" dot={false} connectNulls />
+                <Line type="monotone" dataKey="Permanent" stroke="#d35400" strokeWidth={2} strokeDasharray="5 5" dot={false} connectNulls />
                 </>
             )}
           </LineChart>
@@ -45,6 +45,7 @@ const StrategyCard = ({ title, data, color, isRecommended, globalCorrelation, mi
               <MetricItem icon="⚡" label="SR" value={data.unconstrained.metrics.sharpe} tooltip="Sharpe Ratio" />
               <MetricItem icon="🌊" label="Vol" value={data.unconstrained.metrics.volatility + "%"} tooltip="Volatility" />
               <MetricItem icon="🔻" label="VaR" value={"-" + data.unconstrained.metrics.var + "%"} tooltip="95% Daily Value at Risk. In the worst 5% of days, expect to lose at least this much." />
+              <MetricItem icon="🕳️" label="CVaR" value={"-" + data.unconstrained.metrics.cvar + "%"} tooltip="95% Daily Conditional VaR (Expected Shortfall): the average loss on the worst 5% of days." />
             </div>
             <ul className="allocation-list compact">
               {Object.entries(data.unconstrained.allocation).sort(([,a], [,b]) => b - a).map(([t, w]) => (
@@ -61,6 +62,7 @@ const StrategyCard = ({ title, data, color, isRecommended, globalCorrelation, mi
               <MetricItem icon="⚡" label="SR" value={data.constrained.metrics.sharpe} tooltip="Sharpe Ratio" />
               <MetricItem icon="🌊" label="Vol" value={data.constrained.metrics.volatility + "%"} tooltip="Volatility" />
               <MetricItem icon="🔻" label="VaR" value={"-" + data.unconstrained.metrics.var + "%"} tooltip="95% Daily Value at Risk. In the worst 5% of days, expect to lose at least this much." />
+              <MetricItem icon="🕳️" label="CVaR" value={"-" + data.constrained.metrics.cvar + "%"} tooltip="95% Daily Conditional VaR (Expected Shortfall): the average loss on the worst 5% of days." />
             </div>
             <ul className="allocation-list compact">
               {Object.entries(data.constrained.allocation).sort(([,a], [,b]) => b - a).map(([t, w]) => (
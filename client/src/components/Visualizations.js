@@ -1,23 +1,57 @@
 import React from 'react';
 import { ScatterChart, Scatter, AreaChart, Area, XAxis, YAxis, Tooltip, ResponsiveContainer, Cell, Legend, ReferenceLine } from 'recharts';
 
-export const DendrogramViewer = ({ imageBase64 }) => {
-  if (!imageBase64) return null;
+// Draws the server's dendrogram JSON (scipy icoord/dcoord: leaf i at x = 10i + 5, y = merge distance)
+const DendrogramSvg = ({ tree }) => {
+  const width = 800, height = 380, top = 12, bottom = 80, left = 48, right = 12;
+  const n = tree.labels.length;
+  const maxDist = Math.max(...tree.dcoord.flat(), 1e-9);
+  const x = (v) => left + (v / (10 * n)) * (width - left - right);
+  const y = (v) => top + (1 - v / maxDist) * (height - top - bottom);
+  const ticks = [0, 0.25, 0.5, 0.75, 1].map(f => f * maxDist);
+  return (
+    <svg viewBox={`0 0 ${width} ${height}`} style={{ width: '100%', maxHeight: '400px' }} role="img" aria-label="Asset Dendrogram">
+      <line x1={left} y1={top} x2={left} y2={y(0)} stroke="#999" />
+      {ticks.map(t => (
+        <g key={t}>
+          <line x1={left - 4} y1={y(t)} x2={left} y2={y(t)} stroke="#999" />
+          <text x={left - 6} y={y(t)} fontSize={10} textAnchor="end" dominantBaseline="middle" fill="#666">{t.toFixed(2)}</text>
+        </g>
+      ))}
+      <text transform={`translate(12 ${(top + y(0)) / 2}) rotate(-90)`} fontSize={11} textAnchor="middle" fill="#666">Distance (Correlation)</text>
+      {tree.icoord.map((xs, i) => (
+        <polyline key={i} fill="none" stroke="#8e44ad" strokeWidth={1.5}
+          points={xs.map((xv, j) => `${x(xv)},${y(tree.dcoord[i][j])}`).join(' ')} />
+      ))}
+      {tree.labels.map((label, i) => (
+        <text key={label} transform={`translate(${x(10 * i + 5)} ${y(0) + 6}) rotate(-90)`}
+          fontSize={n > 60 ? 7 : 10} textAnchor="end" dominantBaseline="middle" fill="#333">{label}</text>
+      ))}
+    </svg>
+  );
+};
+
+// `dendrogram` is the JSON tree, or a base64 PNG from responses cached before the JSON mode existed
+export const DendrogramViewer = ({ dendrogram }) => {
+  if (!dendrogram) return null;
   return (
     <div className="diag-card" style={{ marginTop: '20px', textAlign: 'center' }}>
       <h4>HRP Clustering Tree (Dendrogram)</h4>
-      <img src={`data:image/png;base64,${imageBase64}`} alt="Asset Dendrogram" style={{ maxWidth: '100%', maxHeight: '400px', borderRadius: '8px' }} />
+      {typeof dendrogram === 'string'
+        ? <img src={`data:image/png;base64,${dendrogram}`} alt="Asset Dendrogram" style={{ maxWidth: '100%', maxHeight: '400px', borderRadius: '8px' }} />
+        : <DendrogramSvg tree={dendrogram} />}
       <div className="diag-note">Assets joined at the <strong>bottom</strong> are Cousins (Correlated). Assets at the <strong>top</strong> are Diversifiers.</div>
     </div>
   );
 };
 
-export const EfficientFrontierChart = ({ cloudData, strategies }) => {
+export const EfficientFrontierChart = ({ cloudData, curveData, strategies }) => {
   if (!cloudData || !strategies) return null;
   const strategyPoints = [
     { name: "Risk Parity", x: strategies["Risk Parity"].constrained.metrics.volatility, y: strategies["Risk Parity"].constrained.metrics.return, color: "#27ae60" },
     { name: "Max Sharpe", x: strategies["Max Sharpe"].constrained.metrics.volatility, y: strategies["Max Sharpe"].constrained.metrics.return, color: "#2980b9" },
     { name: "HRP", x: strategies["HRP"].unconstrained.metrics.volatility, y: strategies["HRP"].unconstrained.metrics.return, color: "#8e44ad" },
+    { name: "Min CVaR", x: strategies["Min CVaR"].constrained.metrics.volatility, y: strategies["Min CVaR"].constrained.metrics.return, color: "#c0392b" },
   ];
 
   return (
@@ -30,6 +64,9 @@ export const EfficientFrontierChart = ({ cloudData, strategies }) => {
             <YAxis type="number" dataKey="y" name="Return" unit="%" domain={['auto', 'auto']} label={{ value: 'Return', angle: -90, position: 'insideLeft' }} />
             <Tooltip cursor={{ strokeDasharray: '3 3' }} />
             <Scatter name="Possible Portfolios" data={cloudData} fill="#e0e0e0" shape="circle" />
+            {curveData && curveData.length > 1 && (
+              <Scatter name="Efficient Frontier" data={curveData} fill="#2c3e50" line={{ stroke: '#2c3e50', strokeWidth: 2 }} shape={() => null} />
+            )}
             {strategyPoints.map((point, index) => (
               <Scatter key={index} name={point.name} data={[point]} fill={point.color} shape="star" s={200}><Cell key={`cell-${index}`} fill={point.color} /></Scatter>
             ))}